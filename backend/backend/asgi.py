@@ -2,6 +2,7 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django; WebSocket connections go to the real-time chat socket.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -12,5 +13,18 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Sync ORM work runs on whichever thread asgiref picks, so a persistent connection would be left
+# open on each of them; close connections after every request unless DB_CONN_MAX_AGE says otherwise
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up, as it loads models
+from rota.consumers import chat_socket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await chat_socket(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -0,0 +1,13 @@
+"""
+Settings for exercising read-replica routing locally: a second SQLite file stands in for the
+replica. Nothing copies data between the two files, so a read routed to the wrong database
+shows up immediately.
+
+    DJANGO_SETTINGS_MODULE=backend.settings_replica python manage.py test rota.tests.ReplicaRoutingTests
+"""
+from .settings import *  # noqa: F401,F403
+
+DATABASES['replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': BASE_DIR / 'db_replica.sqlite3',
+}
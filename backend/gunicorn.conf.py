@@ -0,0 +1,58 @@
+"""
+gunicorn configuration, picked up automatically when gunicorn runs from backend/:
+
+    gunicorn backend.wsgi:application
+
+Every value can be overridden with the environment variables below or on the command line.
+`python manage.py bench_server_startup` measures startup time and memory with and without preload.
+"""
+import gc
+import os
+
+# SQLite allows one writer at a time, so extra processes mostly queue on its lock;
+# a server database scales with processes.
+_sqlite = os.getenv('DATABASE_URL', 'sqlite').startswith('sqlite')
+_cpus = os.cpu_count() or 1
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '8000')}")
+
+# 2 x CPUs + 1 processes against a server database (capped so DB connections stay bounded);
+# on SQLite at most two processes with more threads each
+workers = int(os.getenv('GUNICORN_WORKERS', min(2, _cpus) if _sqlite else min(_cpus * 2 + 1, 12)))
+threads = int(os.getenv('GUNICORN_THREADS', 4 if _sqlite else 2))
+# gthread whenever threads > 1; set to uvicorn.workers.UvicornWorker to serve backend.asgi:application
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread' if threads > 1 else 'sync')
+
+# Load Django and the URLconf once in the master and fork workers from it,
+# so they start instantly and share those pages copy-on-write
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() in ('true', '1')
+
+# Restart each worker after this many requests (staggered by the jitter) to cap memory growth
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# The longest request is a chat long poll, so allow it plus a margin before a worker is
+# killed, and give in-flight requests as long to finish on restart
+timeout = int(os.getenv('GUNICORN_TIMEOUT', int(os.getenv('CHAT_LONG_POLL_TIMEOUT', 25)) + 15))
+graceful_timeout = timeout
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# '-' logs requests to stdout; set to an empty value to turn request logging off
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    # Import the URLconf, and with it the views, serializers and drf_spectacular, which
+    # every worker would otherwise import on its first request
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+
+    from django.db import connections
+    connections.close_all()  # a connection must not be shared with the forked workers
+
+    # Move everything loaded so far out of the collector's reach; otherwise the first
+    # collection in each worker touches every object and un-shares their pages
+    gc.freeze()
@@ -7,11 +7,18 @@ admin.site.register(Availability)
 admin.site.register(Shift)
 admin.site.register(Organisation)
 admin.site.register(InviteToken)
+admin.site.register(RevokedToken)
 admin.site.register(Notification)
 admin.site.register(NotificationReadStatus)
+admin.site.register(ArchivedNotificationReadStatus)
+admin.site.register(NotificationReadSummary)
 admin.site.register(ShiftSwapRequest)
+admin.site.register(SwapOffer)
+admin.site.register(SwapCycle)
 admin.site.register(Role)
 admin.site.register(ShiftTemplate)
 admin.site.register(Chat)
 admin.site.register(Message)
+admin.site.register(MessageTombstone)
+admin.site.register(ChatReadCursor)
 admin.site.register(ShiftRoleRequirement)
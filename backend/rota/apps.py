@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RotaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rota'
+
+    def ready(self):
+        from . import signals  # noqa: F401
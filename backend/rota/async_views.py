@@ -0,0 +1,186 @@
+"""
+Async versions of the read- and wait-heavy endpoints, served under /api/async/.
+
+Under an ASGI server (`uvicorn backend.asgi:application`) a request waiting on the database
+or a long poll holds no worker thread, so one process can keep thousands of them open.
+They also run under WSGI, but there each one still occupies a worker for its whole duration.
+"""
+import asyncio
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import models
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .chats import is_chat_participant
+from .consumers import authenticate, database_sync_to_async
+from .models import Chat, Message, MessageTombstone, Notification, Shift, ShiftSwapRequest
+from .pagination import apaginate_messages, decode_cursor, parse_page_size, parse_wait
+from .realtime import get_hub
+from .views import message_page_data
+
+UPCOMING_SHIFTS = 5
+
+_datetime = serializers.DateTimeField().to_representation
+
+
+def async_api_view(view):
+    """
+    Authenticates an async view from its `Authorization: Bearer` header with the same
+    authentication class as the DRF views, and turns validation errors into 400 responses.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        scheme, _, raw_token = request.headers.get('Authorization', '').partition(' ')
+        user, _ = await authenticate(raw_token) if scheme in jwt_settings.AUTH_HEADER_TYPES and raw_token else (None, None)
+        if user is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+        request.user = user
+        try:
+            return await view(request, *args, **kwargs)
+        except ValidationError as exc:
+            return JsonResponse(exc.detail, status=400, safe=False)
+    return wrapper
+
+
+@require_GET
+@async_api_view
+async def unread_notifications(request):
+    """Same response as GET /api/notifications/."""
+    unread = Notification.objects.filter(
+        notificationreadstatus__user=request.user,
+        notificationreadstatus__read=False
+    ).annotate(merged_count=models.F('notificationreadstatus__merged_count'))
+    return JsonResponse([
+        {
+            "id": notification.id,
+            "message": notification.message,
+            "created_at": _datetime(notification.created_at),
+            "read": False,
+            "merged_count": notification.merged_count,
+        }
+        async for notification in unread
+    ], safe=False)
+
+
+@database_sync_to_async
+def _chat_access_denied(chat_id, user):
+    if is_chat_participant(chat_id, user.id):
+        return None
+    if not Chat.objects.filter(id=chat_id).exists():
+        return JsonResponse({'detail': 'Chat not found.'}, status=404)
+    return JsonResponse({'detail': 'You are not a participant of this chat.'}, status=403)
+
+
+@require_GET
+@async_api_view
+async def chat_messages(request, chat_id):
+    """
+    Same parameters and response as GET /api/chats/<id>/messages/. A long poll (`after` with
+    `wait`) is woken by new messages and deletions published by this process, and re-checks
+    the database every CHAT_LONG_POLL_INTERVAL for those made by other processes.
+    """
+    denied = await _chat_access_denied(chat_id, request.user)
+    if denied:
+        return denied
+
+    before = request.GET.get('before')
+    after = request.GET.get('after')
+    if before and after:
+        return JsonResponse({'detail': "Use either 'before' or 'after', not both."}, status=400)
+    before = decode_cursor(before) if before else None
+    after = decode_cursor(after) if after else None
+    limit = parse_page_size(request.GET.get('limit'))
+
+    try:
+        wait = parse_wait(request.GET.get('wait'), settings.CHAT_LONG_POLL_TIMEOUT) if after else 0
+    except ValueError:
+        return JsonResponse({'wait': 'Must be a number.'}, status=400)
+    deadline = time.monotonic() + wait
+
+    messages_qs = Message.objects.filter(chat_id=chat_id).select_related('sender')
+    tombstones = MessageTombstone.objects.filter(chat_id=chat_id)
+    # subscribe before the first check so nothing published in between is missed
+    subscription = get_hub().subscribe(chat_id) if wait else None
+    try:
+        while True:
+            messages, has_older = await apaginate_messages(messages_qs, before=before, after=after, limit=limit)
+            deleted = [
+                row async for row in
+                tombstones.filter(id__gt=after.tombstone_id).order_by('id').values_list('id', 'message_id')
+            ] if after else []
+            remaining = deadline - time.monotonic()
+            if messages or deleted or remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(subscription.get(), min(remaining, settings.CHAT_LONG_POLL_INTERVAL))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        if subscription is not None:
+            subscription.close()
+
+    if deleted:
+        tombstone_id = deleted[-1][0]
+    elif after:
+        tombstone_id = after.tombstone_id
+    else:
+        tombstone_id = (await tombstones.aaggregate(last=models.Max('id')))['last'] or 0
+
+    return JsonResponse(message_page_data(messages, has_older, deleted, after, tombstone_id))
+
+
+async def _upcoming_shifts(shifts, now):
+    return [
+        {
+            "id": shift.id,
+            "employee": shift.employee.username,
+            "start_time": _datetime(shift.start_time),
+            "end_time": _datetime(shift.end_time),
+        }
+        async for shift in shifts.filter(end_time__gt=now).select_related('employee').order_by('start_time')[:UPCOMING_SHIFTS]
+    ]
+
+
+async def _hours_between(shifts, start, end):
+    seconds = 0
+    async for shift_start, shift_end in shifts.filter(start_time__lt=end, end_time__gt=start).values_list('start_time', 'end_time'):
+        seconds += (min(shift_end, end) - max(shift_start, start)).total_seconds()
+    return round(seconds / 3600, 2)
+
+
+@require_GET
+@async_api_view
+async def dashboard(request):
+    """
+    Everything the landing page shows in one request: upcoming shifts, hours scheduled this
+    week, unread notifications and swaps awaiting the user's decision. Managers see the
+    shifts they manage. The four queries run one after another on Django's database thread;
+    the request holds no worker while it waits for them.
+    """
+    user = request.user
+    now = timezone.now()
+    week_start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    if user.role == 'manager':
+        shifts = Shift.objects.filter(manager_id=user.id)
+        awaiting = models.Q(shift__manager_id=user.id, manager_approved=False)
+    else:
+        shifts = Shift.objects.filter(employee_id=user.id)
+        awaiting = models.Q(requested_to_id=user.id, recipient_approved=False)
+    open_swaps = ShiftSwapRequest.objects.filter(awaiting, is_approved=False, rejected_at__isnull=True)
+    unread = Notification.objects.filter(notificationreadstatus__user=user, notificationreadstatus__read=False)
+
+    return JsonResponse({
+        "upcoming_shifts": await _upcoming_shifts(shifts, now),
+        "hours_this_week": await _hours_between(shifts, week_start, week_start + timedelta(days=7)),
+        "unread_notifications": await unread.acount(),
+        "swaps_awaiting_decision": await open_swaps.acount(),
+    })
@@ -0,0 +1,73 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import ClaimsUser, User
+from .revocation import SESSION_CLAIM, is_token_revoked
+
+# Claim name -> User attribute carried in every token, enough for most views' permission checks
+USER_CLAIMS = {
+    'username': 'username',
+    'role': 'role',
+    'org': 'organisation_id',
+}
+
+
+def add_user_claims(token, user):
+    for claim, attribute in USER_CLAIMS.items():
+        token[claim] = getattr(user, attribute)
+    return token
+
+
+class RotaTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[SESSION_CLAIM] = token['jti']  # lets logout revoke the access tokens issued from it too
+        return add_user_claims(token, user)
+
+
+class RotaTokenRefreshSerializer(TokenRefreshSerializer):
+    """Re-reads the user on refresh so role or organisation changes reach the next access token."""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if is_token_revoked(refresh):
+            raise InvalidToken("Token has been revoked.")
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: refresh.get(api_settings.USER_ID_CLAIM)}).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        return {'access': str(add_user_claims(refresh, user).access_token)}
+
+
+class RevocableJWTAuthentication(JWTAuthentication):
+    """JWT authentication that rejects tokens from sessions ended by logout."""
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_token_revoked(token):
+            raise InvalidToken("Token has been revoked.")
+        return token
+
+
+class ClaimsJWTAuthentication(RevocableJWTAuthentication):
+    """
+    JWT authentication that trusts the user claims in the token instead of loading the user,
+    so authenticating costs no queries. Tokens issued before the claims existed fall back to
+    the usual lookup.
+
+    Deactivating a user or changing their role takes effect when their access token next
+    refreshes, at most ACCESS_TOKEN_LIFETIME later.
+    """
+
+    def get_user(self, validated_token):
+        claims = validated_token.payload
+        if api_settings.USER_ID_CLAIM not in claims or not all(claim in claims for claim in USER_CLAIMS):
+            return super().get_user(validated_token)
+
+        known = {attribute: claims[claim] for claim, attribute in USER_CLAIMS.items()}
+        known.update(id=claims[api_settings.USER_ID_CLAIM], is_active=True)
+        # from_db expects values in field order; everything else is left deferred
+        fields = [field.attname for field in ClaimsUser._meta.concrete_fields if field.attname in known]
+        return ClaimsUser.from_db(None, fields, [known[name] for name in fields])
@@ -0,0 +1,215 @@
+import json
+from collections import namedtuple
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.urls import URLPattern, URLResolver, reverse
+from django.utils import timezone
+
+from . import urls
+from .authentication import RotaTokenObtainPairSerializer
+from .models import (
+    Availability, Message, NotificationReadStatus, Organisation, Role, Shift, ShiftSwapRequest,
+    ShiftTemplate, SwapCycle, SwapOffer,
+)
+from .recommend import get_organisation_index
+
+# One request the benchmark makes. `actor` names the fixture user sending it (None for anonymous);
+# `kwargs`, `query` and `data` are functions of the fixtures giving the URL arguments, query
+# string and JSON body, called before every request so each can use fresh values. `label`
+# tells apart cases with the same URL name and method.
+Case = namedtuple(
+    'Case', ['name', 'method', 'actor', 'kwargs', 'query', 'data', 'path', 'label'],
+    defaults=[None, None, None, None, None]
+)
+
+# Patterns without a name are identified by their route
+UNNAMED_PATHS = {
+    'testnoauth/': '/api/testnoauth/',
+    'testauth/': '/api/testauth/',
+}
+
+
+def url_names(patterns=None):
+    """The name (or, if it has none, the route) of every URL pattern in rota/urls.py."""
+    names = set()
+    for pattern in urls.urlpatterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            names |= url_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            names.add(pattern.name or str(pattern.pattern))
+    return names
+
+
+def access_token(user):
+    return str(RotaTokenObtainPairSerializer.get_token(user).access_token)
+
+
+def refresh_token(user):
+    return str(RotaTokenObtainPairSerializer.get_token(user))
+
+
+class Fixtures:
+    """
+    Users and rows of an organisation made by `rota.seeding.seed_organisation` that the
+    benchmark cases act on: a manager, one of their employees with an upcoming shift they can
+    swap or offer, a pending swap, an open offer, a proposed cycle, a chat and so on.
+    """
+
+    def __init__(self, organisation_name, password):
+        self.password = password
+        self.organisation = Organisation.objects.get(name=organisation_name)
+        now = timezone.now()
+
+        self.swap = ShiftSwapRequest.objects.select_related('shift__manager', 'requested_by', 'requested_to').filter(
+            shift__manager__organisation=self.organisation, is_approved=False, rejected_at__isnull=True
+        ).order_by('id').first()
+        self.manager = self.swap.shift.manager
+        self.pending_swap_ids = list(ShiftSwapRequest.objects.filter(
+            shift__manager=self.manager, is_approved=False, rejected_at__isnull=True
+        ).order_by('id').values_list('id', flat=True)[:20])
+        self.employee = self.swap.requested_by
+        self.recipient = self.swap.requested_to
+
+        # an upcoming shift of the employee's that isn't already being swapped or offered, and a coworker free to take it
+        index = get_organisation_index(self.organisation.id)
+        for shift in Shift.objects.filter(employee=self.employee, start_time__gt=now, is_swap_requested=False).exclude(
+            id__in=SwapOffer.objects.filter(closed_at__isnull=True).values('shift_id')
+        ).order_by('start_time'):
+            candidates = index.candidates(self.employee.role_title_id, shift.start_time, shift.end_time, exclude_user_id=self.employee.id, limit=1)
+            if candidates:
+                self.shift, self.coworker = shift, candidates[0][0]
+                break
+
+        self.offer = SwapOffer.objects.select_related('offered_by').filter(
+            offered_by__organisation=self.organisation, closed_at__isnull=True
+        ).order_by('id').first()
+        self.offerer = self.offer.offered_by
+        self.cycle = SwapCycle.objects.filter(organisation=self.organisation, executed_at__isnull=True).order_by('id').first()
+
+        self.message = Message.objects.select_related('chat').filter(sender=self.manager).order_by('-id').first()
+        self.chat = self.message.chat
+        self.notification_id = NotificationReadStatus.objects.filter(user=self.employee, read=False).order_by('notification_id').values_list('notification_id', flat=True).first()
+        self.latest_notification_id = NotificationReadStatus.objects.filter(user=self.employee).order_by('-notification_id').values_list('notification_id', flat=True).first()
+        self.template = ShiftTemplate.objects.filter(manager=self.manager).order_by('id').first()
+        self.availability = Availability.objects.filter(user=self.employee, end_time__gte=now).order_by('start_time').first()
+        self.role = Role.objects.filter(organisation=self.organisation).order_by('id').first()
+        # far enough ahead to clash with nothing seeded
+        self.free_day = (now + timedelta(days=365)).replace(hour=9, minute=0, second=0, microsecond=0)
+
+    def user(self, actor):
+        return None if actor is None else getattr(self, actor)
+
+    def path(self, case):
+        if case.path:
+            path = case.path
+        else:
+            path = reverse(case.name, kwargs=case.kwargs(self) if case.kwargs else None)
+        if case.query:
+            path += '?' + urlencode(case.query(self))
+        return path
+
+    def body(self, case):
+        return json.dumps(case.data(self)) if case.data else None
+
+
+def _period(start, hours=8):
+    return {"start_time": start.isoformat(), "end_time": (start + timedelta(hours=hours)).isoformat()}
+
+
+def endpoint_cases():
+    """The requests the endpoint benchmark makes; every URL pattern in rota/urls.py has at least one."""
+    strong_password = "Bench-Pass-2468"
+    return [
+        # AUTH
+        Case('auth_register', 'POST', None, data=lambda f: {
+            "username": "bench-newcomer", "email": "bench-newcomer@example.com", "password": strong_password,
+            "password2": strong_password, "first_name": "New", "last_name": "Manager", "role": "manager",
+            "organisation_name": "Benchmark newcomer",
+        }),
+        Case('token_obtain_pair', 'POST', None, data=lambda f: {"username": f.employee.username, "password": f.password}),
+        Case('token_refresh', 'POST', None, data=lambda f: {"refresh": refresh_token(f.employee)}),
+        Case('auth_logout', 'POST', 'employee', data=lambda f: {"refresh": refresh_token(f.employee)}),
+        Case('change-password', 'POST', 'employee', data=lambda f: {"old_password": f.password, "new_password": strong_password}),
+        Case('current-user', 'GET', 'employee'),
+        Case('generate_invite', 'POST', 'manager', data=lambda f: {"role": "employee"}),
+
+        # NOTIFICATIONS
+        Case('get_unread_notifications', 'GET', 'employee'),
+        Case('send_notification', 'POST', 'manager', data=lambda f: {
+            "message": "Benchmark announcement", "recipients": [f.employee.id], "roles": [f.role.id],
+        }),
+        Case('mark_notifications_read_bulk', 'POST', 'employee', data=lambda f: {"before": f.latest_notification_id}),
+        Case('mark_notification_read', 'POST', 'employee', kwargs=lambda f: {"pk": f.notification_id}),
+        Case('get_merged_notifications', 'GET', 'employee', kwargs=lambda f: {"pk": f.notification_id}),
+
+        # SHIFTS & AVAILABILITY
+        Case('auto_assign_shifts', 'POST', 'manager'),
+        Case('pay_estimate', 'GET', 'employee'),
+
+        # SWAPS
+        Case('request_swap', 'POST', 'employee', data=lambda f: {"shift": f.shift.id, "requested_to": f.coworker.id}),
+        Case('get_swap_candidates', 'GET', 'employee', kwargs=lambda f: {"shift_id": f.shift.id}),
+        Case('get_pending_swaps', 'GET', 'manager'),
+        Case('approve_swap', 'PATCH', 'manager', kwargs=lambda f: {"id": f.swap.id}),
+        Case('reject_swap', 'PATCH', 'recipient', kwargs=lambda f: {"id": f.swap.id}),
+        Case('decide_swaps_bulk', 'POST', 'manager', data=lambda f: {"action": "approve", "ids": f.pending_swap_ids}),
+        Case('create_swap_offer', 'POST', 'employee', data=lambda f: {"shift": f.shift.id}),
+        Case('withdraw_swap_offer', 'DELETE', 'offerer', kwargs=lambda f: {"id": f.offer.id}),
+        Case('match_swap_cycles', 'POST', 'manager'),
+        Case('execute_swap_cycle', 'POST', 'manager', kwargs=lambda f: {"id": f.cycle.id if f.cycle else 0}),
+
+        # ANALYTICS
+        Case('shift_fairness_analytics', 'GET', 'manager'),
+
+        # CHATS
+        Case('chat_inbox', 'GET', 'manager'),
+        Case('update_chat_participants', 'POST', 'manager', kwargs=lambda f: {"chat_id": f.chat.id}, data=lambda f: {"add_user_ids": [f.employee.id]}),
+        Case('mark_chat_read', 'POST', 'manager', kwargs=lambda f: {"chat_id": f.chat.id}, data=lambda f: {}),
+        Case('create_chat', 'POST', 'manager', data=lambda f: {"title": "Benchmark chat", "role_ids": [f.role.id]}),
+        Case('send_message', 'POST', 'manager', kwargs=lambda f: {"chat_id": f.chat.id}, data=lambda f: {"content": "Benchmark message"}),
+        Case('get_chat_messages', 'GET', 'manager', kwargs=lambda f: {"chat_id": f.chat.id}),
+        Case('delete_message', 'DELETE', 'manager', kwargs=lambda f: {"message_id": f.message.id}),
+
+        # ASYNC
+        Case('async_unread_notifications', 'GET', 'employee'),
+        Case('async_chat_messages', 'GET', 'manager', kwargs=lambda f: {"chat_id": f.chat.id}),
+        Case('async_dashboard', 'GET', 'employee'),
+
+        # SEARCH
+        Case('search', 'GET', 'manager', query=lambda f: {"q": "rota", "type": "messages"}, label="GET search (messages)"),
+        Case('search', 'GET', 'employee', query=lambda f: {"q": "shifts", "type": "notifications"}, label="GET search (notifications)"),
+
+        # TEST
+        Case('testnoauth/', 'GET', None, path=UNNAMED_PATHS['testnoauth/']),
+        Case('testauth/', 'GET', 'employee', path=UNNAMED_PATHS['testauth/']),
+        Case('check-org-availability', 'GET', None, query=lambda f: {"name": f.organisation.name}),
+
+        # ROUTER
+        Case('api-root', 'GET', 'employee'),
+        Case('user-list', 'GET', 'manager'),
+        Case('user-detail', 'GET', 'manager', kwargs=lambda f: {"pk": f.employee.id}),
+        Case('user-detail', 'PATCH', 'manager', kwargs=lambda f: {"pk": f.employee.id}, data=lambda f: {"first_name": "Renamed"}),
+        Case('availability-list', 'GET', 'employee'),
+        Case('availability-list', 'POST', 'employee', data=lambda f: _period(f.free_day, hours=24)),
+        Case('availability-detail', 'GET', 'employee', kwargs=lambda f: {"pk": f.availability.id}),
+        Case('shift-list', 'GET', 'employee', label="GET shift-list (employee)"),
+        Case('shift-list', 'GET', 'manager', label="GET shift-list (manager)"),
+        Case('shift-list', 'POST', 'manager', data=lambda f: {
+            "employee": f.employee.id, "manager": f.manager.id, **_period(f.free_day),
+        }),
+        Case('shift-detail', 'GET', 'employee', kwargs=lambda f: {"pk": f.shift.id}),
+        Case('role-list', 'GET', 'manager'),
+        Case('role-list', 'POST', 'manager', data=lambda f: {"name": "Benchmark role"}),
+        Case('role-detail', 'GET', 'manager', kwargs=lambda f: {"pk": f.role.id}),
+        Case('shift-template-list', 'GET', 'manager'),
+        Case('shift-template-list', 'POST', 'manager', data=lambda f: _period(f.free_day)),
+        Case('shift-template-detail', 'GET', 'manager', kwargs=lambda f: {"pk": f.template.id}),
+        Case('shift-template-set-roles', 'POST', 'manager', kwargs=lambda f: {"pk": f.template.id}, data=lambda f: {
+            "roles": [{"role": f.role.id, "quantity": 2}],
+        }),
+    ]
+
+
+def case_label(case):
+    return case.label or f"{case.method} {case.name}"
@@ -0,0 +1,91 @@
+import hashlib
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpRequest
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+# Scopes a cached response can be keyed by
+USER = 'user'
+ORGANISATION = 'organisation'
+
+
+def _generation_key(scope, scope_id):
+    return f"response-generation:{scope}:{scope_id}"
+
+
+def _generations(*scopes):
+    keys = [_generation_key(scope, scope_id) for scope, scope_id in scopes]
+    found = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex[:12] for key in keys if key not in found}
+    if missing:
+        # a random token rather than a counter, so an evicted generation can't come back to life
+        cache.set_many(missing, None)
+    return ':'.join({**found, **missing}[key] for key in keys)
+
+
+def _bump(scope, scope_ids):
+    cache.set_many({_generation_key(scope, scope_id): uuid.uuid4().hex[:12] for scope_id in scope_ids}, None)
+
+
+def invalidate_cached_responses(user_ids=(), organisation_ids=()):
+    """
+    Drops cached responses once the current transaction commits, so no request can cache
+    the pre-commit state in between. Invalidating an organisation also drops every
+    user-scoped response of its members.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    organisation_ids = {organisation_id for organisation_id in organisation_ids if organisation_id is not None}
+
+    def bump():
+        _bump(USER, user_ids)
+        _bump(ORGANISATION, organisation_ids)
+    transaction.on_commit(bump)
+
+
+def _response_key(view, request, scope):
+    user = request.user
+    if scope == USER:
+        generations = _generations((USER, user.id), (ORGANISATION, user.organisation_id))
+        scope_part = f"{USER}:{user.id}:{generations}"
+    else:
+        # org-wide data can still be shaped by the caller's role
+        generations = _generations((ORGANISATION, user.organisation_id))
+        scope_part = f"{ORGANISATION}:{user.organisation_id}:{user.role}:{generations}"
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f"response:{view.__module__}.{view.__qualname__}:{scope_part}:{path}"
+
+
+def cache_response(scope=USER, timeout=None):
+    """
+    Caches a view's successful GET responses per user or per organisation until
+    invalidate_cached_responses() is called for that user or organisation, or `timeout`
+    (default RESPONSE_CACHE_TIMEOUT) seconds pass. Does nothing unless RESPONSE_CACHE is
+    on. Place it directly above the view function or method so it runs after DRF has
+    authenticated the request.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, (Request, HttpRequest)))
+            if not settings.RESPONSE_CACHE or request.method != 'GET' or not request.user.is_authenticated:
+                return view(*args, **kwargs)
+
+            key = _response_key(view, request, scope)
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+
+            response = view(*args, **kwargs)
+            # a lagging replica can return data from before the latest invalidation, which would
+            # then be stored under the new generation
+            if (response.status_code == 200 and getattr(response, 'data', None) is not None
+                    and not getattr(request, 'read_from_replica', False)):
+                cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT if timeout is None else timeout)
+            return response
+        return wrapper
+    return decorator
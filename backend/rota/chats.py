@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Chat, User
+
+ChatParticipant = Chat.participants.through
+
+# Rows per INSERT/DELETE when changing participants, to stay under database parameter limits
+PARTICIPANT_BATCH_SIZE = 500
+
+
+def _membership_key(chat_id, user_id):
+    return f"chat-member:{chat_id}:{user_id}"
+
+
+def is_chat_participant(chat_id, user_id, fresh=False):
+    """
+    Checks membership with an indexed lookup on the participants table. On a cache shared
+    by every worker the answer is cached briefly per (chat, user) and invalidated whenever
+    the participants change; a per-process cache would miss other workers' invalidations.
+    Pass `fresh=True` before a write to always ask the database.
+    """
+    key = _membership_key(chat_id, user_id)
+    shared = settings.CACHE_BACKEND != 'locmem'
+    member = cache.get(key) if shared and not fresh else None
+    if member is None:
+        member = ChatParticipant.objects.filter(chat_id=chat_id, user_id=user_id).exists()
+        if shared:
+            cache.set(key, member, settings.CHAT_MEMBERSHIP_CACHE_SECONDS)
+    return member
+
+
+def invalidate_membership(chat_ids, user_ids):
+    """Forgets cached membership for every (chat, user) pair given."""
+    cache.delete_many([_membership_key(chat_id, user_id) for chat_id in chat_ids for user_id in user_ids])
+
+
+def resolve_participant_ids(organisation_id, user_ids=(), role_ids=()):
+    """IDs of users in the organisation who were listed directly or hold one of the roles."""
+    if not user_ids and not role_ids:
+        return set()
+    return set(
+        User.objects
+        .filter(organisation_id=organisation_id)
+        .filter(Q(id__in=user_ids) | Q(role_title_id__in=role_ids, role_title__organisation_id=organisation_id))
+        .values_list('id', flat=True)
+    )
+
+
+def _batches(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), PARTICIPANT_BATCH_SIZE):
+        yield ids[start:start + PARTICIPANT_BATCH_SIZE]
+
+
+def add_participants(chat_id, user_ids):
+    """Adds the users not already in the chat. Returns how many were added."""
+    existing = set()
+    for batch in _batches(user_ids):
+        existing.update(
+            ChatParticipant.objects.filter(chat_id=chat_id, user_id__in=batch).values_list('user_id', flat=True)
+        )
+    new_ids = set(user_ids) - existing
+
+    ChatParticipant.objects.bulk_create(
+        [ChatParticipant(chat_id=chat_id, user_id=user_id) for user_id in new_ids],
+        batch_size=PARTICIPANT_BATCH_SIZE,
+    )
+    # bulk_create bypasses m2m_changed, so invalidate here
+    invalidate_membership([chat_id], new_ids)
+    return len(new_ids)
+
+
+def remove_participants(chat_id, user_ids):
+    """Removes the given users from the chat. Returns how many were removed."""
+    removed = 0
+    for batch in _batches(user_ids):
+        removed += ChatParticipant.objects.filter(chat_id=chat_id, user_id__in=batch).delete()[0]
+    invalidate_membership([chat_id], user_ids)
+    return removed
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import re
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from .chats import is_chat_participant
+from .models import Message
+from .realtime import OVERFLOW, get_hub, message_created_event, publish_on_commit
+from .revocation import is_token_revoked
+from .serializers import MessageSerializer
+
+CHAT_SOCKET_PATH = re.compile(r'^/ws/chats/(?P<chat_id>\d+)/$')
+
+# Close codes sent to clients
+CLOSE_NOT_FOUND = 4404
+CLOSE_FORBIDDEN = 4403
+CLOSE_TRY_AGAIN_LATER = 1013  # consumer fell behind; reconnect and resync over HTTP
+
+
+def database_sync_to_async(func):
+    """Runs ORM code from the event loop, discarding stale connections like a request would."""
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(inner)
+
+
+@database_sync_to_async
+def authenticate(raw_token):
+    """The user and validated token, or (None, None) if the token isn't accepted."""
+    auth = api_settings.DEFAULT_AUTHENTICATION_CLASSES[0]()
+    try:
+        token = auth.get_validated_token(raw_token)
+        return auth.get_user(token), token
+    except (InvalidToken, AuthenticationFailed):
+        return None, None
+
+
+def _may_use_chat(chat_id, user, token):
+    return (
+        not is_token_revoked(token)
+        and token['exp'] > time.time()
+        and is_chat_participant(chat_id, user.id, fresh=True)
+    )
+
+
+@database_sync_to_async
+def may_use_chat(chat_id, user, token):
+    """Whether the socket's session is still live and its user still a participant."""
+    return _may_use_chat(chat_id, user, token)
+
+
+@database_sync_to_async
+def create_message(chat_id, user, token, content):
+    """Posts the message, or returns False without posting if the user may no longer use the chat."""
+    if not _may_use_chat(chat_id, user, token):
+        return False
+    message = Message.objects.create(chat_id=chat_id, sender=user, content=content)
+    publish_on_commit(chat_id, message_created_event(MessageSerializer(message).data))
+    return True
+
+
+async def chat_socket(scope, receive, send):
+    """
+    ASGI application for `/ws/chats/<chat_id>/?token=<access token>`.
+
+    Participants receive `message.created` and `message.deleted` events for the chat and
+    may post with `{"type": "message.send", "content": "..."}`. The socket is closed with
+    CLOSE_FORBIDDEN once its token is revoked or expires or its user leaves the chat,
+    checked before every post and every CHAT_SOCKET_RECHECK_SECONDS.
+    """
+    if (await receive())['type'] != 'websocket.connect':
+        return
+
+    match = CHAT_SOCKET_PATH.match(scope['path'])
+    if not match:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+    chat_id = int(match['chat_id'])
+
+    raw_token = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+    user, token = await authenticate(raw_token) if raw_token else (None, None)
+    if user is None or not await may_use_chat(chat_id, user, token):
+        await send({'type': 'websocket.close', 'code': CLOSE_FORBIDDEN})
+        return
+
+    await send({'type': 'websocket.accept'})
+    subscription = get_hub().subscribe(chat_id)
+    tasks = [
+        asyncio.create_task(_read_client(receive, subscription, chat_id, user, token)),
+        asyncio.create_task(_write_events(send, subscription)),
+        asyncio.create_task(_watch_access(chat_id, user, token)),
+    ]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        subscription.close()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # a task that failed re-raises here, so the server logs the error and closes the socket
+    close_codes = [task.result() for task in tasks if task in done]
+    close_code = next((code for code in close_codes if code is not None), None)
+    if close_code is not None:
+        await send({'type': 'websocket.close', 'code': close_code})
+
+
+async def _watch_access(chat_id, user, token):
+    """Closes the socket once the user's session ends or they leave the chat, even if they never post."""
+    while True:
+        await asyncio.sleep(settings.CHAT_SOCKET_RECHECK_SECONDS)
+        if not await may_use_chat(chat_id, user, token):
+            return CLOSE_FORBIDDEN
+
+
+async def _read_client(receive, subscription, chat_id, user, token):
+    while True:
+        message = await receive()
+        if message['type'] == 'websocket.disconnect':
+            return None
+        if message['type'] != 'websocket.receive':
+            continue
+
+        try:
+            payload = json.loads(message.get('text') or '')
+        except ValueError:
+            payload = None
+        content = payload.get('content') if isinstance(payload, dict) and payload.get('type') == 'message.send' else None
+
+        if not content:
+            # errors go through the subscriber's own queue so only the writer calls send()
+            subscription.deliver({'type': 'error', 'detail': 'Expected {"type": "message.send", "content": "..."}.'})
+            continue
+        if not await create_message(chat_id, user, token, content):
+            return CLOSE_FORBIDDEN
+
+
+async def _write_events(send, subscription):
+    while True:
+        event = await subscription.get()
+        if event is OVERFLOW:
+            await send({'type': 'websocket.close', 'code': CLOSE_TRY_AGAIN_LATER})
+            return None
+        await send({'type': 'websocket.send', 'text': json.dumps(event)})
@@ -0,0 +1,382 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, namedtuple
+from itertools import chain
+
+from django.db import models, transaction
+from django.utils import timezone
+
+from .models import Availability, Shift, SwapCycle, SwapOffer, User
+from .caching import invalidate_cached_responses
+from .recommend import get_organisation_index, invalidate_organisation_index
+from .swaps import SwapConflict
+
+# Longest rotation proposed; longer ones are hard to agree to and rarely needed
+MAX_CYCLE_LENGTH = 4
+# Search steps spent looking for a cycle through one offer before giving up on it
+SEARCH_BUDGET = 5000
+# Cycles saved per transaction, keeping each UPDATE's parameters under database limits
+SAVE_BATCH_SIZE = 100
+
+OfferNode = namedtuple('OfferNode', 'offer_id shift_id user_id start end')
+
+
+class OfferGraph:
+    """
+    Which offered shifts each offering employee could work once they have given their own
+    away, for offers sharing a role title (only those can ever be exchanged).
+
+    Offers are numbered by start time and each one's blocked offers (its employee's own,
+    and those overlapping their other shifts or unavailability) are kept as a bitmask, so
+    one busy interval costs two binary searches and a mask operation rather than a check
+    against every other offer. Successors are read off the masks as the search asks for them.
+    """
+
+    def __init__(self, nodes, index):
+        self.nodes = sorted(nodes, key=lambda node: (node.start, node.offer_id))
+        self.offer_ids = [node.offer_id for node in self.nodes]
+        self.bits = {offer_id: bit for bit, offer_id in enumerate(self.offer_ids)}
+        self.starts = [node.start for node in self.nodes]
+        by_end = sorted(range(len(self.nodes)), key=lambda bit: self.nodes[bit].end)
+        self.ends = [self.nodes[bit].end for bit in by_end]
+        # ended_by[k]: the k offers that end first
+        self.ended_by = [0]
+        for bit in by_end:
+            self.ended_by.append(self.ended_by[-1] | 1 << bit)
+        self.own = defaultdict(int)
+        for bit, node in enumerate(self.nodes):
+            self.own[node.user_id] |= 1 << bit
+
+        self.blocked = []
+        for node in self.nodes:
+            blocked = self.own[node.user_id]
+            for busy_start, busy_end, shift_id in index.busy.get(node.user_id, ()):
+                if shift_id != node.shift_id:
+                    blocked |= self._overlapping(busy_start, busy_end)
+            self.blocked.append(blocked)
+        self.live = self._prune((1 << len(self.nodes)) - 1)
+
+    def _overlapping(self, start, end):
+        # offers starting before the interval ends, less those that end before it starts
+        return ((1 << bisect_left(self.starts, end)) - 1) & ~self.ended_by[bisect_right(self.ends, start)]
+
+    def reserve(self, user_id, start, end):
+        """Marks the employee busy from `start` to `end`, so none of their offers leads to a shift then."""
+        overlapping = self._overlapping(start, end)
+        for bit in _bits(self.own.get(user_id, 0)):
+            self.blocked[bit] |= overlapping
+
+    def accept(self, cycle):
+        """Reserves the shift each employee in `cycle` receives, so no later cycle overlaps it."""
+        for position, offer_id in enumerate(cycle):
+            taker = self.nodes[self.bits[offer_id]]
+            received = self.nodes[self.bits[cycle[(position + 1) % len(cycle)]]]
+            self.reserve(taker.user_id, received.start, received.end)
+
+    def _prune(self, live):
+        """Repeatedly drops offers nobody can take or whose owner can take nothing: they are in no cycle."""
+        while True:
+            can_leave, can_enter = 0, 0
+            for bit in _bits(live):
+                targets = live & ~self.blocked[bit]
+                if targets:
+                    can_leave |= 1 << bit
+                    can_enter |= targets
+            if live & can_leave & can_enter == live:
+                return live
+            live &= can_leave & can_enter
+
+    def __iter__(self):
+        return (self.offer_ids[bit] for bit in _bits(self.live))
+
+    def successors(self, offer_id):
+        # starting just after the offer itself passes over those earlier searches already matched last
+        bit = self.bits[offer_id]
+        targets = self.live & ~self.blocked[bit]
+        later = targets >> (bit + 1) << (bit + 1)
+        for target in chain(_bits(later), _bits(targets ^ later)):
+            yield self.offer_ids[target]
+
+    def has_edge(self, offer_id, target):
+        bit = self.bits[target]
+        return bool(self.live >> bit & 1) and not self.blocked[self.bits[offer_id]] >> bit & 1
+
+
+def _bits(mask):
+    """Positions of the set bits in `mask`, lowest first."""
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+class Adjacency:
+    """A graph given as each node's set of successors."""
+
+    def __init__(self, adjacency):
+        self.adjacency = _trim({node: set(targets) for node, targets in adjacency.items()})
+
+    def __iter__(self):
+        return iter(sorted(self.adjacency))
+
+    def successors(self, node):
+        return self.adjacency[node]
+
+    def has_edge(self, node, target):
+        return target in self.adjacency[node]
+
+    def accept(self, cycle):
+        pass  # no times to reserve
+
+
+def _trim(adjacency):
+    """Repeatedly drops offers nobody can take or whose owner can take nothing: they are in no cycle."""
+    incoming = defaultdict(set)
+    for node, targets in adjacency.items():
+        for target in targets:
+            incoming[target].add(node)
+
+    live = set(adjacency)
+    stack = [node for node in live if not adjacency[node] or not incoming[node]]
+    while stack:
+        node = stack.pop()
+        if node not in live:
+            continue
+        live.discard(node)
+        for target in adjacency[node]:
+            incoming[target].discard(node)
+            if target in live and not incoming[target]:
+                stack.append(target)
+        for source in incoming[node]:
+            adjacency[source].discard(node)
+            if source in live and not adjacency[source]:
+                stack.append(source)
+    return {node: adjacency[node] & live for node in live}
+
+
+def find_cycles(graph, max_length=MAX_CYCLE_LENGTH, budget=SEARCH_BUDGET):
+    """
+    Picks disjoint cycles greedily, preferring the shortest rotation through each offer in
+    turn. Each search is a depth-bounded DFS over offers not yet matched, capped at `budget`
+    steps so dense graphs stay fast. Each accepted cycle is reserved in the graph, so an
+    employee with several offers is never handed overlapping shifts by different cycles.
+    `graph` is an OfferGraph, or a dict from each node to the set of nodes it has edges to.
+    """
+    if isinstance(graph, dict):
+        graph = Adjacency(graph)
+    used = set()
+    cycles = []
+    for start in graph:
+        if start in used:
+            continue
+        for length in range(2, max_length + 1):
+            path = _cycle_through(graph, start, length, used, budget)
+            if path:
+                cycles.append(path)
+                used.update(path)
+                graph.accept(path)
+                break
+    return cycles
+
+
+def _cycle_through(graph, start, length, used, budget):
+    path = [start]
+    steps = 0
+
+    def extend(node, remaining):
+        nonlocal steps
+        if remaining == 1:
+            return graph.has_edge(node, start)
+        for target in graph.successors(node):
+            steps += 1
+            if steps > budget:
+                return False
+            if target in used or target in path:
+                continue
+            path.append(target)
+            if extend(target, remaining - 1):
+                return True
+            path.pop()
+        return False
+
+    return list(path) if extend(start, length) else None
+
+
+def open_offers(organisation_id):
+    """Unmatched offers whose shift is still upcoming and still held by the offering employee."""
+    return SwapOffer.objects.filter(
+        closed_at__isnull=True,
+        cycle__isnull=True,
+        offered_by__organisation_id=organisation_id,
+        shift__employee_id=models.F('offered_by_id'),
+        shift__start_time__gt=timezone.now(),
+    )
+
+
+def propose_cycles(organisation_id):
+    """Matches the organisation's open offers into new swap cycles and returns them."""
+    index = get_organisation_index(organisation_id)
+    by_role = defaultdict(list)
+    rows = open_offers(organisation_id).values_list(
+        'id', 'shift_id', 'offered_by_id', 'shift__start_time', 'shift__end_time'
+    )
+    for row in rows:
+        node = OfferNode(*row)
+        employee = index.employees.get(node.user_id)
+        if employee is not None:
+            by_role[employee.role_title_id].append(node)
+
+    pending = _pending_receipts(organisation_id)
+    matches = []
+    for nodes in by_role.values():
+        graph = OfferGraph(nodes, index)
+        for user_id, start, end in pending:
+            graph.reserve(user_id, start, end)
+        matches.extend(find_cycles(graph))
+    proposed = []
+    for start in range(0, len(matches), SAVE_BATCH_SIZE):
+        proposed.extend(_save_cycles(organisation_id, matches[start:start + SAVE_BATCH_SIZE]))
+    return proposed
+
+
+def _pending_receipts(organisation_id):
+    """(user_id, start, end) of each shift an employee will receive from a cycle not yet executed."""
+    legs = defaultdict(list)
+    rows = SwapOffer.objects.filter(
+        cycle__organisation_id=organisation_id, cycle__executed_at__isnull=True, closed_at__isnull=True
+    ).order_by('cycle_id', 'cycle_position').values_list('cycle_id', 'offered_by_id', 'shift__start_time', 'shift__end_time')
+    for cycle_id, *leg in rows:
+        legs[cycle_id].append(leg)
+    return [
+        (user_id, *cycle_legs[(position + 1) % len(cycle_legs)][1:])
+        for cycle_legs in legs.values()
+        for position, (user_id, _, _) in enumerate(cycle_legs)
+    ]
+
+
+def _save_cycles(organisation_id, matches):
+    """Saves each list of offer IDs as a cycle, leaving out any cycle whose offers were taken meanwhile."""
+    with transaction.atomic():
+        cycles = SwapCycle.objects.bulk_create([SwapCycle(organisation_id=organisation_id) for _ in matches])
+        at_position = defaultdict(list)
+        for offer_ids in matches:
+            for position, offer_id in enumerate(offer_ids):
+                at_position[position].append(offer_id)
+        SwapOffer.objects.filter(
+            id__in=[offer_id for offer_ids in matches for offer_id in offer_ids], cycle__isnull=True, closed_at__isnull=True
+        ).update(
+            cycle_id=models.Case(*[
+                models.When(id__in=offer_ids, then=models.Value(cycle.id)) for cycle, offer_ids in zip(cycles, matches)
+            ]),
+            cycle_position=models.Case(*[
+                models.When(id__in=offer_ids, then=models.Value(position)) for position, offer_ids in at_position.items()
+            ]),
+        )
+        claimed = dict(
+            SwapOffer.objects.filter(cycle__in=cycles).values('cycle_id').annotate(count=models.Count('id'))
+            .values_list('cycle_id', 'count')
+        )
+        # another matcher or a withdrawal got to one of these cycles' offers first
+        lost = [cycle.id for cycle, offer_ids in zip(cycles, matches) if claimed.get(cycle.id) != len(offer_ids)]
+        if lost:
+            SwapOffer.objects.filter(cycle_id__in=lost).update(cycle=None, cycle_position=None)
+            SwapCycle.objects.filter(id__in=lost).delete()
+    return [cycle for cycle in cycles if cycle.id not in lost]
+
+
+def execute_cycle(cycle):
+    """
+    Moves every shift in the cycle to its new employee in one transaction, or none of them.
+    Each move is conditional on the shift still belonging to the offering employee, and the
+    whole rotation is re-checked against the employees' current shifts and availability
+    first. A cycle that no longer fits is dissolved, returning its offers to the pool.
+    """
+    try:
+        return _execute(cycle)
+    except SwapConflict:
+        with transaction.atomic():
+            _dissolve(cycle.id)
+        raise
+
+
+def _execute(cycle):
+    now = timezone.now()
+    with transaction.atomic():
+        if not SwapCycle.objects.filter(id=cycle.id, executed_at__isnull=True).update(executed_at=now):
+            raise SwapConflict("Swap cycle has already been executed.")
+
+        offers = list(cycle.offers.select_related('shift').order_by('cycle_position'))
+        if len(offers) < 2 or any(offer.closed_at for offer in offers):
+            raise SwapConflict("Swap cycle is no longer complete.")
+
+        moves = {}
+        for position, offer in enumerate(offers):
+            moves[offers[(position + 1) % len(offers)]] = offer
+        # hold the employees' shifts until commit: a concurrent cycle handing one of them a shift
+        # waits on these rows, then sees this cycle's moves in its own check
+        list(
+            Shift.objects.select_for_update()
+            .filter(employee_id__in={offer.offered_by_id for offer in offers}, end_time__gt=now)
+            .order_by('id').values_list('id', flat=True)
+        )
+        if not _rotation_fits(cycle.organisation_id, moves, now):
+            raise SwapConflict("Swap cycle no longer fits everyone's availability.")
+
+        held = models.Q()
+        for target in moves:
+            held |= models.Q(id=target.shift_id, employee_id=target.offered_by_id)
+        moved = Shift.objects.filter(held).update(
+            employee_id=models.Case(*[
+                models.When(id=target.shift_id, then=models.Value(offer.offered_by_id))
+                for target, offer in moves.items()
+            ]),
+            swap_approved=True,
+            is_swap_requested=False,
+        )
+        if moved != len(moves):
+            raise SwapConflict("A shift in the cycle changed hands before it could be executed.")
+
+        SwapOffer.objects.filter(id__in=[offer.id for offer in offers]).update(closed_at=now)
+        transaction.on_commit(lambda: invalidate_organisation_index(cycle.organisation_id))
+        invalidate_cached_responses(organisation_ids=[cycle.organisation_id])
+    return offers
+
+
+def _rotation_fits(organisation_id, moves, now):
+    """
+    Checks each move against the database rather than the cached index, which may predate
+    the latest writes: the shift is upcoming, and the employee taking it shares its owner's
+    role and has no other shift or unavailability at that time.
+    """
+    if any(target.shift.start_time <= now for target in moves):
+        return False
+    user_ids = {target.offered_by_id for target in moves}
+    roles = dict(
+        User.objects.filter(id__in=user_ids, organisation_id=organisation_id, role='employee', is_active=True)
+        .values_list('id', 'role_title_id')
+    )
+    if len(roles) != len(user_ids) or any(
+        roles[target.offered_by_id] != roles[offer.offered_by_id] for target, offer in moves.items()
+    ):
+        return False
+
+    clashing_shifts, clashing_blocks = models.Q(), models.Q()
+    for target, offer in moves.items():
+        during = models.Q(start_time__lt=target.shift.end_time, end_time__gt=target.shift.start_time)
+        clashing_shifts |= during & models.Q(employee_id=offer.offered_by_id) & ~models.Q(id=offer.shift_id)
+        clashing_blocks |= during & models.Q(user_id=offer.offered_by_id)
+    return not Shift.objects.filter(clashing_shifts).exists() and not Availability.objects.filter(clashing_blocks).exists()
+
+
+def _dissolve(cycle_id):
+    """Returns an unexecuted cycle's offers to the pool and deletes the cycle."""
+    SwapOffer.objects.filter(cycle_id=cycle_id, cycle__executed_at__isnull=True).update(cycle=None, cycle_position=None)
+    SwapCycle.objects.filter(id=cycle_id, executed_at__isnull=True).delete()
+
+
+def withdraw_offer(offer):
+    """Closes an offer and dissolves any unexecuted cycle it was part of."""
+    with transaction.atomic():
+        if not SwapOffer.objects.filter(id=offer.id, closed_at__isnull=True).update(closed_at=timezone.now()):
+            raise SwapConflict("Swap offer is already closed.")
+        if offer.cycle_id is not None:
+            _dissolve(offer.cycle_id)
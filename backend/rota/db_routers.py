@@ -0,0 +1,106 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpRequest
+from rest_framework.request import Request
+
+REPLICA_DB_ALIAS = 'replica'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def _sticky_key(user_id):
+    return f"replica-sticky:{user_id}"
+
+
+def mark_recent_write(user_id):
+    """Keeps the user's reads on the primary while their latest writes may not have replicated."""
+    if replica_configured() and user_id is not None:
+        cache.set(_sticky_key(user_id), True, settings.DATABASE_REPLICA_STICKY_SECONDS)
+
+
+def wrote_recently(user_id):
+    return user_id is not None and cache.get(_sticky_key(user_id)) is not None
+
+
+@contextmanager
+def replica_reads(user_id=None):
+    """
+    Sends reads inside the block to the replica, unless `user_id` wrote within the last
+    DATABASE_REPLICA_STICKY_SECONDS. Writes always go to the primary.
+    """
+    use_replica = replica_configured() and not wrote_recently(user_id)
+    token = _replica_reads.set(use_replica)
+    try:
+        yield use_replica
+    finally:
+        _replica_reads.reset(token)
+
+
+def read_only_view(view):
+    """
+    Routes a read-only view's queries to the replica. Place it directly above the view
+    function or method so it runs after DRF has authenticated the request.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        request = next(arg for arg in args if isinstance(arg, (Request, HttpRequest)))
+        with replica_reads(getattr(request.user, 'id', None)) as use_replica:
+            # tells cache_response not to store what the replica returned
+            request.read_from_replica = use_replica
+            return view(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Reads go to the replica inside `replica_reads`; everything else uses the primary."""
+
+    def db_for_read(self, model, **hints):
+        return REPLICA_DB_ALIAS if _replica_reads.get() else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # both aliases hold the same data
+        return True
+
+
+class ReplicaStickinessMiddleware:
+    """Marks authenticated users who just made a write request as sticky to the primary."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self._mark(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            # the user may still be a lazy object that loads from the session
+            await sync_to_async(self._mark)(request)
+        return response
+
+    def _mark(self, request):
+        # DRF copies the user it authenticated onto the underlying request
+        user = getattr(request, 'user', None)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and user is not None and user.is_authenticated:
+            mark_recent_write(user.id)
@@ -0,0 +1,164 @@
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from rota.authentication import RotaTokenObtainPairSerializer
+from rota.models import Chat, Message, Organisation, User
+from rota.pagination import Cursor, encode_cursor
+
+# Extra seconds a client waits beyond the long poll before giving up on a response
+CLIENT_GRACE = 10
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def _get(port, path, token, timeout):
+    """One HTTP/1.1 GET on its own connection; returns (status or None on timeout/error, seconds)."""
+    started = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAuthorization: Bearer {token}\r\n"
+            f"Connection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout - (time.perf_counter() - started))
+        await asyncio.wait_for(reader.read(), timeout - (time.perf_counter() - started))
+        writer.close()
+        return int(status_line.split()[1]), time.perf_counter() - started
+    except (OSError, ValueError, IndexError, asyncio.TimeoutError):
+        return None, time.perf_counter() - started
+
+
+async def _run_load(port, token, poll_path, probe_path, connections, wait, probes):
+    """Holds `connections` long polls open while timing `probes` sequential quick requests."""
+    polls = [
+        asyncio.create_task(_get(port, poll_path, token, wait + CLIENT_GRACE))
+        for _ in range(connections)
+    ]
+    await asyncio.sleep(min(1, wait / 2))  # let the polls occupy the server first
+    probe_results = []
+    for _ in range(probes):
+        probe_results.append(await _get(port, probe_path, token, wait + CLIENT_GRACE))
+    return await asyncio.gather(*polls), probe_results
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares how many concurrent connections the ASGI and WSGI deployments can hold. Starts "
+        "each server on a local port, opens many chat long polls at once, and times quick "
+        "notification requests made while the polls are held. The ASGI run uses the /api/async/ "
+        "views under uvicorn; the WSGI run uses the regular views under gunicorn."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=100, help="Concurrent long polls to hold open.")
+        parser.add_argument('--wait', type=int, default=5, help="Seconds each long poll waits for a message.")
+        parser.add_argument('--probes', type=int, default=10, help="Quick requests timed while the polls are held.")
+        parser.add_argument('--server', choices=['asgi', 'wsgi', 'both'], default='both')
+        parser.add_argument('--workers', type=int, default=4, help="gunicorn worker processes for the WSGI run.")
+        parser.add_argument('--threads', type=int, default=2, help="Threads per gunicorn worker for the WSGI run.")
+
+    def handle(self, *args, **options):
+        if options['wait'] > settings.CHAT_LONG_POLL_TIMEOUT:
+            raise CommandError(f"--wait cannot exceed CHAT_LONG_POLL_TIMEOUT ({settings.CHAT_LONG_POLL_TIMEOUT}s).")
+
+        organisation = Organisation.objects.create(name=f"bench-{uuid.uuid4().hex[:8]}")
+        user = User.objects.create_user(username=organisation.name, password=None, role='employee', organisation=organisation)
+        chat = Chat.objects.create(title="Benchmark", created_by=user)
+        chat.participants.set([user])
+        message = Message.objects.create(chat=chat, sender=user, content="benchmark")
+        token = str(RotaTokenObtainPairSerializer.get_token(user).access_token)
+        after = encode_cursor(Cursor(message.timestamp, message.id, 0))
+        query = f"?after={after}&wait={options['wait']}"
+
+        servers = ['asgi', 'wsgi'] if options['server'] == 'both' else [options['server']]
+        try:
+            for server in servers:
+                if server == 'asgi':
+                    poll_path, probe_path = f"/api/async/chats/{chat.id}/messages/{query}", "/api/async/notifications/"
+                else:
+                    poll_path, probe_path = f"/api/chats/{chat.id}/messages/{query}", "/api/notifications/"
+                self._bench(server, options, token, poll_path, probe_path)
+        finally:
+            chat.delete()
+            user.delete()
+            organisation.delete()
+
+    def _command(self, server, port, options):
+        if server == 'asgi':
+            return [
+                sys.executable, '-m', 'uvicorn', 'backend.asgi:application',
+                '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning',
+            ]
+        return [
+            sys.executable, '-m', 'gunicorn', 'backend.wsgi:application', '--bind', f'127.0.0.1:{port}',
+            '--workers', str(options['workers']), '--threads', str(options['threads']),
+            '--timeout', str(options['wait'] + 30), '--log-level', 'warning',
+        ]
+
+    def _bench(self, server, options, token, poll_path, probe_path):
+        port = _free_port()
+        env = {**os.environ, 'DJANGO_SECURE_SSL_REDIRECT': 'false', 'DJANGO_ALLOWED_HOSTS': '127.0.0.1'}
+        if server == 'wsgi':
+            # let the sync view hold polls for the full wait, to show what that costs
+            env['CHAT_SYNC_LONG_POLL_TIMEOUT'] = str(options['wait'])
+        process = subprocess.Popen(self._command(server, port, options), cwd=settings.BASE_DIR, env=env)
+        try:
+            self._wait_until_listening(port, process)
+            started = time.perf_counter()
+            polls, probes = asyncio.run(_run_load(
+                port, token, poll_path, probe_path, options['connections'], options['wait'], options['probes']
+            ))
+            elapsed = time.perf_counter() - started
+        finally:
+            # queued requests would otherwise hold up a graceful shutdown
+            process.kill()
+            process.wait()
+        self._report(server, options, polls, probes, elapsed)
+
+    def _wait_until_listening(self, port, process, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"The server exited with status {process.returncode}.")
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f"The server did not start listening within {timeout}s.")
+
+    def _report(self, server, options, polls, probes, elapsed):
+        if server == 'asgi':
+            label = "ASGI (uvicorn, 1 process, async views)"
+        else:
+            label = f"WSGI (gunicorn, {options['workers']} workers x {options['threads']} threads, sync views)"
+        completed = [seconds for status, seconds in polls if status == 200]
+        answered = sorted(seconds for status, seconds in probes if status == 200)
+
+        self.stdout.write(label)
+        self.stdout.write(
+            f"  Long polls:  {len(completed)}/{len(polls)} answered within {options['wait'] + CLIENT_GRACE}s"
+            + (f", slowest {max(completed):.1f}s" if completed else "")
+        )
+        if answered:
+            self.stdout.write(
+                f"  Probes:      {len(answered)}/{len(probes)} answered while polls were held, "
+                f"p50 {statistics.median(answered) * 1000:.0f} ms, max {answered[-1] * 1000:.0f} ms"
+            )
+        else:
+            self.stdout.write(f"  Probes:      0/{len(probes)} answered while polls were held")
+        self.stdout.write(f"  Wall time:   {elapsed:.1f}s")
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import time
+import uuid
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+
+from rota.authentication import RotaTokenObtainPairSerializer
+from rota.consumers import chat_socket
+from rota.models import Chat, Organisation, User
+from rota.realtime import get_hub
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests the real-time chat socket in this process: connects simulated clients to one "
+        "room, has them post messages and reports messages and deliveries per second."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=50, help="Connected sockets in the room.")
+        parser.add_argument('--senders', type=int, default=5, help="How many of the clients post messages.")
+        parser.add_argument('--messages', type=int, default=200, help="Messages posted by each sender.")
+
+    def handle(self, *args, **options):
+        clients, senders = options['clients'], min(options['senders'], options['clients'])
+        organisation = Organisation.objects.create(name=f"bench-{uuid.uuid4().hex[:8]}")
+        users = [
+            User.objects.create_user(username=f"{organisation.name}-{i}", password=None, role='employee', organisation=organisation)
+            for i in range(clients)
+        ]
+        chat = Chat.objects.create(title="Benchmark", created_by=users[0])
+        chat.participants.set(users)
+
+        try:
+            fan_out_rate = async_to_sync(self._bench_fan_out)(chat.id, clients, options['messages'] * senders)
+            sent, delivered, elapsed = async_to_sync(self._bench_sockets)(chat.id, users, senders, options['messages'])
+        finally:
+            chat.delete()
+            User.objects.filter(organisation=organisation).delete()
+            organisation.delete()
+
+        self.stdout.write(f"Hub fan-out only:       {fan_out_rate:,.0f} deliveries/s")
+        self.stdout.write(f"Socket end-to-end:      {sent / elapsed:,.0f} messages/s persisted and broadcast")
+        self.stdout.write(f"                        {delivered / elapsed:,.0f} deliveries/s to {clients} clients")
+
+    async def _bench_fan_out(self, chat_id, clients, messages):
+        """Publishes straight into the hub to measure the in-memory fan-out on its own."""
+        hub = get_hub()
+        subscriptions = [hub.subscribe(chat_id) for _ in range(clients)]
+        received = 0
+        started = time.perf_counter()
+        try:
+            for i in range(messages):
+                hub.publish(chat_id, {"n": i})
+                # drain as a well-behaved consumer would, so back-pressure never kicks in
+                for subscription in subscriptions:
+                    await subscription.get()
+                    received += 1
+        finally:
+            for subscription in subscriptions:
+                subscription.close()
+        return received / (time.perf_counter() - started)
+
+    async def _bench_sockets(self, chat_id, users, senders, messages_each):
+        sockets = []
+        for user in users:
+            inbox, outbox = asyncio.Queue(), asyncio.Queue()
+            scope = {
+                "type": "websocket",
+                "path": f"/ws/chats/{chat_id}/",
+                "query_string": f"token={RotaTokenObtainPairSerializer.get_token(user).access_token}".encode(),
+            }
+            task = asyncio.create_task(chat_socket(scope, inbox.get, outbox.put))
+            await inbox.put({"type": "websocket.connect"})
+            accepted = await outbox.get()
+            if accepted["type"] != "websocket.accept":
+                raise RuntimeError(f"Socket for {user.username} was refused: {accepted}")
+            sockets.append((inbox, outbox, task))
+
+        expected = senders * messages_each
+
+        async def consume(outbox):
+            count = 0
+            while count < expected:
+                event = await outbox.get()
+                if event["type"] == "websocket.close":
+                    raise RuntimeError(f"Socket closed during benchmark (code {event['code']})")
+                count += 1
+            return count
+
+        started = time.perf_counter()
+        consumers = [asyncio.create_task(consume(outbox)) for _, outbox, _ in sockets]
+        for i in range(messages_each):
+            for inbox, _, _ in sockets[:senders]:
+                await inbox.put({"type": "websocket.receive", "text": json.dumps({"type": "message.send", "content": f"load test {i}"})})
+        delivered = sum(await asyncio.gather(*consumers))
+        elapsed = time.perf_counter() - started
+
+        for inbox, _, task in sockets:
+            await inbox.put({"type": "websocket.disconnect"})
+            await task
+        return expected, delivered, elapsed
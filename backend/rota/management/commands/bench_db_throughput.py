@@ -0,0 +1,125 @@
+import multiprocessing
+import random
+import statistics
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings
+
+from rota.authentication import RotaTokenObtainPairSerializer
+from rota.models import Chat, Notification, NotificationReadStatus, Organisation, User
+
+
+def run_clients(user_ids, chat_id, duration, write_ratio):
+    """Runs one simulated client thread per user until `duration` elapses; returns (latency, status) pairs."""
+    results = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client_loop(user):
+        token = RotaTokenObtainPairSerializer.get_token(user).access_token
+        # count failures such as "database is locked" as errors rather than stopping the client
+        client = Client(raise_request_exception=False, HTTP_AUTHORIZATION=f"Bearer {token}")
+        local = []
+        try:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                if random.random() < write_ratio:
+                    response = client.post(
+                        f"/api/chats/{chat_id}/send/", {"content": "benchmark"},
+                        content_type="application/json", secure=True
+                    )
+                elif random.random() < 0.5:
+                    response = client.get("/api/notifications/", secure=True)
+                else:
+                    response = client.get(f"/api/chats/{chat_id}/messages/", {"limit": 20}, secure=True)
+                local.append((time.perf_counter() - started, response.status_code))
+        finally:
+            connection.close()
+            with lock:
+                results.extend(local)
+
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        workers = [threading.Thread(target=client_loop, args=(user,)) for user in User.objects.filter(id__in=user_ids)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures request throughput against the configured database: simulated clients replay a "
+        "mix of reads and writes through the full Django stack and the command reports "
+        "requests per second, latency and errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent simulated clients in total.")
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help="Worker processes to spread the clients over, like gunicorn workers (forked; POSIX only)."
+        )
+        parser.add_argument('--duration', type=float, default=10, help="Seconds to run for.")
+        parser.add_argument('--write-ratio', type=float, default=0.2, help="Fraction of requests that write.")
+
+    def handle(self, *args, **options):
+        threads, processes = options['threads'], max(1, min(options['processes'], options['threads']))
+        organisation = Organisation.objects.create(name=f"bench-{uuid.uuid4().hex[:8]}")
+        users = [
+            User.objects.create_user(username=f"{organisation.name}-{i}", password=None, role='employee', organisation=organisation)
+            for i in range(threads)
+        ]
+        chat = Chat.objects.create(title="Benchmark", created_by=users[0])
+        chat.participants.set(users)
+        for i in range(20):
+            notification = Notification.objects.create(message=f"Benchmark notice {i}")
+            NotificationReadStatus.objects.bulk_create(NotificationReadStatus(user=user, notification=notification) for user in users)
+
+        user_ids = [user.id for user in users]
+        args = (chat.id, options['duration'], options['write_ratio'])
+        started = time.perf_counter()
+        try:
+            if processes == 1:
+                results = run_clients(user_ids, *args)
+            else:
+                # children must not inherit the parent's open connections
+                connections.close_all()
+                with multiprocessing.get_context('fork').Pool(processes) as pool:
+                    chunks = pool.starmap(run_clients, [(user_ids[i::processes], *args) for i in range(processes)])
+                results = [result for chunk in chunks for result in chunk]
+            elapsed = time.perf_counter() - started
+        finally:
+            chat.delete()
+            Notification.objects.filter(recipients__organisation=organisation).delete()
+            User.objects.filter(organisation=organisation).delete()
+            organisation.delete()
+
+        self._report(results, elapsed, threads, processes)
+
+    def _report(self, results, elapsed, threads, processes):
+        database = settings.DATABASES['default']
+        options = database.get('OPTIONS', {})
+        self.stdout.write(
+            f"Database:    {connection.vendor} ({database['NAME']}), CONN_MAX_AGE={database.get('CONN_MAX_AGE')}, "
+            f"pool={options.get('pool') or 'off'}, transaction_mode={options.get('transaction_mode', 'default')}"
+        )
+        if not results:
+            self.stdout.write("No requests completed.")
+            return
+
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(1 for _, status in results if status >= 400)
+        self.stdout.write(f"Requests:    {len(results):,} from {threads} clients in {processes} processes over {elapsed:.1f}s")
+        self.stdout.write(f"Throughput:  {len(results) / elapsed:,.1f} requests/s")
+        self.stdout.write(
+            f"Latency:     p50 {statistics.median(latencies) * 1000:.1f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms"
+        )
+        self.stdout.write(f"Errors:      {errors}")
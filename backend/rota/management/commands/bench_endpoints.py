@@ -0,0 +1,163 @@
+import json
+import logging
+import statistics
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rota.benchmarking import Fixtures, access_token, case_label, endpoint_cases, url_names
+from rota.caching import invalidate_cached_responses
+from rota.models import Organisation
+from rota.seeding import seed_organisation
+
+DEFAULT_BASELINE = settings.BASE_DIR / 'benchmarks' / 'endpoint_baseline.json'
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Times every endpoint in rota/urls.py against a large synthetic organisation and compares "
+        "latency and query counts with a stored baseline, failing if any endpoint got worse. Each "
+        "write runs in a transaction that is rolled back, so every iteration sees the same data. "
+        "The organisation is seeded on first use with `seed_organisation`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', default='bench', help="Organisation to benchmark against.")
+        parser.add_argument('--employees', type=int, default=200, help="Employees to seed if the organisation doesn't exist.")
+        parser.add_argument('--password', default='benchmark', help="Password the organisation's users were seeded with.")
+        parser.add_argument('--iterations', type=int, default=10, help="Timed requests per endpoint.")
+        parser.add_argument('--warmup', type=int, default=1, help="Untimed requests per endpoint first.")
+        parser.add_argument('--only', nargs='*', default=None, help="Benchmark only these URL names.")
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help="Baseline JSON file.")
+        parser.add_argument('--update-baseline', action='store_true', help="Write this run's results as the new baseline.")
+        parser.add_argument(
+            '--tolerance', type=float, default=0.5,
+            help="Fraction median latency may grow over the baseline before it counts as a regression."
+        )
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=5.0,
+            help="Latency growth below this many milliseconds is never a regression."
+        )
+
+    def handle(self, *args, **options):
+        cases = endpoint_cases()
+        missing = url_names() - {case.name for case in cases}
+        if missing:
+            raise CommandError(f"No benchmark case for: {', '.join(sorted(missing))}. Add them to rota.benchmarking.endpoint_cases.")
+        if options['only']:
+            cases = [case for case in cases if case.name in options['only']]
+
+        if not Organisation.objects.filter(name=options['name']).exists():
+            self.stdout.write(f"Seeding organisation {options['name']!r} with {options['employees']} employees...")
+            seed_organisation(options['name'], employees=options['employees'], password=options['password'])
+        fixtures = Fixtures(options['name'], options['password'])
+        employees = fixtures.organisation.user_set.filter(role='employee').count()
+
+        # the table below reports the same query counts the request log would warn about
+        logging.getLogger('rota.requests').setLevel(logging.ERROR)
+        client = Client(raise_request_exception=False)
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for case in cases:
+                results[case_label(case)] = self._bench(client, fixtures, case, options)
+
+        self._report(results)
+        if options['update_baseline']:
+            with open(options['baseline'], 'w') as baseline:
+                json.dump({"employees": employees, "endpoints": results}, baseline, indent=2, sort_keys=True)
+                baseline.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote baseline to {options['baseline']}."))
+            return
+        self._compare(results, employees, options)
+
+    def _request(self, client, fixtures, case):
+        user = fixtures.user(case.actor)
+        headers = {'Authorization': f"Bearer {access_token(user)}"} if user else {}
+        path, body = fixtures.path(case), fixtures.body(case)
+        # drop cached responses so every request does the full work
+        invalidate_cached_responses(user_ids=[user.id] if user else (), organisation_ids=[fixtures.organisation.id])
+
+        # writes are rolled back; reads run outside a transaction because the async views close
+        # connections found in one, as they would at the end of a request
+        with transaction.atomic() if case.method != 'GET' else nullcontext():
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.generic(
+                    case.method, path, body or '', content_type='application/json', secure=True, headers=headers
+                )
+                elapsed = time.perf_counter() - started
+            if case.method != 'GET':
+                transaction.set_rollback(True)
+        return response.status_code, elapsed, len(queries)
+
+    def _bench(self, client, fixtures, case, options):
+        for _ in range(options['warmup']):
+            self._request(client, fixtures, case)
+        statuses, timings, queries = set(), [], []
+        for _ in range(options['iterations']):
+            status, elapsed, count = self._request(client, fixtures, case)
+            statuses.add(status)
+            timings.append(elapsed * 1000)
+            queries.append(count)
+        return {
+            "status": max(statuses),
+            # the median leaves out housekeeping queries (like picking up revoked sessions) that
+            # run every so often in whichever request comes along
+            "queries": statistics.median_low(queries),
+            "p50_ms": round(statistics.median(timings), 2),
+            "p95_ms": round(_percentile(timings, 95), 2),
+            "max_ms": round(max(timings), 2),
+        }
+
+    def _report(self, results):
+        width = max(len(label) for label in results)
+        self.stdout.write(f"{'Endpoint':<{width}}  Status  Queries   p50 ms   p95 ms   max ms")
+        for label, result in results.items():
+            self.stdout.write(
+                f"{label:<{width}}  {result['status']:>6}  {result['queries']:>7}  "
+                f"{result['p50_ms']:>7.1f}  {result['p95_ms']:>7.1f}  {result['max_ms']:>7.1f}"
+            )
+
+    def _compare(self, results, employees, options):
+        try:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+        except FileNotFoundError:
+            self.stdout.write(f"No baseline at {options['baseline']}; run with --update-baseline to create one.")
+            return
+        if baseline['employees'] != employees:
+            self.stdout.write(self.style.WARNING(
+                f"The baseline was recorded with {baseline['employees']} employees and this organisation has "
+                f"{employees}; query counts and timings may not be comparable."
+            ))
+
+        regressions = []
+        for label, result in results.items():
+            base = baseline['endpoints'].get(label)
+            if base is None:
+                self.stdout.write(f"{label}: not in the baseline")
+                continue
+            if result['status'] != base['status']:
+                regressions.append(f"{label}: status {base['status']} -> {result['status']}")
+            if result['queries'] > base['queries']:
+                regressions.append(f"{label}: {base['queries']} -> {result['queries']} queries")
+            # p95 of a few iterations is the single slowest request, too noisy to fail on
+            allowed = max(base['p50_ms'] * (1 + options['tolerance']), base['p50_ms'] + options['min_delta_ms'])
+            if result['p50_ms'] > allowed:
+                regressions.append(f"{label}: p50 {base['p50_ms']:.1f} -> {result['p50_ms']:.1f} ms")
+
+        if regressions:
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(regression))
+            raise CommandError(f"{len(regressions)} regressions against {options['baseline']}.")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}."))
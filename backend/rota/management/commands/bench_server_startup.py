@@ -0,0 +1,128 @@
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# An endpoint that needs no database rows or authentication
+PROBE_PATH = '/api/testnoauth/'
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _children(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                # the parent pid is the second field after the parenthesised command name
+                if int(stat.read().rsplit(')', 1)[1].split()[1]) == pid:
+                    children.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return children
+
+
+def _memory_kb(pid):
+    """(RSS, PSS) of a process in kB. PSS splits shared pages between the processes sharing them."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as rollup:
+        for line in rollup:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                values[key] = int(rest.split()[0])
+    return values['Rss'], values['Pss']
+
+
+def _get(port):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        connection.request('GET', PROBE_PATH)
+        return connection.getresponse().status
+    except OSError:
+        return None
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Starts gunicorn with backend/gunicorn.conf.py with and without preload and reports "
+        "how long it takes to serve requests and how much memory the master and workers use. "
+        "Linux only (reads /proc)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=200, help="Warm-up requests sent before memory is measured.")
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            raise CommandError("This command reads /proc and needs Linux 4.14 or later.")
+        for preload in (False, True):
+            self._bench(preload, options)
+
+    def _bench(self, preload, options):
+        port = _free_port()
+        env = {
+            **os.environ,
+            'GUNICORN_BIND': f'127.0.0.1:{port}',
+            'GUNICORN_WORKERS': str(options['workers']),
+            'GUNICORN_PRELOAD': str(preload),
+            'GUNICORN_ACCESS_LOG': '',
+            'GUNICORN_LOG_LEVEL': 'warning',
+            'DJANGO_SECURE_SSL_REDIRECT': 'false',
+            'DJANGO_ALLOWED_HOSTS': '127.0.0.1',
+        }
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'backend.wsgi:application', '--config', 'gunicorn.conf.py'],
+            cwd=settings.BASE_DIR, env=env,
+        )
+        try:
+            first_response = self._wait_for_response(port, process) - started
+            while len(_children(process.pid)) < options['workers']:
+                time.sleep(0.05)
+            all_workers = time.perf_counter() - started
+
+            with ThreadPoolExecutor(max_workers=16) as pool:
+                statuses = list(pool.map(lambda _: _get(port), range(options['requests'])))
+            workers = _children(process.pid)
+            master = _memory_kb(process.pid)
+            per_worker = [_memory_kb(pid) for pid in workers]
+        finally:
+            process.kill()
+            process.wait()
+
+        rss = master[0] + sum(rss for rss, _ in per_worker)
+        pss = master[1] + sum(pss for _, pss in per_worker)
+        self.stdout.write(f"preload={'on' if preload else 'off'}, {len(workers)} workers")
+        self.stdout.write(f"  First response:   {first_response:.2f}s")
+        self.stdout.write(f"  All workers up:   {all_workers:.2f}s")
+        self.stdout.write(f"  Warm-up errors:   {sum(1 for status in statuses if status != 200)}/{len(statuses)}")
+        self.stdout.write(
+            f"  Memory:           RSS {rss / 1024:.0f} MB, PSS {pss / 1024:.0f} MB "
+            f"(master PSS {master[1] / 1024:.0f} MB, "
+            f"worker PSS {min(p for _, p in per_worker) / 1024:.0f}-{max(p for _, p in per_worker) / 1024:.0f} MB)"
+        )
+
+    def _wait_for_response(self, port, process, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"gunicorn exited with status {process.returncode}.")
+            if _get(port) == 200:
+                return time.perf_counter()
+            time.sleep(0.05)
+        raise CommandError(f"gunicorn did not answer within {timeout}s.")
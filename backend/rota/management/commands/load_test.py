@@ -0,0 +1,415 @@
+import asyncio
+import io
+import json
+import logging
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.test import override_settings
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from rota.benchmarking import access_token
+from rota.models import Chat, Role, ShiftSwapRequest, User
+from rota.seeding import delete_organisation, seed_organisation
+
+HOST = 'testserver'
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))]
+
+
+class WSGIDriver:
+    """Calls the WSGI application directly from the caller's thread, like a threaded WSGI server."""
+
+    def __init__(self):
+        self.application = get_wsgi_application()
+
+    def __call__(self, method, path, query, body, token):
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SCRIPT_NAME': '',
+            'SERVER_NAME': HOST,
+            'SERVER_PORT': '443',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'HTTP_HOST': HOST,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'https',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        if token:
+            environ['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        status = []
+        result = self.application(environ, lambda line, headers, exc_info=None: status.append(int(line.split()[0])))
+        try:
+            content = b''.join(result)
+        finally:
+            result.close()  # sends request_finished, which releases the thread's connection
+        return status[0], content
+
+    def close(self):
+        pass
+
+
+class ASGIDriver:
+    """
+    Runs the ASGI application on one event loop in a background thread, like uvicorn, and
+    hands it requests from the simulated users' threads.
+    """
+
+    def __init__(self):
+        self.application = get_asgi_application()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def __call__(self, method, path, query, body, token):
+        return asyncio.run_coroutine_threadsafe(self._request(method, path, query, body, token), self.loop).result()
+
+    async def _request(self, method, path, query, body, token):
+        headers = [(b'host', HOST.encode()), (b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+        if token:
+            headers.append((b'authorization', f'Bearer {token}'.encode()))
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method, 'scheme': 'https',
+            'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+            'headers': headers, 'client': ('127.0.0.1', 0), 'server': (HOST, 443),
+        }
+        received = False
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            await asyncio.Future()  # the client never disconnects early
+
+        response = {'status': None, 'body': []}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                response['body'].append(message.get('body', b''))
+
+        await self.application(scope, receive, send)
+        return response['status'], b''.join(response['body'])
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def record(self, label, status, seconds):
+        with self.lock:
+            self.latencies[label].append(seconds * 1000)
+            self.statuses[label][status] += 1
+
+
+class ErrorCollector(logging.Handler):
+    """Counts the exceptions behind 500 responses, which Django logs on `django.request`."""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.errors = Counter()
+
+    def emit(self, record):
+        if record.exc_info and record.exc_info[1] is not None:
+            error = record.exc_info[1]
+            self.errors[f"{type(error).__name__}: {str(error)[:80]}"] += 1
+        else:
+            self.errors[record.getMessage()[:80]] += 1
+
+
+class SimulatedUser:
+    """
+    One employee or manager working through the app: picks a weighted action, waits a
+    random think time, and repeats until the run ends. Each runs in its own thread.
+    """
+
+    def __init__(self, driver, stats, user, rng, think, asgi, context):
+        self.driver, self.stats, self.user, self.rng = driver, stats, user, rng
+        self.think, self.asgi, self.context = think, asgi, context
+        self.upcoming_shifts = []
+
+    def request(self, method, url, data=None):
+        parts = urlsplit(url)
+        body = json.dumps(data).encode() if data is not None else b''
+        token = access_token(self.user)
+        started = time.perf_counter()
+        try:
+            status, content = self.driver(method, parts.path, parts.query, body, token)
+        except Exception:
+            status, content = 'exception', b''
+        elapsed = time.perf_counter() - started
+        try:
+            label = f"{method} {resolve(parts.path).view_name}"
+        except Resolver404:
+            label = f"{method} {parts.path}"
+        self.stats.record(label, status, elapsed)
+        try:
+            return status, json.loads(content) if content else None
+        except ValueError:
+            return status, None
+
+    def run(self, deadline):
+        actions, weights = zip(*self.actions())
+        time.sleep(self.rng.uniform(0, self.think))  # don't start every user at once
+        while time.monotonic() < deadline:
+            self.rng.choices(actions, weights)[0]()
+            time.sleep(self.rng.expovariate(1 / self.think) if self.think else 0)
+        connections.close_all()
+
+    def answer_swaps(self, manager):
+        status, page = self.request('GET', '/api/swaps/pending/')
+        if status != 200:
+            return
+        flag = 'manager_approved' if manager else 'recipient_approved'
+        waiting = [
+            swap for swap in page['results']
+            if not swap[flag] and (manager or swap['requested_to'] == self.user.username)
+        ]
+        for swap in waiting[:3]:
+            decision = 'approve' if self.rng.random() < 0.8 else 'reject'
+            self.request('PATCH', f"/api/swaps/{decision}/{swap['id']}/")
+
+
+class Employee(SimulatedUser):
+    def actions(self):
+        return [
+            (self.poll_notifications, 40),
+            (self.view_shifts, 15),
+            (lambda: self.answer_swaps(manager=False), 15),
+            (self.submit_availability, 10),
+            (self.request_swap, 10),
+            (self.check_pay, 10),
+        ]
+
+    def poll_notifications(self):
+        status, notifications = self.request('GET', '/api/async/notifications/' if self.asgi else '/api/notifications/')
+        unread = [notification for notification in notifications or [] if not notification['read']] if status == 200 else []
+        if unread and self.rng.random() < 0.3:
+            self.request('POST', f"/api/notifications/{unread[0]['id']}/read/")
+
+    def view_shifts(self):
+        status, shifts = self.request('GET', '/api/shift/')
+        if status == 200:
+            now = timezone.now()
+            self.upcoming_shifts = [
+                shift for shift in shifts
+                if shift['employee'] == self.user.id and parse_datetime(shift['start_time']) > now and not shift['is_swap_requested']
+            ]
+
+    def submit_availability(self):
+        day = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=self.rng.randint(1, 28))
+        self.request('POST', '/api/availability/', {
+            "start_time": day.isoformat(), "end_time": (day + timedelta(days=1)).isoformat(),
+        })
+
+    def request_swap(self):
+        if not self.upcoming_shifts:
+            return self.view_shifts()
+        shift = self.upcoming_shifts.pop(self.rng.randrange(len(self.upcoming_shifts)))
+        status, candidates = self.request('GET', f"/api/swaps/candidates/{shift['id']}/?limit=5")
+        if status == 200 and candidates:
+            coworker = self.rng.choice(candidates)['user']
+            self.request('POST', '/api/swaps/request/', {"shift": shift['id'], "requested_to": coworker['id']})
+
+    def check_pay(self):
+        if self.asgi:
+            self.request('GET', '/api/async/dashboard/')
+        else:
+            self.request('GET', '/api/pay-estimate/')
+
+
+class Manager(SimulatedUser):
+    def actions(self):
+        return [
+            (lambda: self.answer_swaps(manager=True), 40),
+            (self.view_fairness, 15),
+            (self.view_shifts, 10),
+            (self.send_notification, 10),
+            (self.send_message, 15),
+            (self.auto_assign, 5),
+        ]
+
+    def view_fairness(self):
+        self.request('GET', '/api/analytics/fairness/')
+
+    def view_shifts(self):
+        self.request('GET', '/api/shift/')
+
+    def send_notification(self):
+        self.request('POST', '/api/notifications/send/', {
+            "message": "Shift cover needed this weekend.", "recipients": [], "roles": [self.rng.choice(self.context['role_ids'])],
+        })
+
+    def send_message(self):
+        self.request('POST', f"/api/chats/{self.rng.choice(self.context['chat_ids'])}/send/", {"content": "Can anyone cover?"})
+
+    def auto_assign(self):
+        start = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=self.rng.randint(7, 28))
+        status, template = self.request('POST', '/api/shift-templates/', {
+            "start_time": start.isoformat(), "end_time": (start + timedelta(hours=8)).isoformat(),
+        })
+        if status == 201:
+            self.request('POST', f"/api/shift-templates/{template['id']}/set-roles/", {
+                "roles": [{"role": self.rng.choice(self.context['role_ids']), "quantity": 1}],
+            })
+            self.request('POST', '/api/shifts/auto-assign/')
+
+
+def broken_swap_chains(organisation):
+    """
+    Shifts whose approved swaps don't form a single chain of handovers ending with the shift's
+    current employee, which is what a double approval leaves behind.
+    """
+    by_shift = defaultdict(list)
+    approved = ShiftSwapRequest.objects.filter(
+        is_approved=True, shift__manager__organisation=organisation
+    ).select_related('shift').order_by('approved_at', 'id')
+    for swap in approved:
+        by_shift[swap.shift_id].append(swap)
+    broken = 0
+    for swaps in by_shift.values():
+        handovers_chain = all(later.requested_by_id == earlier.requested_to_id for earlier, later in zip(swaps, swaps[1:]))
+        if not handovers_chain or swaps[-1].shift.employee_id != swaps[-1].requested_to_id:
+            broken += 1
+    half_approved = approved.exclude(manager_approved=True, recipient_approved=True).count()
+    return broken, half_approved
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests the API in-process: many simulated employees and managers, each in its own thread, "
+        "poll notifications, submit availability, request and approve swaps, send messages and run "
+        "auto-assign against the WSGI or ASGI application. Reports throughput, error rates and latency "
+        "percentiles per endpoint, then checks the swaps for lost or double approvals. Runs against a "
+        "freshly seeded organisation, removed afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--employees', type=int, default=40, help="Simulated employees.")
+        parser.add_argument('--managers', type=int, default=4, help="Simulated managers.")
+        parser.add_argument('--duration', type=float, default=30, help="Seconds to run for.")
+        parser.add_argument('--think', type=float, default=0.5, help="Mean seconds each user waits between actions.")
+        parser.add_argument('--size', type=int, default=200, help="Employees in the seeded organisation.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help="Keep the seeded organisation afterwards.")
+
+    def handle(self, *args, **options):
+        name = f"load-{uuid.uuid4().hex[:8]}"
+        organisation = seed_organisation(name, employees=max(options['size'], options['employees']), seed=options['seed'])
+        try:
+            self._run(organisation, options)
+        finally:
+            if options['keep']:
+                self.stdout.write(f"Kept organisation {name!r}.")
+            else:
+                delete_organisation(name)
+
+    def _run(self, organisation, options):
+        rng = random.Random(options['seed'])
+        users = User.objects.filter(organisation=organisation)
+        managers = list(users.filter(role='manager').order_by('id'))
+        employees = list(users.filter(role='employee').order_by('id'))
+        context = {
+            'role_ids': list(Role.objects.filter(organisation=organisation).values_list('id', flat=True)),
+            'chat_ids': list(Chat.objects.filter(created_by__organisation=organisation).values_list('id', flat=True)),
+        }
+        asgi = options['server'] == 'asgi'
+        driver = ASGIDriver() if asgi else WSGIDriver()
+        stats = Stats()
+        simulated = [
+            Manager(driver, stats, rng.choice(managers), random.Random(rng.random()), options['think'], asgi, context)
+            for _ in range(options['managers'])
+        ] + [
+            Employee(driver, stats, employee, random.Random(rng.random()), options['think'], asgi, context)
+            for employee in rng.sample(employees, options['employees'])
+        ]
+
+        errors = ErrorCollector()
+        request_logger = logging.getLogger('django.request')
+        request_logger.addHandler(errors)
+        request_logger.propagate = False
+        # the report covers what the request log would otherwise warn about
+        metrics_logger = logging.getLogger('rota.requests')
+        metrics_level = metrics_logger.level
+        metrics_logger.setLevel(logging.ERROR)
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, HOST]):
+                driver('GET', '/api/testnoauth/', '', b'', None)  # load the URLconf and views before timing
+                started = time.perf_counter()
+                deadline = time.monotonic() + options['duration']
+                threads = [threading.Thread(target=user.run, args=(deadline,)) for user in simulated]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - started
+        finally:
+            driver.close()
+            request_logger.removeHandler(errors)
+            request_logger.propagate = True
+            metrics_logger.setLevel(metrics_level)
+
+        self._report(options, stats, errors, elapsed)
+        broken, half_approved = broken_swap_chains(organisation)
+        self.stdout.write(f"Swap integrity: {broken} shifts with broken handover chains, {half_approved} swaps approved without both parties")
+
+    def _report(self, options, stats, errors, elapsed):
+        database = settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1]
+        self.stdout.write(
+            f"{options['server'].upper()} on {database}: {options['employees']} employees and {options['managers']} managers "
+            f"for {elapsed:.1f}s, {options['think']}s mean think time"
+        )
+        labels = sorted(stats.latencies, key=lambda label: -len(stats.latencies[label]))
+        width = max([len(label) for label in labels] + [len('Total')])
+        self.stdout.write(f"{'Endpoint':<{width}}  Requests   Req/s  Errors    4xx   p50 ms   p95 ms   p99 ms   max ms")
+        for label in labels + ['Total']:
+            if label == 'Total':
+                latencies = [value for values in stats.latencies.values() for value in values]
+                statuses = sum(stats.statuses.values(), Counter())
+            else:
+                latencies, statuses = stats.latencies[label], stats.statuses[label]
+            if not latencies:
+                continue
+            failed = sum(count for status, count in statuses.items() if status == 'exception' or status >= 500)
+            rejected = sum(count for status, count in statuses.items() if status != 'exception' and 400 <= status < 500)
+            self.stdout.write(
+                f"{label:<{width}}  {len(latencies):>8}  {len(latencies) / elapsed:>6.1f}  "
+                f"{failed / len(latencies):>6.1%}  {rejected:>5}  {_percentile(latencies, 50):>7.1f}  "
+                f"{_percentile(latencies, 95):>7.1f}  {_percentile(latencies, 99):>7.1f}  {max(latencies):>7.1f}"
+            )
+        for error, count in errors.errors.most_common(5):
+            self.stdout.write(self.style.ERROR(f"  {count} x {error}"))
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from rota.retention import archive_read_statuses
+
+
+class Command(BaseCommand):
+    help = "Archives (or summarises) read notifications older than the retention period."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.NOTIFICATION_RETENTION_DAYS,
+            help="Keep read notifications newer than this many days (default: NOTIFICATION_RETENTION_DAYS)."
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Number of rows moved per transaction."
+        )
+        parser.add_argument(
+            '--summarise', action='store_true',
+            help="Store monthly per-user counts instead of archiving each row."
+        )
+
+    def handle(self, *args, **options):
+        moved = archive_read_statuses(
+            days=options['days'],
+            batch_size=options['batch_size'],
+            summarise=options['summarise'],
+        )
+        action = "Summarised" if options['summarise'] else "Archived"
+        self.stdout.write(self.style.SUCCESS(f"{action} {moved} read notification statuses."))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rota.models import Organisation
+from rota.seeding import delete_organisation, seed_organisation
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates a synthetic organisation with employees, shifts, availability, notifications, chats "
+        "and swaps for benchmarking. Users are named <name>-mgr-<n> and <name>-emp-<n>."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', default='bench', help="Organisation name, also used as the username prefix.")
+        parser.add_argument('--employees', type=int, default=200)
+        parser.add_argument('--roles', type=int, default=6)
+        parser.add_argument('--weeks', type=int, default=8, help="Weeks of shifts, centred on the current week.")
+        parser.add_argument('--shifts-per-week', type=int, default=4)
+        parser.add_argument('--notifications', type=int, default=50, help="Notifications sent to every user.")
+        parser.add_argument('--chats', type=int, default=10)
+        parser.add_argument('--messages-per-chat', type=int, default=100)
+        parser.add_argument('--password', default='benchmark', help="Password given to every user.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--replace', action='store_true', help="Delete an existing organisation with this name first.")
+
+    def handle(self, *args, **options):
+        if Organisation.objects.filter(name=options['name']).exists():
+            if not options['replace']:
+                raise CommandError(f"Organisation {options['name']!r} already exists; pass --replace to recreate it.")
+            delete_organisation(options['name'])
+
+        started = time.perf_counter()
+        organisation = seed_organisation(
+            options['name'],
+            employees=options['employees'],
+            roles=options['roles'],
+            weeks=options['weeks'],
+            shifts_per_week=options['shifts_per_week'],
+            notifications=options['notifications'],
+            chats=options['chats'],
+            messages_per_chat=options['messages_per_chat'],
+            password=options['password'],
+            seed=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded organisation {organisation.name!r} (id {organisation.id}) in {time.perf_counter() - started:.1f}s."
+        ))
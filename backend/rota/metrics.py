@@ -0,0 +1,116 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger('rota.requests')
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Database, serializer and rendering work done while handling one request. Serializer time
+    is spent turning objects into response data (including queries the serializers trigger);
+    render time is spent encoding that data into the response body.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.render_seconds = 0.0
+
+    def total_seconds(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        return ", ".join([
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialize_seconds * 1000:.1f};desc="serializers"',
+            f'render;dur={self.render_seconds * 1000:.1f};desc="response encoding"',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+def start_request():
+    """Starts collecting metrics for the current request; returns them and a token for `end_request`."""
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current_metrics():
+    return _current.get()
+
+
+@contextmanager
+def serializing():
+    """Counts the time spent in the block as serializer work for the current request."""
+    metrics = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            metrics.serialize_seconds += time.perf_counter() - started
+
+
+class SerializerTimingMixin:
+    """Times a viewset's list and retrieve actions, where its serializers do their work, as serializer time."""
+
+    def list(self, request, *args, **kwargs):
+        with serializing():
+            return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        with serializing():
+            return super().retrieve(request, *args, **kwargs)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper installed on every connection. It counts into the current
+    request's metrics, which follow the request into sync_to_async threads as a context variable.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_seconds += time.perf_counter() - started
+
+
+def query_budget(view_name):
+    return settings.QUERY_BUDGETS.get(view_name, settings.QUERY_BUDGET)
+
+
+def log_request(request, response, metrics, total):
+    match = getattr(request, 'resolver_match', None)
+    view_name = match.view_name if match else None
+    entry = {
+        "method": request.method,
+        "path": request.path,
+        "view": view_name,
+        "status": response.status_code,
+        "queries": metrics.queries,
+        "db_ms": round(metrics.db_seconds * 1000, 1),
+        "serialize_ms": round(metrics.serialize_seconds * 1000, 1),
+        "render_ms": round(metrics.render_seconds * 1000, 1),
+        "total_ms": round(total * 1000, 1),
+    }
+    logger.info(json.dumps({"event": "request", **entry}))
+
+    budget = query_budget(view_name)
+    if view_name and budget is not None and metrics.queries > budget:
+        logger.warning(json.dumps({"event": "query_budget_exceeded", "budget": budget, **entry}))
@@ -0,0 +1,88 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .metrics import current_metrics, end_request, log_request, start_request
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, made async-capable so that under ASGI the middleware chain stays async
+    and async views don't each get pinned to a thread by a sync middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # DEBUG mode looks files up on disk on every request
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures each request's database queries, database time, serializer time, response rendering
+    time and total time. Adds them as a Server-Timing header (when SERVER_TIMING is on) and logs them
+    as a JSON line to the `rota.requests` logger, with a warning when a view runs more
+    queries than its QUERY_BUDGETS entry (or QUERY_BUDGET) allows. Place it first.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token = start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        return self._finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics, token = start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+        return self._finish(request, response, metrics)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered into bytes after the view returns
+        metrics = current_metrics()
+        if metrics is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                metrics.render_seconds += time.perf_counter() - started
+            response.add_post_render_callback(rendered)
+        return response
+
+    def _finish(self, request, response, metrics):
+        total = metrics.total_seconds()
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing(total)
+        log_request(request, response, metrics, total)
+        return response
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rota', '0004_alter_availability_options_alter_invitetoken_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationreadstatus',
+            name='merged_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='ArchivedNotificationReadStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message', models.TextField()),
+                ('created_at', models.DateTimeField()),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Archived Notification Read Status',
+                'verbose_name_plural': 'Archived Notification Read Statuses',
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificationReadSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Notification Read Summary',
+                'verbose_name_plural': 'Notification Read Summaries',
+                'unique_together': {('user', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rota', '0005_notificationreadstatus_merged_count_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chat', 'timestamp', 'id'], name='message_chat_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rota', '0006_message_message_chat_timestamp_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+                ('chat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to='rota.chat')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['chat', 'id'], name='tombstone_chat_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rota', '0007_messagetombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatReadCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_message_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Chat Read Cursor',
+                'verbose_name_plural': 'Chat Read Cursors',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chat', 'id'], name='message_chat_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='chatreadcursor',
+            name='chat',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_cursors', to='rota.chat'),
+        ),
+        migrations.AddField(
+            model_name='chatreadcursor',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='chatreadcursor',
+            unique_together={('chat', 'user')},
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations
+
+# (table, indexed column)
+SEARCHED_COLUMNS = [
+    ('rota_message', 'content'),
+    ('rota_notification', 'message'),
+]
+
+
+def sqlite_forward(table, column):
+    fts = f"{table}_fts"
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({column}, content='{table}', content_rowid='id')",
+        f"""CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+            END""",
+        f"""CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+            END""",
+        f"""CREATE TRIGGER {fts}_update AFTER UPDATE OF {column} ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+                INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+            END""",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def sqlite_backward(table, column):
+    fts = f"{table}_fts"
+    return [
+        f"DROP TRIGGER IF EXISTS {fts}_insert",
+        f"DROP TRIGGER IF EXISTS {fts}_delete",
+        f"DROP TRIGGER IF EXISTS {fts}_update",
+        f"DROP TABLE IF EXISTS {fts}",
+    ]
+
+
+def postgres_forward(table, column):
+    return [f"CREATE INDEX {table}_fts ON {table} USING GIN (to_tsvector('english', {column}))"]
+
+
+def postgres_backward(table, column):
+    return [f"DROP INDEX IF EXISTS {table}_fts"]
+
+
+STATEMENTS = {
+    'sqlite': (sqlite_forward, sqlite_backward),
+    'postgresql': (postgres_forward, postgres_backward),
+}
+
+
+def run(direction):
+    def apply(apps, schema_editor):
+        builders = STATEMENTS.get(schema_editor.connection.vendor)
+        if builders is None:
+            return
+        for table, column in SEARCHED_COLUMNS:
+            for statement in builders[direction](table, column):
+                schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rota', '0008_chatreadcursor_message_message_chat_id_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(0), run(1)),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rota', '0009_full_text_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shiftswaprequest',
+            index=models.Index(fields=['requested_to', 'is_approved', 'manager_approved'], name='swap_recipient_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shiftswaprequest',
+            index=models.Index(fields=['shift', 'is_approved', 'manager_approved'], name='swap_shift_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rota', '0010_shiftswaprequest_swap_recipient_pending_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shiftswaprequest',
+            name='rejected_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
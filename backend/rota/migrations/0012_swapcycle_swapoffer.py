@@ -0,0 +1,46 @@
+# Generated by Django 5.1.7 on 2026-10-19 05:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rota', '0011_shiftswaprequest_rejected_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SwapCycle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('executed_at', models.DateTimeField(blank=True, null=True)),
+                ('organisation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='swap_cycles', to='rota.organisation')),
+            ],
+            options={
+                'verbose_name': 'Swap Cycle',
+                'verbose_name_plural': 'Swap Cycles',
+            },
+        ),
+        migrations.CreateModel(
+            name='SwapOffer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('cycle_position', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('cycle', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='offers', to='rota.swapcycle')),
+                ('offered_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='swap_offers', to=settings.AUTH_USER_MODEL)),
+                ('shift', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='swap_offers', to='rota.shift')),
+            ],
+            options={
+                'verbose_name': 'Swap Offer',
+                'verbose_name_plural': 'Swap Offers',
+                'indexes': [models.Index(fields=['closed_at', 'cycle'], name='swap_offer_open_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('closed_at__isnull', True)), fields=('shift',), name='swap_offer_one_open_per_shift')],
+            },
+        ),
+    ]
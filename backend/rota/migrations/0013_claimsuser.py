@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-19 05:06
+
+import django.contrib.auth.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rota', '0012_swapcycle_swapoffer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaimsUser',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('rota.user',),
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rota', '0014_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationreadstatus',
+            name='merged_notifications',
+            field=models.ManyToManyField(blank=True, related_name='digests', to='rota.notification'),
+        ),
+    ]
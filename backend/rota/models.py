@@ -58,6 +58,43 @@ class User(AbstractUser):
 
     REQUIRED_FIELDS = ['first_name', 'last_name', 'email']
 
+class ClaimsUser(User):
+    """
+    A user built from access-token claims. Only the claimed fields are loaded; touching any
+    other field reads the rest of the row in one query.
+
+    The claimed values can be older than the row, so saving one would write them back;
+    load the `User` before changing it.
+    """
+
+    class Meta:
+        proxy = True
+
+    def save(self, *args, **kwargs):
+        raise TypeError("A user built from token claims can't be saved; load it with User.objects.get() first.")
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferred = self.get_deferred_fields()
+        if fields and deferred.issuperset(fields):
+            fields = deferred
+        super().refresh_from_db(using, fields, from_queryset)
+
+class RevokedToken(models.Model):
+    """
+    A logged-out session. `jti` is the session id shared by a refresh token and the access
+    tokens issued from it; the row is useless once `expires_at` has passed.
+    """
+    jti = models.CharField(max_length=64, primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Revoked {self.jti} (expires {self.expires_at})"
+
+    class Meta:
+        verbose_name = "Revoked Token"
+        verbose_name_plural = "Revoked Tokens"
+
 def default_end_time():
     return timezone.now() + timedelta(hours=1)
 
@@ -146,6 +183,7 @@ class ShiftSwapRequest(models.Model):
     recipient_approved = models.BooleanField(default=False) # requested_to must approve
     requested_at = models.DateTimeField(auto_now_add=True)
     approved_at = models.DateTimeField(null=True, blank=True)
+    rejected_at = models.DateTimeField(null=True, blank=True) # Final state: rejected by the manager or recipient
 
     def __str__(self):
         return f"Swap: {self.shift} → {self.requested_to.username} (Approved: {self.is_approved})"
@@ -153,6 +191,50 @@ class ShiftSwapRequest(models.Model):
     class Meta:
         verbose_name = "Shift Swap Request"
         verbose_name_plural = "Shift Swap Requests"
+        indexes = [
+            # pending swaps: (shift__manager | requested_to) with both flags unset
+            models.Index(fields=['requested_to', 'is_approved', 'manager_approved'], name='swap_recipient_pending_idx'),
+            models.Index(fields=['shift', 'is_approved', 'manager_approved'], name='swap_shift_pending_idx'),
+        ]
+
+class SwapCycle(models.Model):
+    """
+    A proposed rotation of offered shifts: each offer's employee takes the next offer's shift.
+    """
+    organisation = models.ForeignKey(Organisation, related_name="swap_cycles", on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    executed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Swap cycle {self.id} (Executed: {self.executed_at is not None})"
+
+    class Meta:
+        verbose_name = "Swap Cycle"
+        verbose_name_plural = "Swap Cycles"
+
+class SwapOffer(models.Model):
+    """
+    An employee's standing offer to give up a shift in exchange for another one.
+    """
+    shift = models.ForeignKey(Shift, related_name="swap_offers", on_delete=models.CASCADE)
+    offered_by = models.ForeignKey(User, related_name="swap_offers", on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    closed_at = models.DateTimeField(null=True, blank=True) # Set once withdrawn or fulfilled
+    cycle = models.ForeignKey(SwapCycle, related_name="offers", null=True, blank=True, on_delete=models.SET_NULL)
+    cycle_position = models.PositiveSmallIntegerField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Offer: {self.shift} by {self.offered_by.username}"
+
+    class Meta:
+        verbose_name = "Swap Offer"
+        verbose_name_plural = "Swap Offers"
+        indexes = [
+            models.Index(fields=['closed_at', 'cycle'], name='swap_offer_open_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['shift'], condition=models.Q(closed_at__isnull=True), name='swap_offer_one_open_per_shift'),
+        ]
 
 class Notification(models.Model):
     """
@@ -170,6 +252,8 @@ class NotificationReadStatus(models.Model):
     notification = models.ForeignKey(Notification, on_delete=models.CASCADE)
     read = models.BooleanField(default=False)
     read_at = models.DateTimeField(null=True, blank=True)
+    merged_count = models.PositiveIntegerField(default=1) # Notifications folded into this row by digest mode
+    merged_notifications = models.ManyToManyField(Notification, blank=True, related_name='digests') # The earlier ones among them
 
     def __str__(self):
         return f"{self.user.username} read {self.notification} = {self.read}"
@@ -179,6 +263,39 @@ class NotificationReadStatus(models.Model):
         verbose_name = "Notification Read Status"
         verbose_name_plural = "Notification Read Statuses"
 
+class ArchivedNotificationReadStatus(models.Model):
+    """
+    A read notification moved out of NotificationReadStatus by the retention policy.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    message = models.TextField()
+    created_at = models.DateTimeField()
+    read_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user.username} read {self.message[:50]} (archived)"
+
+    class Meta:
+        verbose_name = "Archived Notification Read Status"
+        verbose_name_plural = "Archived Notification Read Statuses"
+
+class NotificationReadSummary(models.Model):
+    """
+    Monthly count of read notifications that the retention policy summarised instead of archiving.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    month = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user.username} read {self.count} notifications in {self.month:%Y-%m}"
+
+    class Meta:
+        unique_together = ('user', 'month')
+        verbose_name = "Notification Read Summary"
+        verbose_name_plural = "Notification Read Summaries"
+
 class Chat(models.Model):
     title = models.CharField(max_length=100)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chats_created')
@@ -199,4 +316,41 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['chat', 'timestamp', 'id'], name='message_chat_timestamp_idx'),
+            models.Index(fields=['chat', 'id'], name='message_chat_id_idx'),
+        ]
+
+class ChatReadCursor(models.Model):
+    """
+    How far a participant has read in a chat. Messages with a higher id are unread.
+    """
+    chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name='read_cursors')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    last_read_message_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username} read {self.chat.title} up to message {self.last_read_message_id}"
+
+    class Meta:
+        unique_together = ('chat', 'user')
+        verbose_name = "Chat Read Cursor"
+        verbose_name_plural = "Chat Read Cursors"
+
+
+class MessageTombstone(models.Model):
+    """
+    Records a deleted message so polling clients can remove it from their copy of the chat.
+    """
+    chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name='tombstones')
+    message_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Message {self.message_id} deleted from {self.chat.title}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['chat', 'id'], name='tombstone_chat_idx'),
+        ]
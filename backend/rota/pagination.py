@@ -0,0 +1,105 @@
+import base64
+import math
+from collections import namedtuple
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import LimitOffsetPagination
+
+DEFAULT_MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+
+# Position in a chat: the (timestamp, id) of a message, plus the last deletion tombstone seen.
+# An empty chat is represented by a cursor without a timestamp.
+Cursor = namedtuple('Cursor', ['timestamp', 'message_id', 'tombstone_id'], defaults=[None, 0, 0])
+
+
+def encode_cursor(cursor):
+    """Returns an opaque string for a Cursor."""
+    timestamp = cursor.timestamp.isoformat() if cursor.timestamp else ''
+    raw = f"{timestamp}|{cursor.message_id}|{cursor.tombstone_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(value):
+    """Turns a string from `encode_cursor` back into a Cursor."""
+    try:
+        timestamp, message_id, tombstone_id = base64.urlsafe_b64decode(value.encode()).decode().split('|')
+        return Cursor(
+            datetime.fromisoformat(timestamp) if timestamp else None,
+            int(message_id),
+            int(tombstone_id),
+        )
+    except (ValueError, UnicodeDecodeError):
+        raise ValidationError({"detail": "Invalid cursor."})
+
+
+def cursor_for(message, tombstone_id=0):
+    return Cursor(message.timestamp, message.id, tombstone_id)
+
+
+def parse_page_size(value):
+    if value is None:
+        return DEFAULT_MESSAGE_PAGE_SIZE
+    try:
+        size = int(value)
+    except ValueError:
+        raise ValidationError({"limit": "Must be an integer."})
+    return max(1, min(size, MAX_MESSAGE_PAGE_SIZE))
+
+
+def parse_wait(value, limit):
+    """
+    Seconds a long poll should wait, from the `wait` query parameter, clamped to 0..`limit`.
+    Raises ValueError for anything that isn't a finite number, since nan or inf would never time out.
+    """
+    wait = float(value) if value is not None else 0.0
+    if not math.isfinite(wait):
+        raise ValueError(f"wait must be finite, got {value!r}")
+    return max(0.0, min(wait, limit))
+
+
+def _page_queryset(queryset, before, after, limit):
+    if after:
+        if after.timestamp:
+            queryset = queryset.filter(
+                Q(timestamp__gt=after.timestamp) | Q(timestamp=after.timestamp, id__gt=after.message_id)
+            )
+        return queryset.order_by('timestamp', 'id')[:limit]
+
+    if before and before.timestamp:
+        queryset = queryset.filter(
+            Q(timestamp__lt=before.timestamp) | Q(timestamp=before.timestamp, id__lt=before.message_id)
+        )
+    return queryset.order_by('-timestamp', '-id')[:limit + 1]
+
+
+def _page_result(page, after, limit):
+    if after:
+        return page, True
+    return page[:limit][::-1], len(page) > limit
+
+
+def paginate_messages(queryset, before=None, after=None, limit=DEFAULT_MESSAGE_PAGE_SIZE):
+    """
+    Keyset pagination over messages ordered by (timestamp, id).
+
+    Without cursors the newest `limit` messages are returned. `before` walks back through
+    older history and `after` fetches what arrived since a known message. Results are
+    always in chronological order. Returns (messages, has_older).
+    """
+    page = list(_page_queryset(queryset, before, after, limit))
+    return _page_result(page, after, limit)
+
+
+async def apaginate_messages(queryset, before=None, after=None, limit=DEFAULT_MESSAGE_PAGE_SIZE):
+    """Async version of `paginate_messages`."""
+    page = [message async for message in _page_queryset(queryset, before, after, limit)]
+    return _page_result(page, after, limit)
+
+
+class BoundedLimitOffsetPagination(LimitOffsetPagination):
+    """limit/offset pagination that always applies a page size, capped at `max_limit`."""
+    default_limit = 50
+    max_limit = 200
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Queued in place of an event when a subscriber falls too far behind
+OVERFLOW = object()
+
+
+class Subscription:
+    """
+    One connection's view of a chat room: a bounded queue filled by the hub.
+    """
+
+    def __init__(self, hub, chat_id, max_pending):
+        self.hub = hub
+        self.chat_id = chat_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_pending + 1)  # one slot reserved for OVERFLOW
+        self.max_pending = max_pending
+        self.overflowed = False
+
+    def deliver(self, event):
+        """Queues an event; must run on the subscriber's event loop."""
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= self.max_pending:
+            # Back-pressure: rather than buffer without limit, cut the consumer off.
+            # It reconnects and catches up from its last cursor over HTTP.
+            self.overflowed = True
+            self.queue.put_nowait(OVERFLOW)
+            return
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class InMemoryChatHub:
+    """
+    Fans chat events out to the connections held by this process.
+
+    `publish` may be called from any thread (e.g. a sync view running under ASGI), so
+    events are handed to each subscriber's event loop rather than queued directly.
+    Deployments running several processes need a shared hub with the same interface.
+    """
+
+    def __init__(self, max_pending=None):
+        self.max_pending = max_pending or settings.CHAT_SOCKET_MAX_PENDING
+        self._rooms = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, chat_id):
+        subscription = Subscription(self, chat_id, self.max_pending)
+        with self._lock:
+            self._rooms.setdefault(chat_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            room = self._rooms.get(subscription.chat_id)
+            if room is not None:
+                room.discard(subscription)
+                if not room:
+                    del self._rooms[subscription.chat_id]
+
+    def subscriber_count(self, chat_id):
+        with self._lock:
+            return len(self._rooms.get(chat_id, ()))
+
+    def publish(self, chat_id, event):
+        with self._lock:
+            subscribers = tuple(self._rooms.get(chat_id, ()))
+        if not subscribers:
+            return
+
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+
+        for subscription in subscribers:
+            if subscription.loop is current_loop:
+                subscription.deliver(event)
+            elif not subscription.loop.is_closed():
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+
+
+@lru_cache(maxsize=None)
+def get_hub():
+    """Returns the process-wide hub configured by CHAT_HUB_BACKEND."""
+    return import_string(settings.CHAT_HUB_BACKEND)()
+
+
+def publish_on_commit(chat_id, event):
+    """Publishes `event` once the current transaction commits (immediately in autocommit)."""
+    transaction.on_commit(lambda: get_hub().publish(chat_id, event))
+
+
+def message_created_event(message_data):
+    return {"type": "message.created", "message": message_data}
+
+
+def message_deleted_event(message_id):
+    return {"type": "message.deleted", "message_id": message_id}
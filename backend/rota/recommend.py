@@ -0,0 +1,139 @@
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Availability, Shift, User
+
+# Same look-back auto-assignment uses to weigh workload
+WORKLOAD_WINDOW = timedelta(weeks=4)
+
+
+class BusyTimes:
+    """
+    A user's shifts and unavailability as intervals sorted by start, with a running
+    maximum of end times so an overlap test is a single binary search.
+    """
+
+    def __init__(self, intervals):
+        intervals = sorted(intervals)
+        self.starts = [start for start, _, _ in intervals]
+        self.ends = [end for _, end, _ in intervals]
+        self.max_ends = list(accumulate(self.ends, max))
+        self.shift_ids = [shift_id for _, _, shift_id in intervals]
+
+    def __iter__(self):
+        """(start, end, shift_id) for each interval; shift_id is None for unavailability."""
+        return zip(self.starts, self.ends, self.shift_ids)
+
+    def overlaps(self, start, end, ignore_shift_id=None):
+        count = bisect_left(self.starts, end)
+        if ignore_shift_id is None:
+            return count > 0 and self.max_ends[count - 1] > start
+        # walk back only while some earlier interval could still reach past `start`
+        for i in range(count - 1, -1, -1):
+            if self.max_ends[i] <= start:
+                return False
+            if self.ends[i] > start and self.shift_ids[i] != ignore_shift_id:
+                return True
+        return False
+
+
+class OrganisationIndex:
+    """
+    Snapshot of one organisation's employees grouped by role, their upcoming busy times
+    and recent workload, built from three queries and reused until invalidated.
+    """
+
+    def __init__(self, organisation_id, now=None):
+        now = now or timezone.now()
+        self.organisation_id = organisation_id
+        self.built_at = time.monotonic()
+
+        employees = User.objects.filter(organisation_id=organisation_id, role='employee').select_related('role_title')
+        self.employees = {user.id: user for user in employees}
+        self.by_role = defaultdict(list)
+        for user in self.employees.values():
+            self.by_role[user.role_title_id].append(user.id)
+
+        intervals = defaultdict(list)
+        self.workload = defaultdict(float)
+        shifts = Shift.objects.filter(
+            employee_id__in=self.employees, end_time__gte=now - WORKLOAD_WINDOW
+        ).values_list('id', 'employee_id', 'start_time', 'end_time')
+        for shift_id, employee_id, start, end in shifts:
+            if start >= now - WORKLOAD_WINDOW:
+                self.workload[employee_id] += (end - start).total_seconds() / 3600
+            if end >= now:
+                intervals[employee_id].append((start, end, shift_id))
+
+        blocks = Availability.objects.filter(
+            user_id__in=self.employees, end_time__gte=now
+        ).values_list('user_id', 'start_time', 'end_time')
+        for user_id, start, end in blocks:
+            intervals[user_id].append((start, end, None))
+
+        self.busy = {user_id: BusyTimes(user_intervals) for user_id, user_intervals in intervals.items()}
+
+    def is_free(self, user_id, start, end, ignore_shift_id=None):
+        busy = self.busy.get(user_id)
+        return busy is None or not busy.overlaps(start, end, ignore_shift_id)
+
+    def is_eligible(self, user_id, shift_role_id, start, end, exclude_user_id=None, ignore_shift_id=None):
+        user = self.employees.get(user_id)
+        return (
+            user is not None
+            and user_id != exclude_user_id
+            and user.role_title_id == shift_role_id
+            and self.is_free(user_id, start, end, ignore_shift_id)
+        )
+
+    def candidates(self, shift_role_id, start, end, exclude_user_id=None, limit=10):
+        """Eligible coworkers for a shift, least loaded first."""
+        eligible = [
+            user_id for user_id in self.by_role.get(shift_role_id, ())
+            if user_id != exclude_user_id and self.is_free(user_id, start, end)
+        ]
+        eligible.sort(key=lambda user_id: (self.workload[user_id], user_id))
+        return [(self.employees[user_id], round(self.workload[user_id], 2)) for user_id in eligible[:limit]]
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def _version_key(organisation_id):
+    return f"swap-index-version:{organisation_id}"
+
+
+def get_organisation_index(organisation_id):
+    """
+    Returns this process's index for the organisation, rebuilding it when another write
+    has bumped the organisation's version or it is older than SWAP_INDEX_MAX_AGE seconds.
+    """
+    version = cache.get_or_set(_version_key(organisation_id), lambda: uuid.uuid4().hex, None)
+    with _lock:
+        entry = _indexes.get(organisation_id)
+    if entry and entry[0] == version and time.monotonic() - entry[1].built_at < settings.SWAP_INDEX_MAX_AGE:
+        return entry[1]
+
+    index = OrganisationIndex(organisation_id)
+    with _lock:
+        _indexes[organisation_id] = (version, index)
+    return index
+
+
+def invalidate_organisation_index(*organisation_ids):
+    """Marks the organisations' indexes stale in every process sharing the cache."""
+    for organisation_id in organisation_ids:
+        if organisation_id is None:
+            continue
+        # a fresh token rather than a counter, so an evicted or cleared key can't repeat a version
+        cache.set(_version_key(organisation_id), uuid.uuid4().hex, None)
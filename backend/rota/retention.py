@@ -0,0 +1,128 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import (
+    ArchivedNotificationReadStatus,
+    Notification,
+    NotificationReadStatus,
+    NotificationReadSummary,
+)
+
+
+def archive_read_statuses(days, batch_size=1000, summarise=False):
+    """
+    Moves read statuses older than `days` out of NotificationReadStatus in batches of `batch_size`.
+    With `summarise`, rows are folded into per-user monthly counts instead of being copied.
+    Returns the number of statuses removed from the hot table.
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    stale = NotificationReadStatus.objects.filter(read=True, read_at__lt=cutoff)
+    total = 0
+
+    while True:
+        with transaction.atomic():
+            batch = list(
+                stale.select_related('notification').prefetch_related('merged_notifications').order_by('id')[:batch_size]
+            )
+            if not batch:
+                break
+
+            if summarise:
+                _add_to_summaries(batch)
+            else:
+                ArchivedNotificationReadStatus.objects.bulk_create([
+                    ArchivedNotificationReadStatus(
+                        user_id=status.user_id,
+                        message=notification.message,
+                        created_at=notification.created_at,
+                        read_at=status.read_at,
+                    )
+                    for status in batch
+                    for notification in [status.notification, *status.merged_notifications.all()]
+                ])
+
+            NotificationReadStatus.objects.filter(id__in=[status.id for status in batch]).delete()
+        total += len(batch)
+
+    purge_orphaned_notifications(cutoff, batch_size)
+    return total
+
+
+def _add_to_summaries(batch):
+    counts = Counter()
+    for status in batch:
+        counts[status.user_id, status.read_at.date().replace(day=1)] += status.merged_count
+    existing = {
+        (summary.user_id, summary.month): summary
+        for summary in NotificationReadSummary.objects.select_for_update().filter(
+            user_id__in={user_id for user_id, _ in counts},
+            month__in={month for _, month in counts},
+        )
+    }
+
+    to_update, to_create = [], []
+    for (user_id, month), count in counts.items():
+        summary = existing.get((user_id, month))
+        if summary:
+            summary.count += count
+            to_update.append(summary)
+        else:
+            to_create.append(NotificationReadSummary(user_id=user_id, month=month, count=count))
+
+    NotificationReadSummary.objects.bulk_update(to_update, ['count'])
+    NotificationReadSummary.objects.bulk_create(to_create)
+
+
+def purge_orphaned_notifications(cutoff, batch_size=1000):
+    """
+    Deletes notifications created before `cutoff` that no longer have any recipients
+    and aren't kept in anyone's digest.
+    """
+    orphans = Notification.objects.filter(
+        created_at__lt=cutoff, notificationreadstatus__isnull=True, digests__isnull=True
+    )
+    total = 0
+    while True:
+        ids = list(orphans.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return total
+        Notification.objects.filter(id__in=ids).delete()
+        total += len(ids)
+
+
+def merge_into_digests(notification, user_ids, window):
+    """
+    Folds `notification` into each user's unread notification from the last `window` seconds.
+    The notification it replaces is kept in the row's `merged_notifications`, so nothing is lost.
+    Returns the IDs of users whose existing row was reused, so no new row is needed for them.
+    Call it inside a transaction: the candidate rows stay locked until it commits, so concurrent
+    sends queue up rather than both merging into the same row from the same starting point.
+    """
+    cutoff = timezone.now() - timedelta(seconds=window)
+    candidates = (
+        NotificationReadStatus.objects
+        .select_for_update(of=('self',))
+        .filter(user_id__in=user_ids, read=False, notification__created_at__gte=cutoff)
+        .order_by('user_id', '-id')
+        .values_list('id', 'user_id', 'notification_id')
+    )
+    merged, replaced = {}, []
+    for status_id, user_id, notification_id in candidates:
+        if user_id not in merged:  # the user's latest unread row
+            merged[user_id] = status_id
+            replaced.append((status_id, notification_id))
+
+    Digest = NotificationReadStatus.merged_notifications.through
+    Digest.objects.bulk_create([
+        Digest(notificationreadstatus_id=status_id, notification_id=notification_id)
+        for status_id, notification_id in replaced
+    ])
+    NotificationReadStatus.objects.filter(id__in=merged.values()).update(
+        notification=notification,
+        merged_count=F('merged_count') + 1,
+    )
+    return set(merged)
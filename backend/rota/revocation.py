@@ -0,0 +1,86 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import RevokedToken
+
+# Claim naming the login session a token belongs to, copied from refresh to access tokens
+SESSION_CLAIM = 'sid'
+# Re-read rows revoked this long before the newest one seen, to cover commit-order and clock skew
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def session_id(token):
+    """The revocable id of a token: its session, or its own jti for tokens issued without one."""
+    return token.get(SESSION_CLAIM) or token.get('jti')
+
+
+class RevocationStore:
+    """
+    This process's copy of the revoked sessions, so checking a token is a dict lookup.
+
+    The copy is topped up from RevokedToken every TOKEN_REVOCATION_SYNC_SECONDS with only the
+    rows revoked since the last sync. Revocations made in this process apply immediately;
+    those made elsewhere apply within one sync interval. Expired entries are dropped locally
+    on each sync and deleted from the table every TOKEN_REVOCATION_PURGE_SECONDS.
+    """
+
+    def __init__(self):
+        self._revoked = {}  # session id -> expiry as a unix timestamp
+        self._lock = threading.Lock()
+        self._synced_at = None
+        self._purged_at = time.monotonic()
+        self._watermark = None
+
+    def revoke(self, jti, expires_at):
+        RevokedToken.objects.bulk_create(
+            [RevokedToken(jti=jti, expires_at=datetime.fromtimestamp(expires_at, tz=dt_timezone.utc))],
+            ignore_conflicts=True,
+        )
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def is_revoked(self, jti):
+        now = time.monotonic()
+        if self._synced_at is None or now - self._synced_at >= settings.TOKEN_REVOCATION_SYNC_SECONDS:
+            self.sync(now)
+        expires_at = self._revoked.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def sync(self, now=None):
+        now = now or time.monotonic()
+        with self._lock:
+            if self._synced_at is not None and now - self._synced_at < settings.TOKEN_REVOCATION_SYNC_SECONDS:
+                return  # another thread synced while this one waited
+            self._synced_at = now
+
+            rows = RevokedToken.objects.filter(expires_at__gt=timezone.now())
+            if self._watermark is not None:
+                rows = rows.filter(revoked_at__gte=self._watermark - SYNC_OVERLAP)
+            for jti, expires_at, revoked_at in rows.values_list('jti', 'expires_at', 'revoked_at'):
+                self._revoked[jti] = expires_at.timestamp()
+                if self._watermark is None or revoked_at > self._watermark:
+                    self._watermark = revoked_at
+
+            if now - self._purged_at >= settings.TOKEN_REVOCATION_PURGE_SECONDS:
+                self._purged_at = now
+                cutoff = time.time()
+                self._revoked = {jti: expires_at for jti, expires_at in self._revoked.items() if expires_at > cutoff}
+                RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+
+
+store = RevocationStore()
+
+
+def revoke_token(token):
+    """Ends the session `token` belongs to, invalidating its refresh token and every access token."""
+    # access tokens minted just before the refresh token expires outlive it by up to their lifetime
+    store.revoke(session_id(token), token['exp'] + int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()))
+
+
+def is_token_revoked(token):
+    return store.is_revoked(session_id(token))
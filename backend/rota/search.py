@@ -0,0 +1,115 @@
+from django.db import connection
+
+from .models import Message, Notification
+
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+
+class SQLiteSearch:
+    """
+    FTS5 search. `rota_message_fts` and `rota_notification_fts` are external-content
+    indexes kept in sync by triggers (see migration 0009).
+    """
+
+    messages_sql = """
+        SELECT m.id FROM rota_message_fts
+        JOIN rota_message m ON m.id = rota_message_fts.rowid
+        JOIN rota_chat_participants p ON p.chat_id = m.chat_id AND p.user_id = %s
+        WHERE rota_message_fts MATCH %s
+        ORDER BY bm25(rota_message_fts), m.id DESC
+        LIMIT %s OFFSET %s
+    """
+    notifications_sql = """
+        SELECT n.id FROM rota_notification_fts
+        JOIN rota_notification n ON n.id = rota_notification_fts.rowid
+        JOIN rota_notificationreadstatus s ON s.notification_id = n.id AND s.user_id = %s
+        WHERE rota_notification_fts MATCH %s
+        ORDER BY bm25(rota_notification_fts), n.id DESC
+        LIMIT %s OFFSET %s
+    """
+
+    def prepare(self, query):
+        # Quote every term so user input can't hit FTS5 query syntax; the last term matches as a prefix.
+        # Terms without a letter or digit tokenize to nothing, and an empty prefix is a syntax error
+        terms = ['"' + term.replace('"', '""') + '"' for term in query.split() if any(c.isalnum() for c in term)]
+        if not terms:
+            return None
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+
+class PostgresSearch:
+    """
+    tsvector search backed by GIN expression indexes on the searched columns (see migration 0009).
+    """
+
+    messages_sql = """
+        SELECT m.id FROM rota_message m
+        JOIN rota_chat_participants p ON p.chat_id = m.chat_id AND p.user_id = %s
+        CROSS JOIN websearch_to_tsquery('english', %s) q
+        WHERE to_tsvector('english', m.content) @@ q
+        ORDER BY ts_rank(to_tsvector('english', m.content), q) DESC, m.id DESC
+        LIMIT %s OFFSET %s
+    """
+    notifications_sql = """
+        SELECT n.id FROM rota_notification n
+        JOIN rota_notificationreadstatus s ON s.notification_id = n.id AND s.user_id = %s
+        CROSS JOIN websearch_to_tsquery('english', %s) q
+        WHERE to_tsvector('english', n.message) @@ q
+        ORDER BY ts_rank(to_tsvector('english', n.message), q) DESC, n.id DESC
+        LIMIT %s OFFSET %s
+    """
+
+    def prepare(self, query):
+        return query
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearch,
+    'postgresql': PostgresSearch,
+}
+
+
+def _contains_ids(sql, user_id, query, limit, offset):
+    """
+    Fallback for databases without a backend above: every term must appear in the text,
+    ignoring case, newest first. Nothing is ranked or indexed.
+    """
+    if sql == 'messages_sql':
+        queryset, field = Message.objects.filter(chat__participants=user_id), 'content'
+    else:
+        queryset, field = Notification.objects.filter(notificationreadstatus__user_id=user_id), 'message'
+    for term in query.split():
+        queryset = queryset.filter(**{f'{field}__icontains': term})
+    return list(queryset.order_by('-id').values_list('id', flat=True)[offset:offset + limit])
+
+
+def _ranked_ids(sql, user_id, query, limit, offset):
+    backend = BACKENDS.get(connection.vendor)
+    if backend is None:
+        return _contains_ids(sql, user_id, query, limit, offset)
+    backend = backend()
+    prepared = backend.prepare(query)
+    if prepared is None:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(getattr(backend, sql), [user_id, prepared, limit, offset])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _in_rank_order(queryset, ids):
+    by_id = queryset.in_bulk(ids)
+    return [by_id[pk] for pk in ids if pk in by_id]
+
+
+def search_messages(user, query, limit=DEFAULT_SEARCH_PAGE_SIZE, offset=0):
+    """Returns up to `limit` messages from the user's chats matching `query`, best match first."""
+    ids = _ranked_ids('messages_sql', user.id, query, limit, offset)
+    return _in_rank_order(Message.objects.select_related('sender'), ids)
+
+
+def search_notifications(user, query, limit=DEFAULT_SEARCH_PAGE_SIZE, offset=0):
+    """Returns up to `limit` of the user's notifications matching `query`, best match first."""
+    ids = _ranked_ids('notifications_sql', user.id, query, limit, offset)
+    return _in_rank_order(Notification.objects.all(), ids)
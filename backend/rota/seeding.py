@@ -0,0 +1,172 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .chats import ChatParticipant
+from .cycles import propose_cycles
+from .models import (
+    Availability, Chat, Message, Notification, NotificationReadStatus, Organisation, Role, Shift,
+    ShiftRoleRequirement, ShiftSwapRequest, ShiftTemplate, SwapOffer, User,
+)
+
+ROLE_NAMES = ["Chef", "Waiter", "Bartender", "Host", "Porter", "Cleaner", "Barista", "Runner", "Cashier", "Supervisor"]
+# Start hours of the day's shift patterns; every shift is 8 hours
+SHIFT_STARTS = [6, 10, 14]
+EMPLOYEES_PER_MANAGER = 25
+PAY_RATES = ["11.44", "12.00", "12.50", "13.75", "15.00"]
+BATCH_SIZE = 1000
+
+
+def _usernames(name, kind, count):
+    return [f"{name}-{kind}-{i}" for i in range(count)]
+
+
+@transaction.atomic
+def seed_organisation(name, employees=200, roles=6, weeks=8, shifts_per_week=4, notifications=50,
+                      chats=10, messages_per_chat=100, swaps=None, offers=None, password="benchmark", seed=0):
+    """
+    Creates an organisation shaped like a real one, for benchmarks and load tests:
+
+    - one manager per 25 employees, with employees spread over `roles` role titles;
+    - `shifts_per_week` 8-hour shifts per employee, half in the past and half upcoming,
+      over `weeks` weeks, plus a day of unavailability a week;
+    - `notifications` notifications sent to everyone, the older half read;
+    - `chats` chats with `messages_per_chat` messages each;
+    - pending swap requests and open swap offers on upcoming shifts (a tenth of the
+      employees each by default), with any swap cycles among the offers proposed;
+    - a shift template per manager.
+
+    Every user's password is `password`. The same `seed` always produces the same data.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    week_start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    first_day = week_start - timedelta(weeks=weeks // 2)
+    swaps = employees // 10 if swaps is None else swaps
+    offers = employees // 10 if offers is None else offers
+
+    organisation = Organisation.objects.create(name=name)
+    role_objects = Role.objects.bulk_create(
+        [Role(name=role_name, organisation=organisation) for role_name in (ROLE_NAMES * (roles // len(ROLE_NAMES) + 1))[:roles]]
+    )
+
+    # hashing once keeps seeding fast; every user shares the same password
+    password_hash = make_password(password)
+    managers = User.objects.bulk_create([
+        User(username=username, email=f"{username}@example.com", password=password_hash, role='manager',
+             organisation=organisation, first_name="Manager", last_name=str(i))
+        for i, username in enumerate(_usernames(name, 'mgr', max(1, employees // EMPLOYEES_PER_MANAGER)))
+    ])
+    staff = User.objects.bulk_create([
+        User(username=username, email=f"{username}@example.com", password=password_hash, role='employee',
+             organisation=organisation, role_title=role_objects[i % len(role_objects)],
+             pay_rate=rng.choice(PAY_RATES), first_name="Employee", last_name=str(i))
+        for i, username in enumerate(_usernames(name, 'emp', employees))
+    ], batch_size=BATCH_SIZE)
+    manager_of = {employee.id: managers[i % len(managers)] for i, employee in enumerate(staff)}
+
+    # each employee works the same days every week and is unavailable on one of their days off
+    shifts, unavailable = [], []
+    for employee in staff:
+        days = sorted(rng.sample(range(7), min(shifts_per_week, 7)))
+        days_off = [day for day in range(7) if day not in days]
+        start_hour = rng.choice(SHIFT_STARTS)
+        for week in range(weeks):
+            for day in days:
+                start = first_day + timedelta(weeks=week, days=day, hours=start_hour)
+                shifts.append(Shift(employee=employee, manager=manager_of[employee.id], start_time=start, end_time=start + timedelta(hours=8)))
+            if days_off:
+                start = first_day + timedelta(weeks=week, days=rng.choice(days_off))
+                if start > now:
+                    unavailable.append(Availability(user=employee, start_time=start, end_time=start + timedelta(days=1)))
+    shifts = Shift.objects.bulk_create(shifts, batch_size=BATCH_SIZE)
+    Availability.objects.bulk_create(unavailable, batch_size=BATCH_SIZE)
+
+    _seed_swaps(rng, staff, shifts, swaps, offers, now)
+    _seed_notifications(managers + staff, notifications, now)
+    _seed_chats(rng, managers, staff, chats, messages_per_chat)
+
+    for manager in managers:
+        start = week_start + timedelta(weeks=weeks // 2 + 1, hours=9)
+        template = ShiftTemplate.objects.create(manager=manager, start_time=start, end_time=start + timedelta(hours=8))
+        ShiftRoleRequirement.objects.bulk_create([
+            ShiftRoleRequirement(shift_template=template, role=role, quantity=1) for role in role_objects[:2]
+        ])
+
+    propose_cycles(organisation.id)
+    return organisation
+
+
+def _seed_swaps(rng, staff, shifts, swaps, offers, now):
+    upcoming = [shift for shift in shifts if shift.start_time > now]
+    rng.shuffle(upcoming)
+    busy = {}
+    for shift in shifts:
+        busy.setdefault(shift.employee_id, set()).add(shift.start_time.date())
+    by_role = {}
+    for employee in staff:
+        by_role.setdefault(employee.role_title_id, []).append(employee)
+    role_of = {employee.id: employee.role_title_id for employee in staff}
+
+    requests, requested_shift_ids, used_employees = [], [], set()
+    for shift in upcoming:
+        if len(requests) >= swaps:
+            break
+        if shift.employee_id in used_employees:
+            continue
+        # a coworker with the same role title who isn't working that day
+        free = [
+            coworker for coworker in by_role[role_of[shift.employee_id]]
+            if coworker.id != shift.employee_id and shift.start_time.date() not in busy[coworker.id]
+        ]
+        if not free:
+            continue
+        used_employees.add(shift.employee_id)
+        requests.append(ShiftSwapRequest(shift=shift, requested_by_id=shift.employee_id, requested_to=rng.choice(free)))
+        requested_shift_ids.append(shift.id)
+    ShiftSwapRequest.objects.bulk_create(requests, batch_size=BATCH_SIZE)
+    Shift.objects.filter(id__in=requested_shift_ids).update(is_swap_requested=True)
+
+    offered = [shift for shift in upcoming if shift.employee_id not in used_employees][:offers]
+    SwapOffer.objects.bulk_create([SwapOffer(shift=shift, offered_by_id=shift.employee_id) for shift in offered], batch_size=BATCH_SIZE)
+
+
+def _seed_notifications(users, count, now):
+    notifications = Notification.objects.bulk_create(
+        [Notification(message=f"Rota update {i + 1}: please check your shifts.") for i in range(count)]
+    )
+    statuses = []
+    for i, notification in enumerate(notifications):
+        read = i < count // 2
+        statuses.extend(
+            NotificationReadStatus(user=user, notification=notification, read=read, read_at=now if read else None)
+            for user in users
+        )
+    NotificationReadStatus.objects.bulk_create(statuses, batch_size=BATCH_SIZE)
+
+
+def _seed_chats(rng, managers, staff, count, messages_per_chat):
+    for i in range(count):
+        members = rng.sample(staff, min(len(staff), rng.randint(5, 30))) + managers
+        chat = Chat.objects.create(title=f"Team chat {i + 1}", created_by=managers[i % len(managers)])
+        ChatParticipant.objects.bulk_create([ChatParticipant(chat=chat, user=member) for member in members])
+        Message.objects.bulk_create([
+            Message(chat=chat, sender=rng.choice(members), content=f"Message {n + 1} about this week's rota")
+            for n in range(messages_per_chat)
+        ], batch_size=BATCH_SIZE)
+
+
+def delete_organisation(name):
+    """Removes an organisation made by `seed_organisation`, with everything belonging to its users."""
+    organisation = Organisation.objects.filter(name=name).first()
+    if organisation is None:
+        return False
+    users = User.objects.filter(organisation=organisation)
+    Notification.objects.filter(recipients__in=users).delete()
+    Chat.objects.filter(created_by__in=users).delete()
+    users.delete()
+    organisation.delete()
+    return True
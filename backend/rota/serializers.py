@@ -34,7 +34,7 @@ class UserSerializer(serializers.ModelSerializer):
         super().__init__(*args, **kwargs)
         request = self.context.get('request')
         if request and hasattr(request.user, 'organisation'):
-            self.fields['role_title'].queryset = Role.objects.filter(organisation=request.user.organisation)
+            self.fields['role_title'].queryset = Role.objects.filter(organisation_id=request.user.organisation_id)
 
     def to_representation(self, instance):
         rep = super().to_representation(instance)
@@ -121,7 +121,7 @@ class ShiftRoleRequirementSerializer(serializers.ModelSerializer):
 
         request = self.context.get('request')
         if request and hasattr(request.user, 'organisation'):
-            self.fields['role'].queryset = Role.objects.filter(organisation=request.user.organisation)
+            self.fields['role'].queryset = Role.objects.filter(organisation_id=request.user.organisation_id)
 
 class ShiftTemplateSerializer(serializers.ModelSerializer):
     required_roles = ShiftRoleRequirementSerializer(
@@ -148,13 +148,18 @@ class ShiftSerializer(serializers.ModelSerializer):
 
 class NotificationSerializer(serializers.ModelSerializer):
     read = serializers.SerializerMethodField()
+    merged_count = serializers.IntegerField(
+        read_only=True, default=1, help_text="Number of notifications merged into this one by digest mode"
+    )
 
     class Meta:
         model = Notification
-        fields = ['id', 'message', 'created_at', 'read']
+        fields = ['id', 'message', 'created_at', 'read', 'merged_count']
 
     @extend_schema_field(field=serializers.BooleanField())
     def get_read(self, obj) -> bool:
+        if hasattr(obj, 'is_read'):
+            return obj.is_read  # annotated by the view, saving a query per notification
         user = self.context['request'].user
         return NotificationReadStatus.objects.filter(user=user, notification=obj, read=True).exists()
 
@@ -172,6 +177,25 @@ class SendNotificationSerializer(serializers.Serializer):
     class Meta:
         ref_name = "SendNotification"
 
+class BulkMarkReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        help_text="Notification IDs to mark as read"
+    )
+    before = serializers.IntegerField(
+        required=False,
+        help_text="Mark every notification up to and including this ID as read"
+    )
+
+    class Meta:
+        ref_name = "BulkMarkRead"
+
+    def validate(self, attrs):
+        if 'ids' not in attrs and 'before' not in attrs:
+            raise serializers.ValidationError("Provide either 'ids' or 'before'.")
+        return attrs
+
 class PayEstimateSerializer(serializers.Serializer):
     this_month = serializers.DecimalField(max_digits=10, decimal_places=2)
     last_month = serializers.DecimalField(max_digits=10, decimal_places=2)
@@ -198,16 +222,98 @@ class ShiftSwapRequestSerializer(serializers.ModelSerializer):
             'manager_approved',
             'recipient_approved',
             'requested_at',
-            'approved_at'
+            'approved_at',
+            'rejected_at'
         ]
         read_only_fields = [
             'is_approved',
             'manager_approved',
             'recipient_approved',
             'requested_at',
-            'approved_at'
+            'approved_at',
+            'rejected_at'
         ]
 
+class ShiftSwapProposalSerializer(serializers.Serializer):
+    shift = serializers.IntegerField()
+    requested_to = serializers.IntegerField()
+
+    class Meta:
+        ref_name = "ShiftSwapProposal"
+
+class SwapCandidateSerializer(serializers.Serializer):
+    user = BasicUserSerializer()
+    workload_hours = serializers.FloatField()
+
+    class Meta:
+        ref_name = "SwapCandidate"
+
+class BulkSwapDecisionSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=['approve', 'reject'])
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        min_length=1,
+        max_length=500,
+        help_text="Swap request IDs to decide"
+    )
+
+    class Meta:
+        ref_name = "BulkSwapDecision"
+
+class BulkSwapResultSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    outcome = serializers.CharField()
+    detail = serializers.CharField()
+
+    class Meta:
+        ref_name = "BulkSwapResult"
+
+class SwapOfferSerializer(serializers.ModelSerializer):
+    shift = serializers.PrimaryKeyRelatedField(queryset=Shift.objects.all())
+    offered_by = serializers.StringRelatedField()
+
+    class Meta:
+        model = SwapOffer
+        fields = ['id', 'shift', 'offered_by', 'created_at', 'closed_at', 'cycle']
+        read_only_fields = ['created_at', 'closed_at', 'cycle']
+
+class SwapCycleLegSerializer(serializers.Serializer):
+    shift = serializers.IntegerField()
+    from_user = serializers.CharField()
+    to_user = serializers.CharField()
+
+    class Meta:
+        ref_name = "SwapCycleLeg"
+
+class SwapCycleSerializer(serializers.ModelSerializer):
+    legs = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SwapCycle
+        fields = ['id', 'created_at', 'executed_at', 'legs']
+
+    @extend_schema_field(SwapCycleLegSerializer(many=True))
+    def get_legs(self, obj):
+        # each offer's employee takes the next offer's shift, wrapping around
+        offers = sorted(obj.offers.all(), key=lambda offer: offer.cycle_position)
+        return [
+            {
+                'shift': offers[(i + 1) % len(offers)].shift_id,
+                'from_user': offers[(i + 1) % len(offers)].offered_by.username,
+                'to_user': offer.offered_by.username,
+            }
+            for i, offer in enumerate(offers)
+        ]
+
+class PaginatedShiftSwapRequestSerializer(serializers.Serializer):
+    count = serializers.IntegerField()
+    next = serializers.URLField(allow_null=True)
+    previous = serializers.URLField(allow_null=True)
+    results = ShiftSwapRequestSerializer(many=True)
+
+    class Meta:
+        ref_name = "PaginatedShiftSwapRequests"
+
 class EmployeeShiftCountSerializer(serializers.Serializer):
     employee = BasicUserSerializer()
     shifts = serializers.IntegerField()
@@ -234,6 +340,24 @@ class MessageSerializer(serializers.ModelSerializer):
         model = Message
         fields = ['id', 'sender', 'content', 'timestamp']
 
+class MessageSearchResultSerializer(MessageSerializer):
+    class Meta(MessageSerializer.Meta):
+        fields = ['id', 'chat', 'sender', 'content', 'timestamp']
+
+class NotificationSearchResultSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = ['id', 'message', 'created_at']
+
+class MessagePageSerializer(serializers.Serializer):
+    results = MessageSerializer(many=True)
+    deleted = serializers.ListField(child=serializers.IntegerField(), help_text="IDs of messages deleted since the 'after' cursor")
+    older = serializers.CharField(allow_null=True, help_text="Cursor for the previous (older) page, or null at the start of the chat")
+    newer = serializers.CharField(allow_null=True, help_text="Cursor to pass as 'after' when polling for changes")
+
+    class Meta:
+        ref_name = "MessagePage"
+
 class ChatSerializer(serializers.ModelSerializer):
     messages = MessageSerializer(many=True, read_only=True)
 
@@ -241,6 +365,42 @@ class ChatSerializer(serializers.ModelSerializer):
         model = Chat
         fields = ['id', 'title', 'participants', 'messages']
 
+class ChatInboxSerializer(serializers.ModelSerializer):
+    last_message = serializers.SerializerMethodField()
+    unread_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Chat
+        fields = ['id', 'title', 'created_at', 'last_message', 'unread_count']
+
+    @extend_schema_field(MessageSerializer(allow_null=True))
+    def get_last_message(self, obj):
+        if obj.last_message_id is None:
+            return None
+        return {
+            'id': obj.last_message_id,
+            'sender': obj.last_message_sender,
+            'content': obj.last_message_content,
+            'timestamp': serializers.DateTimeField().to_representation(obj.last_message_timestamp),
+        }
+
+class ChatParticipantsUpdateSerializer(serializers.Serializer):
+    add_user_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    add_role_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    remove_user_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    class Meta:
+        ref_name = "ChatParticipantsUpdate"
+
+class MarkChatReadSerializer(serializers.Serializer):
+    message_id = serializers.IntegerField(
+        required=False,
+        help_text="Last message read; defaults to the newest message in the chat"
+    )
+
+    class Meta:
+        ref_name = "MarkChatRead"
+
 class ChangePasswordSerializer(serializers.Serializer):
     old_password = serializers.CharField(write_only=True, required=True, help_text="Current password")
     new_password = serializers.CharField(write_only=True, required=True, help_text="New password")
@@ -0,0 +1,68 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import invalidate_cached_responses
+from .chats import ChatParticipant, invalidate_membership
+from .metrics import record_query
+from .models import Availability, Shift, User
+from .recommend import invalidate_organisation_index
+
+
+@receiver(m2m_changed, sender=ChatParticipant)
+def chat_participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if action == 'pre_clear':
+        # pk_set is not provided for clear(), so look up who is about to be removed
+        if reverse:
+            pk_set = set(ChatParticipant.objects.filter(user_id=instance.pk).values_list('chat_id', flat=True))
+        else:
+            pk_set = set(ChatParticipant.objects.filter(chat_id=instance.pk).values_list('user_id', flat=True))
+
+    if reverse:
+        invalidate_membership(pk_set, [instance.pk])
+    else:
+        invalidate_membership([instance.pk], pk_set)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # fires again whenever the connection reconnects
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _organisation_of(instance, relation):
+    # the related user is usually loaded already (auto-assign, serializers), so avoid a query per save
+    if instance._meta.get_field(relation).is_cached(instance):
+        return getattr(instance, relation).organisation_id
+    user_id = getattr(instance, f'{relation}_id')
+    return User.objects.filter(pk=user_id).values_list('organisation_id', flat=True).first()
+
+
+def organisation_changed(organisation_id):
+    """Shifts, availability or people changed: rebuild the swap index and drop cached responses."""
+    # once committed, so no request can rebuild the index from the old rows under the new version
+    transaction.on_commit(lambda: invalidate_organisation_index(organisation_id))
+    invalidate_cached_responses(organisation_ids=[organisation_id])
+
+
+@receiver([post_save, post_delete], sender=Shift)
+def shift_changed(sender, instance, **kwargs):
+    organisation_changed(_organisation_of(instance, 'employee'))
+
+
+@receiver([post_save, post_delete], sender=Availability)
+def availability_changed(sender, instance, **kwargs):
+    organisation_changed(_organisation_of(instance, 'user'))
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # every token login stamps last_login, which nothing cached or indexed depends on
+    if update_fields == {'last_login'}:
+        return
+    organisation_changed(instance.organisation_id)
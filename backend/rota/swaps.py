@@ -0,0 +1,255 @@
+from django.db import models, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+
+from .models import Availability, Shift, ShiftSwapRequest, User
+from .caching import invalidate_cached_responses
+from .recommend import invalidate_organisation_index
+
+PENDING = 'pending'
+MANAGER_APPROVED = 'manager_approved'
+RECIPIENT_APPROVED = 'recipient_approved'
+APPROVED = 'approved'
+REJECTED = 'rejected'
+
+# Sent once per committed transition with swap_id, previous, state and actor
+swap_state_changed = Signal()
+
+
+class SwapConflict(APIException):
+    status_code = 409
+    default_detail = "Swap request is no longer pending."
+    default_code = 'swap_conflict'
+
+
+def can_take_shift(user_id, shift):
+    """
+    Checks against the database, rather than the cached swap index, that the user is
+    another employee of the shift employee's organisation with the same role title and has
+    no shift or unavailability overlapping it.
+    """
+    owner = shift.employee
+    if user_id == owner.id or not User.objects.filter(
+        id=user_id, organisation_id=owner.organisation_id, role='employee', role_title_id=owner.role_title_id
+    ).exists():
+        return False
+    during = models.Q(start_time__lt=shift.end_time, end_time__gt=shift.start_time)
+    return not (
+        Shift.objects.filter(during, employee_id=user_id).exists()
+        or Availability.objects.filter(during, user_id=user_id).exists()
+    )
+
+
+def swap_state(swap):
+    if swap.rejected_at:
+        return REJECTED
+    if swap.is_approved:
+        return APPROVED
+    if swap.manager_approved:
+        return MANAGER_APPROVED
+    if swap.recipient_approved:
+        return RECIPIENT_APPROVED
+    return PENDING
+
+
+def _emit(swap_id, previous, state, actor):
+    transaction.on_commit(lambda: swap_state_changed.send(
+        sender=ShiftSwapRequest, swap_id=swap_id, previous=previous, state=state, actor=actor
+    ))
+
+
+def approve(swap, actor):
+    """
+    Records `actor`'s approval as the shift manager or the recipient and completes the swap
+    once both have approved. Every step is a conditional UPDATE, so concurrent approvals
+    can neither be lost nor complete the swap twice. Returns the resulting state.
+    """
+    if actor.id == swap.shift.manager_id:
+        flag, waiting, other_approved = 'manager_approved', MANAGER_APPROVED, RECIPIENT_APPROVED
+    elif actor.id == swap.requested_to_id:
+        flag, waiting, other_approved = 'recipient_approved', RECIPIENT_APPROVED, MANAGER_APPROVED
+    else:
+        raise ValueError("Only the shift manager or the recipient can approve a swap.")
+
+    with transaction.atomic():
+        open_swap = ShiftSwapRequest.objects.filter(id=swap.id, is_approved=False, rejected_at__isnull=True)
+        if not open_swap.filter(**{flag: False}).update(**{flag: True}):
+            if open_swap.exists():
+                return swap_state(ShiftSwapRequest.objects.get(id=swap.id))  # already approved by this party
+            raise SwapConflict()
+
+        # Only the caller whose UPDATE flips is_approved performs the reassignment
+        completed = open_swap.filter(manager_approved=True, recipient_approved=True).update(
+            is_approved=True, approved_at=timezone.now()
+        )
+        if not completed:
+            _emit(swap.id, PENDING, waiting, actor)
+            return waiting
+
+        moved = Shift.objects.filter(id=swap.shift_id, employee_id=swap.shift.employee_id).update(
+            employee_id=swap.requested_to_id, swap_approved=True, is_swap_requested=False
+        )
+        if not moved:
+            # the shift changed hands since the swap was read; roll everything back
+            raise SwapConflict("The shift was reassigned while this swap was being approved.")
+        organisation_id = swap.shift.manager.organisation_id
+        transaction.on_commit(lambda: invalidate_organisation_index(organisation_id))
+        invalidate_cached_responses(organisation_ids=[organisation_id])
+
+        _emit(swap.id, other_approved, APPROVED, actor)
+        return APPROVED
+
+
+def reject(swap, actor):
+    """Moves an open swap to the terminal rejected state. Returns the previous state."""
+    with transaction.atomic():
+        current = ShiftSwapRequest.objects.select_for_update().filter(
+            id=swap.id, is_approved=False, rejected_at__isnull=True
+        ).first()
+        if current is None:
+            raise SwapConflict()
+        previous = swap_state(current)
+
+        rejected = ShiftSwapRequest.objects.filter(
+            id=swap.id, is_approved=False, rejected_at__isnull=True
+        ).update(rejected_at=timezone.now(), manager_approved=False, recipient_approved=False)
+        if not rejected:
+            raise SwapConflict()
+        Shift.objects.filter(id=swap.shift_id).update(swap_approved=False, is_swap_requested=False)
+        invalidate_cached_responses(organisation_ids=[actor.organisation_id])
+
+        _emit(swap.id, previous, REJECTED, actor)
+        return previous
+
+
+def _overlaps(intervals, start, end):
+    return any(other_start < end and start < other_end for other_start, other_end in intervals)
+
+
+def bulk_decide(swap_ids, actor, action):
+    """
+    Applies the manager's approval or rejection to many swaps in one transaction.
+
+    Swaps are read once, completed swaps are checked against the recipients' other shifts
+    in memory, and each kind of transition is a single set-based UPDATE. Returns a
+    `{swap_id: (outcome, detail)}` map; outcomes are the resulting state or `not_found`,
+    `forbidden`, `conflict` or `overlap`. Raises SwapConflict (rolling everything back)
+    if another request changes one of the swaps or shifts mid-way.
+    """
+    results = {}
+    with transaction.atomic():
+        found = {
+            swap.id: swap for swap in ShiftSwapRequest.objects.filter(id__in=swap_ids).select_related('shift')
+        }
+        decidable = []
+        for swap_id in dict.fromkeys(swap_ids):
+            swap = found.get(swap_id)
+            if swap is None:
+                results[swap_id] = ('not_found', "Swap request not found.")
+            elif swap.shift.manager_id != actor.id:
+                results[swap_id] = ('forbidden', "Only the shift manager can decide this swap in bulk.")
+            elif swap.is_approved or swap.rejected_at:
+                results[swap_id] = ('conflict', SwapConflict.default_detail)
+            else:
+                decidable.append(swap)
+
+        if action == 'reject':
+            _bulk_reject(decidable, actor, results)
+        else:
+            _bulk_approve(decidable, actor, results)
+    return {swap_id: results[swap_id] for swap_id in dict.fromkeys(swap_ids)}
+
+
+def _bulk_reject(decidable, actor, results):
+    ids = [swap.id for swap in decidable]
+    rejected = ShiftSwapRequest.objects.filter(id__in=ids, is_approved=False, rejected_at__isnull=True).update(
+        rejected_at=timezone.now(), manager_approved=False, recipient_approved=False
+    )
+    if rejected != len(ids):
+        raise SwapConflict("Some swaps changed while they were being rejected; nothing was rejected.")
+    Shift.objects.filter(id__in=[swap.shift_id for swap in decidable]).update(swap_approved=False, is_swap_requested=False)
+    invalidate_cached_responses(organisation_ids=[actor.organisation_id])
+
+    for swap in decidable:
+        _emit(swap.id, swap_state(swap), REJECTED, actor)
+        results[swap.id] = (REJECTED, "Swap request has been rejected.")
+
+
+def _bulk_approve(decidable, actor, results):
+    for swap in decidable:
+        if swap.manager_approved:
+            results[swap.id] = (MANAGER_APPROVED, "Approval recorded. Waiting for the other party.")
+    decidable = [swap for swap in decidable if not swap.manager_approved]
+    waiting = [swap for swap in decidable if not swap.recipient_approved]
+    completing = [swap for swap in decidable if swap.recipient_approved]
+
+    # Each completing swap hands its shift to the recipient. Check the recipients' calendars as
+    # they'll be once the batch is applied, without a query per swap: refuse the first move that
+    # would leave its recipient double-booked, give that shift back to its owner, and check again.
+    calendars = {}
+    if completing:
+        rows = Shift.objects.filter(
+            employee_id__in={swap.requested_to_id for swap in completing},
+            start_time__lt=max(swap.shift.end_time for swap in completing),
+            end_time__gt=min(swap.shift.start_time for swap in completing),
+        ).values_list('id', 'employee_id', 'start_time', 'end_time')
+        for shift_id, employee_id, start, end in rows:
+            calendars.setdefault(employee_id, {})[shift_id] = (start, end)
+
+    by_shift = {}
+    for swap in completing:
+        if swap.shift_id in by_shift:
+            results[swap.id] = ('conflict', "Another swap in this batch already moves this shift.")
+        else:
+            by_shift[swap.shift_id] = swap
+    while True:
+        after = {
+            employee_id: {shift_id: times for shift_id, times in shifts.items() if shift_id not in by_shift}
+            for employee_id, shifts in calendars.items()
+        }
+        for swap in by_shift.values():
+            after.setdefault(swap.requested_to_id, {})[swap.shift_id] = (swap.shift.start_time, swap.shift.end_time)
+        clash = next((
+            swap for swap in by_shift.values()
+            if _overlaps(
+                [times for shift_id, times in after[swap.requested_to_id].items() if shift_id != swap.shift_id],
+                swap.shift.start_time, swap.shift.end_time
+            )
+        ), None)
+        if clash is None:
+            break
+        del by_shift[clash.shift_id]
+        results[clash.id] = ('overlap', "The recipient already has a shift at that time.")
+    moves = list(by_shift.values())
+
+    now = timezone.now()
+    open_swaps = ShiftSwapRequest.objects.filter(is_approved=False, rejected_at__isnull=True, manager_approved=False)
+    if waiting:
+        updated = open_swaps.filter(id__in=[swap.id for swap in waiting], recipient_approved=False).update(manager_approved=True)
+        if updated != len(waiting):
+            raise SwapConflict("Some swaps changed while they were being approved; nothing was approved.")
+    if moves:
+        updated = open_swaps.filter(id__in=[swap.id for swap in moves], recipient_approved=True).update(
+            manager_approved=True, is_approved=True, approved_at=now
+        )
+        held = models.Q()
+        for swap in moves:
+            held |= models.Q(id=swap.shift_id, employee_id=swap.shift.employee_id)
+        moved = Shift.objects.filter(held).update(
+            employee_id=models.Case(*[models.When(id=swap.shift_id, then=models.Value(swap.requested_to_id)) for swap in moves]),
+            swap_approved=True,
+            is_swap_requested=False,
+        )
+        if updated != len(moves) or moved != len(moves):
+            raise SwapConflict("Some swaps or shifts changed while they were being approved; nothing was approved.")
+        organisation_id = actor.organisation_id
+        transaction.on_commit(lambda: invalidate_organisation_index(organisation_id))
+        invalidate_cached_responses(organisation_ids=[organisation_id])
+
+    for swap in waiting:
+        _emit(swap.id, PENDING, MANAGER_APPROVED, actor)
+        results[swap.id] = (MANAGER_APPROVED, "Approval recorded. Waiting for the other party.")
+    for swap in moves:
+        _emit(swap.id, RECIPIENT_APPROVED, APPROVED, actor)
+        results[swap.id] = (APPROVED, "Swap fully approved and completed.")
@@ -1,6 +1,38 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+import time
+from io import StringIO
+from unittest import skipUnless
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
-from rota.models import Shift, Organisation
+from django.contrib.auth.models import update_last_login
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rota.authentication import ClaimsJWTAuthentication
+from rota.benchmarking import Fixtures, access_token, case_label, endpoint_cases, url_names
+from rota.consumers import chat_socket
+from rota.middleware import RequestMetricsMiddleware, StaticFilesMiddleware
+from rota.models import (
+    Availability, Shift, Organisation, Notification, NotificationReadStatus,
+    ArchivedNotificationReadStatus, NotificationReadSummary, Chat, Message, Role, ShiftSwapRequest,
+    SwapCycle, SwapOffer, RevokedToken, ChatReadCursor,
+)
+from rota import metrics, revocation, search, swaps
+from rota.cycles import find_cycles, propose_cycles
+from rota.chats import is_chat_participant
+from rota.db_routers import ReplicaStickinessMiddleware, mark_recent_write, replica_reads
+from rota.recommend import get_organisation_index
+from rota.realtime import OVERFLOW, InMemoryChatHub, get_hub
+from rota.retention import archive_read_statuses
+from rota.seeding import seed_organisation
+from rota.swaps import SwapConflict, swap_state_changed
 from django.utils import timezone
 from datetime import timedelta
 from django.core.exceptions import ValidationError
@@ -117,3 +149,1648 @@ class ShiftTests(TestCase):
         # Call full_clean to trigger validation
         with self.assertRaises(ValidationError):
             shift.full_clean()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class AuthTokenTests(TestCase):
+    def setUp(self):
+        self.organisation = Organisation.objects.create(name="Test Organisation")
+        self.user = User.objects.create_user(
+            username="employee1", password="password123", role="employee",
+            organisation=self.organisation, email="employee1@example.com"
+        )
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post("/api/login/", {"username": "employee1", "password": "password123"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    @override_settings(TOKEN_REVOCATION_SYNC_SECONDS=3600)
+    def test_authentication_reads_no_rows(self):
+        access = self.login()["access"]
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {access}")
+        revocation.store.sync()  # as on any request after the first in a sync interval
+
+        with self.assertNumQueries(0):
+            user, _ = ClaimsJWTAuthentication().authenticate(request)
+            self.assertEqual((user.id, user.role, user.organisation_id), (self.user.id, "employee", self.organisation.id))
+            self.assertEqual(user, self.user)
+
+        with self.assertNumQueries(1):  # the first other field loads the whole row
+            self.assertEqual(user.email, "employee1@example.com")
+            self.assertEqual(user.username, "employee1")
+            self.assertIsNotNone(user.date_joined)
+
+    def test_refresh_picks_up_role_changes(self):
+        refresh = self.login()["refresh"]
+        User.objects.filter(id=self.user.id).update(role="manager")
+
+        access = self.client.post("/api/token/refresh/", {"refresh": refresh}, format="json").data["access"]
+        self.assertEqual(AccessToken(access)["role"], "manager")
+
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        response = self.client.post("/api/token/refresh/", {"refresh": refresh}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_logout_revokes_the_whole_session(self):
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(self.client.get("/api/testauth/").status_code, 200)
+
+        response = self.client.post("/api/logout/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get("/api/testauth/").status_code, 401)
+
+        self.client.credentials()
+        response = self.client.post("/api/token/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+        response = self.client.post("/api/logout/", {"refresh": "not-a-token"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_revocations_reach_other_processes_and_expire(self):
+        refresh = RefreshToken(self.login()["refresh"])
+        other_process = revocation.RevocationStore()
+        other_process.sync()
+
+        revocation.revoke_token(refresh)
+        self.assertFalse(other_process.is_revoked(revocation.session_id(refresh)))  # until its next sync
+        with override_settings(TOKEN_REVOCATION_SYNC_SECONDS=0):
+            self.assertTrue(other_process.is_revoked(revocation.session_id(refresh)))
+
+        RevokedToken.objects.create(jti="expired", expires_at=timezone.now() - timedelta(seconds=1))
+        with override_settings(TOKEN_REVOCATION_SYNC_SECONDS=0, TOKEN_REVOCATION_PURGE_SECONDS=0):
+            other_process.sync()
+        self.assertEqual(list(RevokedToken.objects.values_list("jti", flat=True)), [revocation.session_id(refresh)])
+
+    def test_changing_password_keeps_changes_made_since_the_token_was_issued(self):
+        User.objects.filter(id=self.user.id).update(role="manager")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login()['access']}")
+        User.objects.filter(id=self.user.id).update(role="employee", is_active=False)
+
+        response = self.client.post(
+            "/api/users/change-password/",
+            {"old_password": "password123", "new_password": "An0ther-Secure-Pass"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.role, self.user.is_active), ("employee", False))
+        self.assertTrue(self.user.check_password("An0ther-Secure-Pass"))
+
+    def test_claims_user_cannot_be_saved(self):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {self.login()['access']}")
+        user, _ = ClaimsJWTAuthentication().authenticate(request)
+        with self.assertRaises(TypeError):
+            user.save()
+
+    @override_settings(TOKEN_REVOCATION_SYNC_SECONDS=3600)
+    def test_tokens_without_claims_still_authenticate(self):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        revocation.store.sync()
+        with self.assertNumQueries(1):
+            user, _ = ClaimsJWTAuthentication().authenticate(request)
+        self.assertEqual(user.email, "employee1@example.com")
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class NotificationTests(TestCase):
+    def setUp(self):
+        self.organisation = Organisation.objects.create(name="Test Organisation")
+        self.employee = User.objects.create_user(
+            username="employee1",
+            password="password123",
+            role="employee",
+            organisation=self.organisation
+        )
+        self.notifications = []
+        for i in range(5):
+            notification = Notification.objects.create(message=f"Notice {i}")
+            NotificationReadStatus.objects.create(user=self.employee, notification=notification)
+            self.notifications.append(notification)
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.employee)
+
+    def test_bulk_mark_read_by_ids(self):
+        """
+        Test marking a list of notifications as read in one request.
+        """
+        ids = [self.notifications[0].id, self.notifications[2].id]
+        response = self.client.post("/api/notifications/read/", {"ids": ids}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"updated": 2, "unread_count": 3})
+        self.assertEqual(
+            NotificationReadStatus.objects.filter(user=self.employee, read=True, read_at__isnull=False).count(), 2
+        )
+
+    def test_bulk_mark_read_before_cursor(self):
+        """
+        Test marking every notification up to a cursor as read.
+        """
+        with self.assertNumQueries(2):
+            response = self.client.post(
+                "/api/notifications/read/", {"before": self.notifications[3].id}, format="json"
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"updated": 4, "unread_count": 1})
+
+    def test_bulk_mark_read_requires_target(self):
+        """
+        Test that an empty request is rejected.
+        """
+        response = self.client.post("/api/notifications/read/", {}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class NotificationRetentionTests(TestCase):
+    def setUp(self):
+        self.organisation = Organisation.objects.create(name="Test Organisation")
+        self.manager = User.objects.create_user(
+            username="manager1",
+            password="password123",
+            role="manager",
+            organisation=self.organisation
+        )
+        self.employee = User.objects.create_user(
+            username="employee1",
+            password="password123",
+            role="employee",
+            organisation=self.organisation
+        )
+        self.client = APIClient()
+
+    def _create_status(self, read_days_ago=None):
+        notification = Notification.objects.create(message="Rota published")
+        Notification.objects.filter(id=notification.id).update(created_at=timezone.now() - timedelta(days=200))
+        read_at = timezone.now() - timedelta(days=read_days_ago) if read_days_ago is not None else None
+        return NotificationReadStatus.objects.create(
+            user=self.employee, notification=notification, read=read_at is not None, read_at=read_at
+        )
+
+    def test_archive_moves_old_read_statuses(self):
+        """
+        Test that old read statuses are archived in batches and their notifications purged.
+        """
+        for _ in range(3):
+            self._create_status(read_days_ago=120)
+        recent = self._create_status(read_days_ago=1)
+        unread = self._create_status()
+
+        moved = archive_read_statuses(days=90, batch_size=2)
+
+        self.assertEqual(moved, 3)
+        self.assertEqual(ArchivedNotificationReadStatus.objects.filter(user=self.employee).count(), 3)
+        self.assertQuerySetEqual(
+            NotificationReadStatus.objects.order_by('id'), [recent, unread]
+        )
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_summarise_counts_per_month(self):
+        """
+        Test that summarising folds old read statuses into monthly counts.
+        """
+        for _ in range(3):
+            self._create_status(read_days_ago=120)
+
+        archive_read_statuses(days=90, batch_size=2, summarise=True)
+
+        summary = NotificationReadSummary.objects.get(user=self.employee)
+        self.assertEqual(summary.count, 3)
+        self.assertFalse(ArchivedNotificationReadStatus.objects.exists())
+
+    @override_settings(NOTIFICATION_DIGEST_WINDOW=300)
+    def test_digest_merges_bursts(self):
+        """
+        Test that a burst of notifications to the same user produces a single unread row.
+        """
+        self.client.force_authenticate(user=self.manager)
+        for i in range(3):
+            response = self.client.post(
+                "/api/notifications/send/",
+                {"message": f"Update {i}", "recipients": [self.employee.id], "roles": []},
+                format="json"
+            )
+            self.assertEqual(response.status_code, 201)
+
+        status = NotificationReadStatus.objects.get(user=self.employee)
+        self.assertEqual(status.merged_count, 3)
+        self.assertEqual(status.notification.message, "Update 2")
+
+        self.client.force_authenticate(user=self.employee)
+        response = self.client.get("/api/notifications/")
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["merged_count"], 3)
+
+        # the notifications it replaced are still reachable from the digest
+        response = self.client.get(f"/api/notifications/{status.notification_id}/merged/")
+        self.assertEqual([n["message"] for n in response.data], ["Update 1", "Update 0"])
+
+    @override_settings(NOTIFICATION_DIGEST_WINDOW=300)
+    def test_merged_notifications_survive_archiving(self):
+        self.client.force_authenticate(user=self.manager)
+        for i in range(2):
+            self.client.post(
+                "/api/notifications/send/",
+                {"message": f"Update {i}", "recipients": [self.employee.id], "roles": []},
+                format="json"
+            )
+        status = NotificationReadStatus.objects.get(user=self.employee)
+        NotificationReadStatus.objects.filter(id=status.id).update(read=True, read_at=timezone.now() - timedelta(days=120))
+        Notification.objects.update(created_at=timezone.now() - timedelta(days=200))
+
+        archive_read_statuses(days=90)
+
+        archived = ArchivedNotificationReadStatus.objects.filter(user=self.employee)
+        self.assertEqual(sorted(archived.values_list("message", flat=True)), ["Update 0", "Update 1"])
+        self.assertFalse(Notification.objects.exists())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ChatMessageTests(TestCase):
+    def setUp(self):
+        self.organisation = Organisation.objects.create(name="Test Organisation")
+        self.manager = User.objects.create_user(
+            username="manager1",
+            password="password123",
+            role="manager",
+            organisation=self.organisation
+        )
+        self.employee = User.objects.create_user(
+            username="employee1",
+            password="password123",
+            role="employee",
+            organisation=self.organisation
+        )
+        cache.clear()
+        self.chat = Chat.objects.create(title="Kitchen", created_by=self.manager)
+        self.chat.participants.set([self.manager, self.employee])
+
+        # identical timestamps exercise the id tie-breaker
+        self.messages = [
+            Message.objects.create(chat=self.chat, sender=self.manager, content=f"Message {i}")
+            for i in range(7)
+        ]
+        Message.objects.filter(id__in=[m.id for m in self.messages[2:5]]).update(timestamp=self.messages[2].timestamp)
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.employee)
+        self.url = f"/api/chats/{self.chat.id}/messages/"
+
+    def _contents(self, response):
+        return [m["content"] for m in response.data["results"]]
+
+    def test_latest_page_and_history(self):
+        """
+        Test walking back through history with the 'before' cursor.
+        """
+        response = self.client.get(self.url, {"limit": 3})
+        self.assertEqual(self._contents(response), ["Message 4", "Message 5", "Message 6"])
+
+        response = self.client.get(self.url, {"limit": 3, "before": response.data["older"]})
+        self.assertEqual(self._contents(response), ["Message 1", "Message 2", "Message 3"])
+
+        response = self.client.get(self.url, {"limit": 3, "before": response.data["older"]})
+        self.assertEqual(self._contents(response), ["Message 0"])
+        self.assertIsNone(response.data["older"])
+
+    def test_poll_with_after_cursor(self):
+        """
+        Test that 'after' returns only messages newer than the cursor.
+        """
+        response = self.client.get(self.url)
+        newer = response.data["newer"]
+
+        Message.objects.create(chat=self.chat, sender=self.manager, content="Fresh")
+        response = self.client.get(self.url, {"after": newer})
+        self.assertEqual(self._contents(response), ["Fresh"])
+
+        response = self.client.get(self.url, {"after": response.data["newer"]})
+        self.assertEqual(self._contents(response), [])
+
+    def test_sender_is_not_fetched_per_message(self):
+        """
+        Test that the query count does not grow with the page size.
+        """
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data["results"]), 7)
+        self.assertEqual(response.data["results"][0]["sender"], "manager1")
+
+    def test_poll_reports_deleted_messages(self):
+        """
+        Test that messages deleted after the cursor was issued come back as tombstones.
+        """
+        newer = self.client.get(self.url).data["newer"]
+
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.delete(f"/api/messages/{self.messages[3].id}/delete/")
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(self.url, {"after": newer})
+        self.assertEqual(response.data["results"], [])
+        self.assertEqual(response.data["deleted"], [self.messages[3].id])
+
+        response = self.client.get(self.url, {"after": response.data["newer"]})
+        self.assertEqual(response.data["deleted"], [])
+
+    @override_settings(CHAT_LONG_POLL_INTERVAL=0.01)
+    def test_long_poll_times_out_without_activity(self):
+        """
+        Test that a long poll with nothing new returns an empty page after the wait.
+        """
+        newer = self.client.get(self.url).data["newer"]
+
+        started = time.monotonic()
+        response = self.client.get(self.url, {"after": newer, "wait": 0.1})
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+        self.assertEqual(response.data["results"], [])
+        self.assertEqual(response.data["newer"], newer)
+
+    @override_settings(CHAT_LONG_POLL_INTERVAL=0.01)
+    def test_long_poll_rejects_waits_that_never_end(self):
+        newer = self.client.get(self.url).data["newer"]
+        for wait in ("nan", "inf"):
+            response = self.client.get(self.url, {"after": newer, "wait": wait})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data, {"wait": "Must be a number."})
+
+        started = time.monotonic()
+        response = self.client.get(self.url, {"after": newer, "wait": -1})
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(time.monotonic() - started, 1)
+
+    @override_settings(CHAT_LONG_POLL_INTERVAL=0.01, CHAT_SYNC_LONG_POLL_TIMEOUT=0.1)
+    def test_sync_long_poll_is_capped(self):
+        newer = self.client.get(self.url).data["newer"]
+
+        started = time.monotonic()
+        response = self.client.get(self.url, {"after": newer, "wait": 20})
+
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(response.data["results"], [])
+
+    @override_settings(CACHE_BACKEND="redis")
+    def test_membership_is_cached_and_invalidated(self):
+        """
+        Test that repeat requests skip the membership query until the participants change.
+        """
+        self.client.get(self.url)
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+        self.chat.participants.remove(self.employee)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+        self.chat.participants.add(self.employee)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        self.chat.participants.clear()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_unknown_chat(self):
+        response = self.client.get("/api/chats/999999/messages/")
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.post("/api/chats/999999/send/", {"content": "Hello"}, format="json")
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"before": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ChatSocketTests(TransactionTestCase):
+    def setUp(self):
+        self.organisation = Organisation.objects.create(name="Test Organisation")
+        self.manager = User.objects.create_user(
+            username="manager1",
+            password="password123",
+            role="manager",
+            organisation=self.organisation
+        )
+        self.employee = User.objects.create_user(
+            username="employee1",
+            password="password123",
+            role="employee",
+            organisation=self.organisation
+        )
+        self.outsider = User.objects.create_user(
+            username="outsider",
+            password="password123",
+            role="employee",
+            organisation=self.organisation
+        )
+        cache.clear()
+        self.chat = Chat.objects.create(title="Kitchen", created_by=self.manager)
+        self.chat.participants.set([self.manager, self.employee])
+
+    async def _connect(self, user, token=None):
+        inbox, outbox = asyncio.Queue(), asyncio.Queue()
+        scope = {
+            "type": "websocket",
+            "path": f"/ws/chats/{self.chat.id}/",
+            "query_string": f"token={token or AccessToken.for_user(user)}".encode(),
+        }
+        task = asyncio.create_task(chat_socket(scope, inbox.get, outbox.put))
+        await inbox.put({"type": "websocket.connect"})
+        return inbox, outbox, task
+
+    async def _next(self, outbox):
+        return await asyncio.wait_for(outbox.get(), timeout=5)
+
+    def test_rejects_non_participants(self):
+        async def scenario():
+            _, outbox, task = await self._connect(self.outsider)
+            self.assertEqual(await self._next(outbox), {"type": "websocket.close", "code": 4403})
+            await task
+
+        async_to_sync(scenario)()
+
+    def test_broadcasts_sends_and_deletes(self):
+        """
+        Test that messages sent over the socket or the HTTP API reach every connected participant.
+        """
+        client = APIClient()
+        client.force_authenticate(user=self.employee)
+
+        async def scenario():
+            manager_inbox, manager_outbox, manager_task = await self._connect(self.manager)
+            employee_inbox, employee_outbox, employee_task = await self._connect(self.employee)
+            self.assertEqual((await self._next(manager_outbox))["type"], "websocket.accept")
+            self.assertEqual((await self._next(employee_outbox))["type"], "websocket.accept")
+
+            await manager_inbox.put({"type": "websocket.receive", "text": json.dumps({"type": "message.send", "content": "Hello"})})
+            for outbox in (manager_outbox, employee_outbox):
+                event = json.loads((await self._next(outbox))["text"])
+                self.assertEqual(event["type"], "message.created")
+                self.assertEqual(event["message"]["content"], "Hello")
+
+            response = await sync_to_async(client.post)(
+                f"/api/chats/{self.chat.id}/send/", {"content": "Hi"}, format="json"
+            )
+            event = json.loads((await self._next(manager_outbox))["text"])
+            self.assertEqual(event["message"]["id"], response.data["id"])
+
+            await sync_to_async(client.delete)(f"/api/messages/{response.data['id']}/delete/")
+            event = json.loads((await self._next(manager_outbox))["text"])
+            self.assertEqual(event, {"type": "message.deleted", "message_id": response.data["id"]})
+
+            for inbox in (manager_inbox, employee_inbox):
+                await inbox.put({"type": "websocket.disconnect"})
+            await asyncio.gather(manager_task, employee_task)
+
+        async_to_sync(scenario)()
+        self.assertEqual(get_hub().subscriber_count(self.chat.id), 0)
+
+    def test_removed_participant_is_disconnected_when_posting(self):
+        async def scenario():
+            inbox, outbox, task = await self._connect(self.employee)
+            self.assertEqual((await self._next(outbox))["type"], "websocket.accept")
+            await sync_to_async(self.chat.participants.remove)(self.employee)
+
+            await inbox.put({"type": "websocket.receive", "text": json.dumps({"type": "message.send", "content": "Hello"})})
+            self.assertEqual(await self._next(outbox), {"type": "websocket.close", "code": 4403})
+            await task
+
+        async_to_sync(scenario)()
+        self.assertFalse(Message.objects.exists())
+
+    @override_settings(CHAT_SOCKET_RECHECK_SECONDS=0.05)
+    def test_revoked_session_is_disconnected_while_idle(self):
+        token = AccessToken.for_user(self.employee)
+
+        async def scenario():
+            inbox, outbox, task = await self._connect(self.employee, token)
+            self.assertEqual((await self._next(outbox))["type"], "websocket.accept")
+            await sync_to_async(revocation.revoke_token)(token)
+            self.assertEqual(await self._next(outbox), {"type": "websocket.close", "code": 4403})
+            await task
+
+        async_to_sync(scenario)()
+
+    def test_failures_inside_the_socket_are_raised(self):
+        async def scenario():
+            inbox, sent = asyncio.Queue(), []
+
+            async def send(event):
+                if event["type"] == "websocket.send":
+                    raise ConnectionResetError("client went away")
+                sent.append(event)
+
+            scope = {
+                "type": "websocket",
+                "path": f"/ws/chats/{self.chat.id}/",
+                "query_string": f"token={AccessToken.for_user(self.employee)}".encode(),
+            }
+            task = asyncio.create_task(chat_socket(scope, inbox.get, send))
+            await inbox.put({"type": "websocket.connect"})
+            await inbox.put({"type": "websocket.receive", "text": json.dumps({"type": "message.send", "content": "Hello"})})
+            with self.assertRaises(ConnectionResetError):
+                await asyncio.wait_for(task, timeout=5)
+
+        async_to_sync(scenario)()
+        self.assertEqual(get_hub().subscriber_count(self.chat.id), 0)
+
+    def test_slow_consumer_is_disconnected(self):
+        """
+        Test that a subscriber whose queue fills up is closed instead of buffering without limit.
+        """
+        async def scenario():
+            hub = InMemoryChatHub(max_pending=3)
+            subscription = hub.subscribe(self.chat.id)
+            for i in range(5):
+                hub.publish(self.chat.id, {"n": i})
+            received = [await subscription.get() for _ in range(4)]
+            self.assertEqual(received[:3], [{"n": 0}, {"n": 1}, {"n": 2}])
+            self.assertIs(received[3], OVERFLOW)
+            subscription.close()
+            self.assertEqual(hub.subscriber_count(self.chat.id), 0)
+
+        async_to_sync(scenario)()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ChatInboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organisation = Organisation.objects.create(name="Test Organisation")
+        self.manager = User.objects.create_user(
+            username="manager1",
+            password="password123",
+            role="manager",
+            organisation=self.organisation
+        )
+        self.employee = User.objects.create_user(
+            username="employee1",
+            password="password123",
+            role="employee",
+            organisation=self.organisation
+        )
+        self.chats = []
+        for title in ("Kitchen", "Bar", "Quiet"):
+            chat = Chat.objects.create(title=title, created_by=self.manager)
+            chat.participants.set([self.manager, self.employee])
+            self.chats.append(chat)
+        kitchen, bar, _ = self.chats
+
+        Message.objects.create(chat=kitchen, sender=self.manager, content="Prep at 8")
+        Message.objects.create(chat=kitchen, sender=self.employee, content="On it")
+        Message.objects.create(chat=kitchen, sender=self.manager, content="Thanks")
+        Message.objects.create(chat=bar, sender=self.manager, content="Stock take")
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.employee)
+
+    def test_inbox_lists_latest_message_and_unread_counts(self):
+        """
+        Test the inbox in one query, ignoring the user's own messages in the unread count.
+        """
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/chats/")
+
+        inbox = {chat["title"]: chat for chat in response.data}
+        self.assertEqual([chat["title"] for chat in response.data], ["Bar", "Kitchen", "Quiet"])
+        self.assertEqual(inbox["Kitchen"]["last_message"]["content"], "Thanks")
+        self.assertEqual(inbox["Kitchen"]["last_message"]["sender"], "manager1")
+        self.assertEqual(inbox["Kitchen"]["unread_count"], 2)
+        self.assertEqual(inbox["Bar"]["unread_count"], 1)
+        self.assertIsNone(inbox["Quiet"]["last_message"])
+        self.assertEqual(inbox["Quiet"]["unread_count"], 0)
+
+    def test_mark_read_moves_cursor_forward_only(self):
+        kitchen = self.chats[0]
+        response = self.client.post(f"/api/chats/{kitchen.id}/read/", {}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        first = kitchen.messages.order_by('id').first()
+        response = self.client.post(f"/api/chats/{kitchen.id}/read/", {"message_id": first.id}, format="json")
+        self.assertEqual(response.data["last_read_message_id"], kitchen.messages.order_by('id').last().id)
+
+        Message.objects.create(chat=kitchen, sender=self.manager, content="New")
+        inbox = {chat["title"]: chat for chat in self.client.get("/api/chats/").data}
+        self.assertEqual(inbox["Kitchen"]["unread_count"], 1)
+
+    def test_mark_read_rejects_messages_from_other_chats(self):
+        kitchen, bar = self.chats[0], self.chats[1]
+        elsewhere = bar.messages.order_by('id').last()
+        response = self.client.post(f"/api/chats/{kitchen.id}/read/", {"message_id": elsewhere.id}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ChatReadCursor.objects.filter(chat=kitchen, user=self.employee).exists())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organisation = Organisation.objects.create(name="Test Organisation")
+        self.manager = User.objects.create_user(
+            username="manager1",
+            password="password123",
+            role="manager",
+            organisation=self.organisation
+        )
+        self.employee = User.objects.create_user(
+            username="employee1",
+            password="password123",
+            role="employee",
+            organisation=self.organisation
+        )
+        kitchen = Chat.objects.create(title="Kitchen", created_by=self.manager)
+        kitchen.participants.set([self.manager, self.employee])
+        private = Chat.objects.create(title="Managers", created_by=self.manager)
+        private.participants.set([self.manager])
+
+        Message.objects.create(chat=kitchen, sender=self.manager, content="Delivery of flour arrives on Tuesday")
+        self.match = Message.objects.create(chat=kitchen, sender=self.manager, content="Flour delivery delayed, flour shortage")
+        Message.objects.create(chat=kitchen, sender=self.manager, content="Staff meeting at noon")
+        Message.objects.create(chat=private, sender=self.manager, content="Flour supplier contract")
+
+        notification = Notification.objects.create(message="Holiday rota published")
+        NotificationReadStatus.objects.create(user=self.employee, notification=notification)
+        other = Notification.objects.create(message="Holiday bonus for managers")
+        NotificationReadStatus.objects.create(user=self.manager, notification=other)
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.employee)
+
+    def test_messages_are_ranked_and_scoped_to_user_chats(self):
+        response = self.client.get("/api/search/", {"q": "flour"})
+
+        self.assertEqual(response.status_code, 200)
+        contents = [m["content"] for m in response.data["results"]]
+        self.assertEqual(len(contents), 2)
+        self.assertEqual(contents[0], self.match.content)
+        self.assertNotIn("Flour supplier contract", contents)
+
+    def test_index_follows_edits_and_deletes(self):
+        self.match.content = "Sugar delivery delayed"
+        self.match.save()
+        self.assertEqual(len(self.client.get("/api/search/", {"q": "sugar"}).data["results"]), 1)
+
+        self.match.delete()
+        self.assertEqual(self.client.get("/api/search/", {"q": "sugar"}).data["results"], [])
+
+    def test_pagination_and_prefix_terms(self):
+        response = self.client.get("/api/search/", {"q": "deliv", "limit": 1})
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["next_offset"], 1)
+
+        response = self.client.get("/api/search/", {"q": "deliv", "limit": 1, "offset": 1})
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNone(response.data["next_offset"])
+
+    def test_notifications_and_query_syntax(self):
+        response = self.client.get("/api/search/", {"q": "holiday", "type": "notifications"})
+        self.assertEqual([n["message"] for n in response.data["results"]], ["Holiday rota published"])
+
+        response = self.client.get("/api/search/", {"q": 'flour" OR (NEAR'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_punctuation_only_queries(self):
+        for query in ["!!!", "* - ?", 'flour !!!']:
+            response = self.client.get("/api/search/", {"q": query})
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["content"], self.match.content)
+        self.assertEqual(self.client.get("/api/search/", {"q": "!!!"}).data["results"], [])
+
+    def test_substring_fallback_for_other_databases(self):
+        # used where neither FTS5 nor PostgreSQL search is available
+        ids = search._contains_ids("messages_sql", self.employee.id, "FLOUR delay", 20, 0)
+        self.assertEqual(ids, [self.match.id])
+        ids = search._contains_ids("notifications_sql", self.employee.id, "holiday", 20, 0)
+        self.assertEqual(len(ids), 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ChatParticipantTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organisation = Organisation.objects.create(name="Test Organisation")
+        self.other_organisation = Organisation.objects.create(name="Other Organisation")
+        self.chef = Role.objects.create(name="Chef", organisation=self.organisation)
+        self.waiter = Role.objects.create(name="Waiter", organisation=self.organisation)
+
+        self.manager = User.objects.create_user(
+            username="manager1",
+            password="password123",
+            role="manager",
+            organisation=self.organisation
+        )
+        self.chefs = [
+            User.objects.create_user(
+                username=f"chef{i}", password="password123", role="employee",
+                organisation=self.organisation, role_title=self.chef
+            )
+            for i in range(3)
+        ]
+        self.waiter_user = User.objects.create_user(
+            username="waiter1", password="password123", role="employee",
+            organisation=self.organisation, role_title=self.waiter
+        )
+        # same role id, different organisation: must never be pulled in
+        self.stray = User.objects.create_user(
+            username="stray", password="password123", role="employee",
+            organisation=self.other_organisation, role_title=self.chef
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.manager)
+
+    def test_create_chat_resolves_roles_within_organisation(self):
+        response = self.client.post(
+            "/api/chats/create/",
+            {"title": "Kitchen", "user_ids": [self.manager.id, self.stray.id], "role_ids": [self.chef.id]},
+            format="json"
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertCountEqual(response.data["participants"], [self.manager.id] + [u.id for u in self.chefs])
+
+    @override_settings(CACHE_BACKEND="redis")
+    def test_participants_change_incrementally(self):
+        chat_id = self.client.post(
+            "/api/chats/create/", {"title": "Kitchen", "role_ids": [self.chef.id]}, format="json"
+        ).data["id"]
+
+        # membership of a removed chef was cached as True before the change
+        self.assertTrue(is_chat_participant(chat_id, self.chefs[0].id))
+
+        response = self.client.post(
+            f"/api/chats/{chat_id}/participants/",
+            {"add_role_ids": [self.chef.id, self.waiter.id], "remove_user_ids": [self.chefs[0].id]},
+            format="json"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"added": 1, "removed": 1, "participant_count": 3})
+        self.assertFalse(is_chat_participant(chat_id, self.chefs[0].id))
+        self.assertTrue(is_chat_participant(chat_id, self.waiter_user.id))
+
+    @override_settings(CACHE_BACKEND="redis")
+    def test_removed_participant_cannot_post_while_a_cached_answer_lingers(self):
+        chat_id = self.client.post(
+            "/api/chats/create/", {"title": "Kitchen", "role_ids": [self.chef.id]}, format="json"
+        ).data["id"]
+        self.assertTrue(is_chat_participant(chat_id, self.chefs[0].id))
+        # removed behind the cache's back, as by a worker whose invalidation hasn't arrived
+        Chat.participants.through.objects.filter(chat_id=chat_id, user_id=self.chefs[0].id).delete()
+
+        self.client.force_authenticate(user=self.chefs[0])
+        response = self.client.post(f"/api/chats/{chat_id}/send/", {"content": "Hello"}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+    def test_membership_is_not_cached_per_process(self):
+        chat_id = self.client.post(
+            "/api/chats/create/", {"title": "Kitchen", "role_ids": [self.chef.id]}, format="json"
+        ).data["id"]
+        self.assertTrue(is_chat_participant(chat_id, self.chefs[0].id))
+        Chat.participants.through.objects.filter(chat_id=chat_id, user_id=self.chefs[0].id).delete()
+        self.assertFalse(is_chat_participant(chat_id, self.chefs[0].id))
+
+    def test_only_managers_change_participants(self):
+        chat_id = self.client.post("/api/chats/create/", {"title": "Kitchen"}, format="json").data["id"]
+
+        self.client.force_authenticate(user=self.chefs[0])
+        response = self.client.post(f"/api/chats/{chat_id}/participants/", {"add_user_ids": [self.chefs[0].id]}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ShiftSwapTests(TestCase):
+    def setUp(self):
+        self.organisation = Organisation.objects.create(name="Test Organisation")
+        self.manager = User.objects.create_user(
+            username="manager1",
+            password="password123",
+            role="manager",
+            organisation=self.organisation
+        )
+        self.employee = User.objects.create_user(
+            username="employee1",
+            password="password123",
+            role="employee",
+            organisation=self.organisation
+        )
+        self.colleague = User.objects.create_user(
+            username="employee2",
+            password="password123",
+            role="employee",
+            organisation=self.organisation
+        )
+        start = timezone.now() + timedelta(days=1)
+        self.swaps = []
+        for day in range(5):
+            shift = Shift.objects.create(
+                employee=self.employee,
+                manager=self.manager,
+                start_time=start + timedelta(days=day),
+                end_time=start + timedelta(days=day, hours=8)
+            )
+            self.swaps.append(ShiftSwapRequest.objects.create(
+                shift=shift, requested_by=self.employee, requested_to=self.colleague
+            ))
+
+        self.client = APIClient()
+
+    def test_pending_swaps_are_paginated_without_n_plus_one(self):
+        self.client.force_authenticate(user=self.manager)
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/swaps/pending/", {"limit": 3})
+
+        self.assertEqual(response.data["count"], 5)
+        self.assertEqual([s["id"] for s in response.data["results"]], [s.id for s in self.swaps[:3]])
+        self.assertEqual(response.data["results"][0]["requested_to"], "employee2")
+        self.assertIsNotNone(response.data["next"])
+
+    def test_pending_swaps_for_recipient(self):
+        self.client.force_authenticate(user=self.colleague)
+        response = self.client.get("/api/swaps/pending/")
+        self.assertEqual(response.data["count"], 5)
+
+        self.client.force_authenticate(user=self.employee)
+        response = self.client.get("/api/swaps/pending/")
+        self.assertEqual(response.data["count"], 0)
+
+    def test_approval_flow(self):
+        swap = self.swaps[0]
+        self.client.force_authenticate(user=self.colleague)
+        response = self.client.patch(f"/api/swaps/approve/{swap.id}/")
+        self.assertEqual(response.data["detail"], "Approval recorded. Waiting for the other party.")
+
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.patch(f"/api/swaps/approve/{swap.id}/")
+        self.assertEqual(response.data["detail"], "Swap fully approved and completed.")
+        swap.shift.refresh_from_db()
+        self.assertEqual(swap.shift.employee, self.colleague)
+
+        response = self.client.patch(f"/api/swaps/reject/{swap.id}/")
+        self.assertEqual(response.status_code, 409)
+
+    def test_rejected_swaps_leave_the_pending_list(self):
+        self.client.force_authenticate(user=self.colleague)
+        response = self.client.patch(f"/api/swaps/reject/{self.swaps[0].id}/")
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get("/api/swaps/pending/")
+        self.assertEqual(response.data["count"], 4)
+
+        response = self.client.patch(f"/api/swaps/approve/{self.swaps[0].id}/")
+        self.assertEqual(response.status_code, 409)
+
+    def test_bulk_approval_reports_each_swap(self):
+        for swap in self.swaps[:2]:
+            swaps.approve(swap, self.colleague)
+        clash = self.swaps[1].shift
+        Shift.objects.create(
+            employee=self.colleague, manager=self.manager,
+            start_time=clash.start_time + timedelta(hours=2), end_time=clash.end_time + timedelta(hours=2)
+        )
+
+        self.client.force_authenticate(user=self.manager)
+        ids = [self.swaps[0].id, self.swaps[1].id, self.swaps[2].id, 999]
+        with self.assertNumQueries(7):  # independent of the number of swaps
+            response = self.client.post("/api/swaps/bulk/", {"action": "approve", "ids": ids}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        outcomes = [(r["id"], r["outcome"]) for r in response.data["results"]]
+        self.assertEqual(outcomes, [
+            (ids[0], "approved"), (ids[1], "overlap"), (ids[2], "manager_approved"), (999, "not_found"),
+        ])
+        self.assertEqual(Shift.objects.get(id=self.swaps[0].shift_id).employee, self.colleague)
+        self.assertEqual(Shift.objects.get(id=self.swaps[1].shift_id).employee, self.employee)
+
+    def test_bulk_approval_refuses_a_second_move_of_the_same_shift(self):
+        third = User.objects.create_user(
+            username="employee3", password="password123", role="employee", organisation=self.organisation
+        )
+        duplicate = ShiftSwapRequest.objects.create(shift=self.swaps[0].shift, requested_by=self.employee, requested_to=third)
+        swaps.approve(self.swaps[0], self.colleague)
+        swaps.approve(duplicate, third)
+
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.post("/api/swaps/bulk/", {"action": "approve", "ids": [self.swaps[0].id, duplicate.id]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["outcome"] for r in response.data["results"]], ["approved", "conflict"])
+        self.assertEqual(Shift.objects.get(id=self.swaps[0].shift_id).employee, self.colleague)
+
+    def test_bulk_approval_counts_a_refused_move_against_its_owner(self):
+        kept = self.swaps[0].shift
+        # the colleague can't take the employee's shift, so the employee keeps it...
+        Shift.objects.create(employee=self.colleague, manager=self.manager, start_time=kept.start_time, end_time=kept.end_time)
+        # ...and so can't take the colleague's shift an hour later either
+        later = Shift.objects.create(
+            employee=self.colleague, manager=self.manager,
+            start_time=kept.start_time + timedelta(hours=1), end_time=kept.end_time + timedelta(hours=1)
+        )
+        back = ShiftSwapRequest.objects.create(shift=later, requested_by=self.colleague, requested_to=self.employee)
+        swaps.approve(back, self.employee)
+        swaps.approve(self.swaps[0], self.colleague)
+
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.post("/api/swaps/bulk/", {"action": "approve", "ids": [back.id, self.swaps[0].id]}, format="json")
+        self.assertEqual([r["outcome"] for r in response.data["results"]], ["overlap", "overlap"])
+        self.assertEqual(Shift.objects.get(id=later.id).employee, self.colleague)
+
+    def test_bulk_rejection(self):
+        swaps.approve(self.swaps[0], self.colleague)
+        swaps.approve(self.swaps[0], self.manager)
+
+        self.client.force_authenticate(user=self.colleague)
+        response = self.client.post("/api/swaps/bulk/", {"action": "reject", "ids": [self.swaps[3].id]}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_authenticate(user=self.manager)
+        ids = [self.swaps[0].id, self.swaps[3].id, self.swaps[4].id]
+        response = self.client.post("/api/swaps/bulk/", {"action": "reject", "ids": ids}, format="json")
+        self.assertEqual([r["outcome"] for r in response.data["results"]], ["conflict", "rejected", "rejected"])
+        self.assertEqual(ShiftSwapRequest.objects.filter(rejected_at__isnull=False).count(), 2)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class SwapCandidateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organisation = Organisation.objects.create(name="Test Organisation")
+        self.chef = Role.objects.create(name="Chef", organisation=self.organisation)
+        self.waiter = Role.objects.create(name="Waiter", organisation=self.organisation)
+        self.manager = User.objects.create_user(
+            username="manager1", password="password123", role="manager", organisation=self.organisation
+        )
+        self.employee, self.busy, self.unavailable, self.loaded, self.free = [
+            User.objects.create_user(
+                username=f"chef{i}", password="password123", role="employee",
+                role_title=self.chef, organisation=self.organisation
+            )
+            for i in range(5)
+        ]
+        self.waiter_user = User.objects.create_user(
+            username="waiter", password="password123", role="employee",
+            role_title=self.waiter, organisation=self.organisation
+        )
+
+        start = timezone.now() + timedelta(days=1)
+        self.shift = Shift.objects.create(
+            employee=self.employee, manager=self.manager, start_time=start, end_time=start + timedelta(hours=8)
+        )
+        Shift.objects.create(
+            employee=self.busy, manager=self.manager,
+            start_time=start + timedelta(hours=4), end_time=start + timedelta(hours=12)
+        )
+        Availability.objects.create(
+            user=self.unavailable, start_time=start - timedelta(hours=1), end_time=start + timedelta(hours=1)
+        )
+        Shift.objects.create(
+            employee=self.loaded, manager=self.manager,
+            start_time=timezone.now() - timedelta(days=3), end_time=timezone.now() - timedelta(days=3) + timedelta(hours=6)
+        )
+        self.client = APIClient()
+
+    def test_candidates_are_eligible_coworkers_least_loaded_first(self):
+        """Same role only, nobody with a clashing shift or unavailability, then by recent hours."""
+        self.client.force_authenticate(user=self.employee)
+        response = self.client.get(f"/api/swaps/candidates/{self.shift.id}/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c["user"]["id"] for c in response.data], [self.free.id, self.loaded.id])
+        self.assertEqual(response.data[1]["workload_hours"], 6.0)
+
+    def test_index_is_reused_until_a_shift_changes(self):
+        get_organisation_index(self.organisation.id)
+        self.client.force_authenticate(user=self.manager)
+        with self.assertNumQueries(1):  # just the shift; candidates come from the index
+            self.client.get(f"/api/swaps/candidates/{self.shift.id}/")
+
+        start = self.shift.start_time
+        with self.captureOnCommitCallbacks(execute=True):
+            Shift.objects.create(employee=self.free, manager=self.manager, start_time=start, end_time=start + timedelta(hours=2))
+        response = self.client.get(f"/api/swaps/candidates/{self.shift.id}/")
+        self.assertEqual([c["user"]["id"] for c in response.data], [self.loaded.id])
+
+    def test_request_swap_rejects_ineligible_recipient(self):
+        self.client.force_authenticate(user=self.employee)
+        for user in (self.busy, self.unavailable, self.waiter_user, self.employee):
+            response = self.client.post("/api/swaps/request/", {"shift": self.shift.id, "requested_to": user.id}, format="json")
+            self.assertEqual(response.status_code, 400)
+
+        response = self.client.post("/api/swaps/request/", {"shift": self.shift.id, "requested_to": self.free.id}, format="json")
+        self.assertEqual(response.status_code, 201)
+        swap = ShiftSwapRequest.objects.get(shift=self.shift)
+        self.assertEqual((swap.requested_by, swap.requested_to), (self.employee, self.free))
+
+    def test_request_swap_checks_the_recipient_against_the_database(self):
+        get_organisation_index(self.organisation.id)
+        # bulk_create skips the signals that would mark the cached index stale
+        Shift.objects.bulk_create([Shift(
+            employee=self.free, manager=self.manager, start_time=self.shift.start_time, end_time=self.shift.end_time
+        )])
+        self.client.force_authenticate(user=self.employee)
+        response = self.client.post("/api/swaps/request/", {"shift": self.shift.id, "requested_to": self.free.id}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_the_shift_employee_can_request_a_swap(self):
+        self.client.force_authenticate(user=self.free)
+        response = self.client.post("/api/swaps/request/", {"shift": self.shift.id, "requested_to": self.loaded.id}, format="json")
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get(f"/api/swaps/candidates/{self.shift.id}/")
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class SwapCycleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organisation = Organisation.objects.create(name="Test Organisation")
+        chef = Role.objects.create(name="Chef", organisation=self.organisation)
+        self.manager = User.objects.create_user(
+            username="manager1", password="password123", role="manager", organisation=self.organisation
+        )
+        self.a, self.b, self.c = [
+            User.objects.create_user(
+                username=f"chef{i}", password="password123", role="employee",
+                role_title=chef, organisation=self.organisation
+            )
+            for i in range(3)
+        ]
+        start = timezone.now() + timedelta(days=1)
+        self.shifts = {}
+        for day, user in enumerate((self.a, self.b, self.c)):
+            self.shifts[user] = Shift.objects.create(
+                employee=user, manager=self.manager,
+                start_time=start + timedelta(days=day), end_time=start + timedelta(days=day, hours=8)
+            )
+        # nobody can trade one-for-one: a can't work c's day, b can't work a's, c can't work b's
+        for user, blocked in ((self.a, self.c), (self.b, self.a), (self.c, self.b)):
+            shift = self.shifts[blocked]
+            Availability.objects.create(user=user, start_time=shift.start_time, end_time=shift.end_time)
+
+        self.client = APIClient()
+        for user in (self.a, self.b, self.c):
+            self.client.force_authenticate(user=user)
+            response = self.client.post("/api/swaps/offers/", {"shift": self.shifts[user].id}, format="json")
+            self.assertEqual(response.status_code, 201)
+        self.client.force_authenticate(user=self.manager)
+
+    def test_three_way_rotation_is_found_and_executed(self):
+        response = self.client.post("/api/swaps/cycles/match/")
+        self.assertEqual(len(response.data), 1)
+        legs = {leg["shift"]: leg["to_user"] for leg in response.data[0]["legs"]}
+        self.assertEqual(legs, {
+            self.shifts[self.b].id: "chef0", self.shifts[self.c].id: "chef1", self.shifts[self.a].id: "chef2",
+        })
+
+        response = self.client.post(f"/api/swaps/cycles/{response.data[0]['id']}/execute/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.data["executed_at"])
+        for owner, new_owner in ((self.a, self.c), (self.b, self.a), (self.c, self.b)):
+            self.shifts[owner].refresh_from_db()
+            self.assertEqual(self.shifts[owner].employee, new_owner)
+        self.assertFalse(SwapOffer.objects.filter(closed_at__isnull=True).exists())
+
+    def test_cycle_is_all_or_nothing(self):
+        cycle_id = self.client.post("/api/swaps/cycles/match/").data[0]["id"]
+        # b's shift changes hands outside the cycle
+        Shift.objects.filter(id=self.shifts[self.b].id).update(employee=self.manager)
+
+        response = self.client.post(f"/api/swaps/cycles/{cycle_id}/execute/")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Shift.objects.get(id=self.shifts[self.a].id).employee, self.a)
+        # the cycle is dissolved and its offers can be matched again
+        self.assertFalse(SwapCycle.objects.filter(id=cycle_id).exists())
+        self.assertEqual(SwapOffer.objects.filter(closed_at__isnull=True, cycle__isnull=True).count(), 3)
+
+    def test_execution_rechecks_availability_in_the_database(self):
+        cycle_id = self.client.post("/api/swaps/cycles/match/").data[0]["id"]
+        # bulk_create skips the signals that would mark the cached index stale
+        shift = self.shifts[self.b]
+        Availability.objects.bulk_create([Availability(user=self.a, start_time=shift.start_time, end_time=shift.end_time)])
+
+        response = self.client.post(f"/api/swaps/cycles/{cycle_id}/execute/")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Shift.objects.get(id=shift.id).employee, self.b)
+        self.assertFalse(SwapCycle.objects.exists())
+
+    def test_a_shift_can_only_be_on_offer_once(self):
+        self.client.force_authenticate(user=self.a)
+        response = self.client.post("/api/swaps/offers/", {"shift": self.shifts[self.a].id}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {"detail": "This shift is already on offer."})
+        self.assertEqual(SwapOffer.objects.filter(shift=self.shifts[self.a]).count(), 1)
+
+    def test_an_employee_with_several_offers_is_not_double_booked(self):
+        waiter = Role.objects.create(name="Waiter", organisation=self.organisation)
+        d, e, f = [
+            User.objects.create_user(
+                username=f"waiter{i}", password="password123", role="employee",
+                role_title=waiter, organisation=self.organisation
+            )
+            for i in range(3)
+        ]
+        start = timezone.now() + timedelta(days=10)
+        # d offers two days; e and f offer overlapping shifts on a third
+        for user, begins in ((d, start), (d, start + timedelta(days=1)), (e, start + timedelta(days=2)),
+                             (f, start + timedelta(days=2, hours=1))):
+            shift = Shift.objects.create(employee=user, manager=self.manager, start_time=begins, end_time=begins + timedelta(hours=4))
+            self.client.force_authenticate(user=user)
+            self.assertEqual(self.client.post("/api/swaps/offers/", {"shift": shift.id}, format="json").status_code, 201)
+        self.client.force_authenticate(user=self.manager)
+
+        # a second run must respect the shift d already receives in the first run's cycle
+        for _ in range(2):
+            self.client.post("/api/swaps/cycles/match/")
+        self.assertEqual(SwapCycle.objects.filter(offers__offered_by=d).distinct().count(), 1)
+
+    def test_withdrawing_an_offer_dissolves_its_cycle(self):
+        self.client.post("/api/swaps/cycles/match/")
+        offer = SwapOffer.objects.get(offered_by=self.a)
+
+        self.client.force_authenticate(user=self.a)
+        self.assertEqual(self.client.delete(f"/api/swaps/offers/{offer.id}/").status_code, 204)
+        self.assertFalse(SwapCycle.objects.exists())
+        self.assertEqual(SwapOffer.objects.filter(closed_at__isnull=True, cycle__isnull=True).count(), 2)
+
+    def test_matching_prefers_short_disjoint_cycles_at_scale(self):
+        """Thousands of offers: 2-cycles where they exist, longer rotations otherwise, none shared."""
+        adjacency = {}
+        for base in range(0, 3000, 3):
+            adjacency[base] = {base + 1}
+            adjacency[base + 1] = {base + 2, (base + 4) % 3000}
+            adjacency[base + 2] = {base, base + 1}
+        adjacency[3000] = {0}  # nobody can take this offer's shift back
+
+        found = find_cycles(adjacency)
+        matched = [node for cycle in found for node in cycle]
+        self.assertEqual(len(matched), len(set(matched)))
+        self.assertEqual(set(matched), set(range(3000)))
+
+        self.assertEqual(find_cycles({1: {2, 3}, 2: {3}, 3: {1, 2}}), [[1, 3]])
+
+    def test_matching_thousands_of_real_offers(self):
+        """3000 open offers in one role, spread over a thousand employees' upcoming shifts."""
+        organisation = seed_organisation(
+            "Large Organisation", employees=1000, roles=1, notifications=0, chats=0, swaps=0, offers=0
+        )
+        upcoming = Shift.objects.filter(manager__organisation=organisation, start_time__gt=timezone.now()).order_by("id")
+        SwapOffer.objects.bulk_create([
+            SwapOffer(shift=shift, offered_by_id=shift.employee_id) for shift in list(upcoming)[::5][:3000]
+        ])
+
+        started = time.monotonic()
+        proposed = propose_cycles(organisation.id)
+        # building every edge up front took over 20s here
+        self.assertLess(time.monotonic() - started, 10)
+
+        index = get_organisation_index(organisation.id)
+        matched = 0
+        for cycle in proposed:
+            offers = list(cycle.offers.select_related("shift").order_by("cycle_position"))
+            matched += len(offers)
+            for position, offer in enumerate(offers):
+                target = offers[(position + 1) % len(offers)].shift
+                self.assertNotEqual(offer.offered_by_id, target.employee_id)
+                self.assertTrue(index.is_free(offer.offered_by_id, target.start_time, target.end_time, ignore_shift_id=offer.shift_id))
+        self.assertGreater(matched, 2500)
+
+
+class ShiftSwapConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        self.organisation = Organisation.objects.create(name="Test Organisation")
+        self.manager = User.objects.create_user(
+            username="manager1",
+            password="password123",
+            role="manager",
+            organisation=self.organisation
+        )
+        self.employee = User.objects.create_user(
+            username="employee1",
+            password="password123",
+            role="employee",
+            organisation=self.organisation
+        )
+        self.colleague = User.objects.create_user(
+            username="employee2",
+            password="password123",
+            role="employee",
+            organisation=self.organisation
+        )
+        start = timezone.now() + timedelta(days=1)
+        self.shift = Shift.objects.create(
+            employee=self.employee, manager=self.manager, start_time=start, end_time=start + timedelta(hours=8)
+        )
+        self.swap = ShiftSwapRequest.objects.create(
+            shift=self.shift, requested_by=self.employee, requested_to=self.colleague
+        )
+
+    def _hammer(self, calls):
+        """Runs every call at once from its own thread, retrying when SQLite reports a lock."""
+        barrier = threading.Barrier(len(calls))
+        outcomes = []
+
+        def run(call):
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        swap = ShiftSwapRequest.objects.select_related('shift').get(id=self.swap.id)
+                        outcomes.append(call(swap))
+                        return
+                    except OperationalError:
+                        time.sleep(0.001)
+                    except SwapConflict:
+                        outcomes.append("conflict")
+                        return
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(call,)) for call in calls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_simultaneous_approvals_complete_exactly_once(self):
+        events = []
+        receiver = lambda **kwargs: events.append((kwargs["previous"], kwargs["state"]))
+        swap_state_changed.connect(receiver)
+        self.addCleanup(swap_state_changed.disconnect, receiver)
+
+        calls = [lambda swap: swaps.approve(swap, self.manager)] * 10 + \
+                [lambda swap: swaps.approve(swap, self.colleague)] * 10
+        outcomes = self._hammer(calls)
+
+        self.assertEqual(len(outcomes), 20)
+        self.swap.refresh_from_db()
+        self.shift.refresh_from_db()
+        self.assertTrue(self.swap.is_approved)
+        self.assertEqual(self.shift.employee, self.colleague)
+        self.assertEqual([state for _, state in events].count(swaps.APPROVED), 1)
+        self.assertEqual(len(events), 2)
+
+    def test_approve_and_reject_race_has_one_winner(self):
+        calls = [lambda swap: swaps.approve(swap, self.manager)] * 5 + \
+                [lambda swap: swaps.approve(swap, self.colleague)] * 5 + \
+                [lambda swap: swaps.reject(swap, self.manager)] * 5
+        self._hammer(calls)
+
+        self.swap.refresh_from_db()
+        self.shift.refresh_from_db()
+        if self.swap.rejected_at:
+            self.assertFalse(self.swap.is_approved)
+            self.assertEqual(self.shift.employee, self.employee)
+        else:
+            self.assertTrue(self.swap.is_approved)
+            self.assertEqual(self.shift.employee, self.colleague)
+
+
+@skipUnless("replica" in settings.DATABASES, "run with DJANGO_SETTINGS_MODULE=backend.settings_replica")
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ReplicaRoutingTests(TestCase):
+    """The replica is a separate, empty database here, so anything read from it is visibly stale."""
+    databases = {"default", "replica"} & set(settings.DATABASES)
+
+    def setUp(self):
+        cache.clear()
+        self.organisation = Organisation.objects.create(name="Test Organisation")
+        self.manager = User.objects.create_user(
+            username="manager1", password="password123", role="manager", organisation=self.organisation
+        )
+        self.employee = User.objects.create_user(
+            username="employee1", password="password123", role="employee", organisation=self.organisation
+        )
+        start = timezone.now() + timedelta(days=1)
+        self.shift = Shift.objects.create(
+            employee=self.employee, manager=self.manager, start_time=start, end_time=start + timedelta(hours=8)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.manager)
+
+    def test_marked_views_read_from_the_replica(self):
+        self.assertEqual(self.client.get("/api/shift/").data, [])
+        # retrieving a single shift isn't marked, so it still reads the primary
+        self.assertEqual(self.client.get(f"/api/shift/{self.shift.id}/").data["id"], self.shift.id)
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        response = self.client.post("/api/roles/", {"name": "Chef"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.client.get("/api/shift/").data), 1)
+
+        self.client.force_authenticate(user=self.employee)
+        self.assertEqual(self.client.get("/api/shift/").data, [])  # other users are unaffected
+
+    def test_writes_inside_replica_reads_go_to_the_primary(self):
+        with replica_reads(self.manager.id):
+            self.assertEqual(Shift.objects.count(), 0)
+            Role.objects.create(name="Chef", organisation=self.organisation)
+        self.assertEqual(Role.objects.count(), 1)
+
+    @override_settings(RESPONSE_CACHE=True)
+    def test_replica_reads_are_not_cached(self):
+        self.assertEqual(self.client.get("/api/shift/").data, [])
+        mark_recent_write(self.manager.id)
+        # the stale list the replica returned must not be served from the cache
+        self.assertEqual(len(self.client.get("/api/shift/").data), 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, RESPONSE_CACHE=True)
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organisation = Organisation.objects.create(name="Test Organisation")
+        self.manager = User.objects.create_user(
+            username="manager1", password="password123", role="manager", organisation=self.organisation
+        )
+        self.employee = User.objects.create_user(
+            username="employee1", password="password123", role="employee", organisation=self.organisation
+        )
+        self.other = User.objects.create_user(
+            username="employee2", password="password123", role="employee", organisation=self.organisation
+        )
+        start = timezone.now() + timedelta(days=1)
+        self.shift = Shift.objects.create(
+            employee=self.employee, manager=self.manager, start_time=start, end_time=start + timedelta(hours=8)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.employee)
+
+    def test_repeated_get_is_served_from_the_cache(self):
+        first = self.client.get("/api/shift/")
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/shift/")
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data, first.data)
+
+    def test_cache_is_per_user(self):
+        self.assertEqual(len(self.client.get("/api/shift/").data), 1)
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.client.get("/api/shift/").data, [])
+
+    def test_shift_write_invalidates_the_organisation(self):
+        self.assertEqual(len(self.client.get("/api/shift/").data), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shift.employee = self.other
+            self.shift.save()
+        # the previous employee's cached list is dropped along with everyone else's
+        self.assertEqual(self.client.get("/api/shift/").data, [])
+
+    def test_notification_writes_invalidate_recipients(self):
+        self.assertEqual(self.client.get("/api/notifications/").data, [])
+        self.client.force_authenticate(user=self.manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/notifications/send/", {"message": "Hello", "recipients": [self.employee.id], "roles": []}, format="json")
+
+        self.client.force_authenticate(user=self.employee)
+        unread = self.client.get("/api/notifications/").data
+        self.assertEqual(len(unread), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/notifications/read/", {"ids": [unread[0]["id"]]}, format="json")
+        self.assertEqual(self.client.get("/api/notifications/").data, [])
+
+    def test_organisation_scope_is_shared_by_role(self):
+        self.client.force_authenticate(user=self.manager)
+        self.client.get("/api/analytics/fairness/")
+        self.client.force_authenticate(user=self.employee)
+        # employees must not be served the manager's cached analytics
+        self.assertEqual(self.client.get("/api/analytics/fairness/").status_code, 403)
+
+    def test_saving_a_shift_with_its_employee_loaded_runs_no_extra_query(self):
+        start = timezone.now() + timedelta(days=2)
+        with self.assertNumQueries(1):
+            Shift.objects.create(employee=self.other, manager=self.manager, start_time=start, end_time=start + timedelta(hours=8))
+
+    def test_logging_in_keeps_cached_responses(self):
+        self.client.get("/api/shift/")
+        with self.captureOnCommitCallbacks(execute=True):
+            update_last_login(None, self.other)
+        with self.assertNumQueries(0):
+            self.client.get("/api/shift/")
+
+    @override_settings(RESPONSE_CACHE=False)
+    def test_nothing_is_cached_when_disabled(self):
+        self.client.get("/api/shift/")
+        with self.assertNumQueries(1):
+            self.client.get("/api/shift/")
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organisation = Organisation.objects.create(name="Test Organisation")
+        self.manager = User.objects.create_user(
+            username="manager1", password="password123", role="manager", organisation=self.organisation
+        )
+        self.employee = User.objects.create_user(
+            username="employee1", password="password123", role="employee", organisation=self.organisation
+        )
+        self.chat = Chat.objects.create(title="Kitchen", created_by=self.manager)
+        self.chat.participants.set([self.manager, self.employee])
+        Message.objects.create(chat=self.chat, sender=self.manager, content="Hello")
+        notification = Notification.objects.create(message="Rota published")
+        NotificationReadStatus.objects.create(user=self.employee, notification=notification)
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.employee)}"}
+
+    def test_requires_a_token(self):
+        self.assertEqual(self.client.get("/api/async/notifications/").status_code, 401)
+
+    def test_middleware_chain_stays_async(self):
+        async def get_response(request):
+            return None
+
+        for middleware in (StaticFilesMiddleware, ReplicaStickinessMiddleware, RequestMetricsMiddleware):
+            self.assertTrue(iscoroutinefunction(middleware(get_response)), middleware.__name__)
+
+    def test_notifications_match_the_sync_endpoint(self):
+        api = APIClient()
+        api.force_authenticate(user=self.employee)
+        response = self.client.get("/api/async/notifications/", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), json.loads(api.get("/api/notifications/").content))
+
+    def test_dashboard(self):
+        start = timezone.now() + timedelta(hours=1)
+        Shift.objects.create(employee=self.employee, manager=self.manager, start_time=start, end_time=start + timedelta(hours=4))
+        data = self.client.get("/api/async/dashboard/", headers=self.headers).json()
+        self.assertEqual(len(data["upcoming_shifts"]), 1)
+        self.assertEqual(data["unread_notifications"], 1)
+        self.assertEqual(data["swaps_awaiting_decision"], 0)
+
+    async def test_long_poll_rejects_waits_that_never_end(self):
+        url = f"/api/async/chats/{self.chat.id}/messages/"
+        newer = (await self.async_client.get(url, headers=self.headers)).json()["newer"]
+        for wait in ("nan", "inf"):
+            response = await asyncio.wait_for(
+                self.async_client.get(url, {"after": newer, "wait": wait}, headers=self.headers), timeout=5
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {"wait": "Must be a number."})
+
+        response = await asyncio.wait_for(
+            self.async_client.get(url, {"after": newer, "wait": -1}, headers=self.headers), timeout=5
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(CHAT_LONG_POLL_INTERVAL=30)
+    async def test_long_poll_wakes_on_a_published_message(self):
+        url = f"/api/async/chats/{self.chat.id}/messages/"
+        newer = (await self.async_client.get(url, headers=self.headers)).json()["newer"]
+
+        poll = asyncio.create_task(self.async_client.get(url, {"after": newer, "wait": 20}, headers=self.headers))
+        await asyncio.sleep(0.2)
+        self.assertFalse(poll.done())
+        # TestCase never commits, so publish directly rather than on commit
+        message = await Message.objects.acreate(chat=self.chat, sender=self.manager, content="Shift moved")
+        get_hub().publish(self.chat.id, {"type": "message.created", "message": {"id": message.id}})
+
+        response = await asyncio.wait_for(poll, timeout=5)
+        self.assertEqual([m["content"] for m in response.json()["results"]], ["Shift moved"])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organisation = Organisation.objects.create(name="Test Organisation")
+        self.manager = User.objects.create_user(
+            username="manager1", password="password123", role="manager", organisation=self.organisation
+        )
+        self.employees = [
+            User.objects.create_user(
+                username=f"employee{i}", password="password123", role="employee", organisation=self.organisation
+            )
+            for i in range(5)
+        ]
+        start = timezone.now() - timedelta(days=3)
+        for i, employee in enumerate(self.employees):
+            Shift.objects.create(
+                employee=employee, manager=self.manager,
+                start_time=start + timedelta(hours=i), end_time=start + timedelta(hours=i + 4)
+            )
+            notification = Notification.objects.create(message=f"Notice {i}")
+            NotificationReadStatus.objects.create(user=self.employees[0], notification=notification)
+        self.client = APIClient()
+
+    def test_server_timing_is_off_by_default(self):
+        self.client.force_authenticate(user=self.employees[0])
+        response = self.client.get("/api/notifications/")
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        self.client.force_authenticate(user=self.employees[0])
+        response = self.client.get("/api/notifications/")
+        self.assertEqual(len(response.data), 5)
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertRegex(timing, r'serialize;dur=[\d.]+')
+        self.assertIn('render;dur=', timing)
+        self.assertIn("total;dur=", timing)
+
+    @override_settings(SERVER_TIMING=True)
+    async def test_counts_queries_made_by_async_views(self):
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(self.employees[0])}"}
+        response = await self.async_client.get("/api/async/notifications/", headers=headers)
+        # the queries run in sync_to_async threads, outside the middleware's own thread
+        self.assertRegex(response["Server-Timing"], r'desc="[1-9]\d* queries"')
+
+    def test_serializer_time_is_counted_separately(self):
+        request_metrics, token = metrics.start_request()
+        with metrics.serializing():
+            time.sleep(0.01)
+        metrics.end_request(token)
+        self.assertGreaterEqual(request_metrics.serialize_seconds, 0.01)
+        self.assertEqual(request_metrics.render_seconds, 0)
+
+    def test_logs_each_request_and_budget_overruns(self):
+        self.client.force_authenticate(user=self.employees[0])
+        with self.assertLogs("rota.requests", level="INFO") as logs:
+            self.client.get("/api/notifications/")
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry["event"], "request")
+        self.assertEqual(entry["view"], "get_unread_notifications")
+        self.assertEqual(entry["status"], 200)
+        self.assertIn("serialize_ms", entry)
+
+        cache.clear()
+        with override_settings(QUERY_BUDGETS={"get_unread_notifications": 0}):
+            with self.assertLogs("rota.requests", level="WARNING") as logs:
+                self.client.get("/api/notifications/")
+        self.assertEqual(json.loads(logs.records[0].getMessage())["event"], "query_budget_exceeded")
+
+    def test_hot_views_run_a_fixed_number_of_queries(self):
+        self.client.force_authenticate(user=self.employees[0])
+        with self.assertNumQueries(1):
+            self.client.get("/api/notifications/")
+
+        self.client.force_authenticate(user=self.manager)
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/analytics/fairness/")
+        self.assertEqual(response.data["total_employees"], 5)
+        self.assertEqual(sum(row["shifts"] for row in response.data["shift_distribution"]), 5)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class EndpointBenchmarkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        seed_organisation("bench", employees=50, notifications=10, chats=3, messages_per_chat=20, offers=25)
+
+    def test_seeded_organisation(self):
+        organisation = Organisation.objects.get(name="bench")
+        self.assertEqual(User.objects.filter(organisation=organisation, role="manager").count(), 2)
+        self.assertEqual(User.objects.filter(organisation=organisation, role="employee").count(), 50)
+        self.assertEqual(ShiftSwapRequest.objects.filter(shift__employee__organisation=organisation).count(), 5)
+        self.assertEqual(SwapOffer.objects.filter(offered_by__organisation=organisation).count(), 25)
+        self.assertTrue(SwapCycle.objects.filter(organisation=organisation).exists())
+        # nobody works two shifts at once
+        for shift in Shift.objects.filter(employee__organisation=organisation)[:100]:
+            self.assertFalse(Shift.objects.filter(
+                employee_id=shift.employee_id, start_time__lt=shift.end_time, end_time__gt=shift.start_time
+            ).exclude(id=shift.id).exists())
+
+    def test_every_url_has_a_case(self):
+        self.assertLessEqual(url_names(), {case.name for case in endpoint_cases()})
+
+    def test_every_case_succeeds_against_the_seeded_organisation(self):
+        fixtures = Fixtures("bench", "benchmark")
+        for case in endpoint_cases():
+            user = fixtures.user(case.actor)
+            headers = {"Authorization": f"Bearer {access_token(user)}"} if user else {}
+            with self.subTest(case_label(case)), transaction.atomic():
+                response = self.client.generic(
+                    case.method, fixtures.path(case), fixtures.body(case) or "",
+                    content_type="application/json", headers=headers,
+                )
+                self.assertLess(response.status_code, 400, response.content[:200])
+                transaction.set_rollback(True)
+            cache.clear()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class LoadTestCommandTests(TransactionTestCase):
+    def run_load_test(self, server):
+        output = StringIO()
+        call_command(
+            "load_test", server=server, employees=3, managers=1, duration=1, think=0.05, size=25, stdout=output
+        )
+        return output.getvalue()
+
+    def test_reports_each_endpoint_and_removes_the_organisation(self):
+        for server in ("wsgi", "asgi"):
+            with self.subTest(server):
+                output = self.run_load_test(server)
+                self.assertIn(f"{server.upper()} on sqlite3: 3 employees and 1 managers", output)
+                self.assertIn("GET get_pending_swaps", output)
+                self.assertRegex(output, r"Total +\d+")
+                self.assertIn("Swap integrity: 0 shifts with broken handover chains", output)
+                self.assertFalse(Organisation.objects.filter(name__startswith="load-").exists())
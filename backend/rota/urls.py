@@ -3,6 +3,7 @@ from rest_framework.routers import DefaultRouter
 from .views import *
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rota.views import logout_view
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
@@ -26,7 +27,9 @@ urlpatterns = [
     # NOTIFICATIONS
     path('notifications/', get_unread_notifications, name='get_unread_notifications'),
     path('notifications/send/', send_notification, name='send_notification'),
+    path('notifications/read/', mark_notifications_read_bulk, name='mark_notifications_read_bulk'),
     path('notifications/<int:pk>/read/', mark_notification_read, name='mark_notification_read'),
+    path('notifications/<int:pk>/merged/', get_merged_notifications, name='get_merged_notifications'),
 
     # SHIFTS & AVAILABILITY
     path('shifts/auto-assign/', auto_assign_shifts, name='auto_assign_shifts'),
@@ -34,19 +37,36 @@ urlpatterns = [
 
     # SWAPS
     path('swaps/request/', request_swap, name='request_swap'),
+    path('swaps/candidates/<int:shift_id>/', get_swap_candidates, name='get_swap_candidates'),
     path('swaps/pending/', get_pending_swaps, name='get_pending_swaps'),
     path('swaps/approve/<int:id>/', approve_swap, name='approve_swap'),
     path('swaps/reject/<int:id>/', reject_swap, name='reject_swap'),
+    path('swaps/bulk/', decide_swaps_bulk, name='decide_swaps_bulk'),
+    path('swaps/offers/', create_swap_offer, name='create_swap_offer'),
+    path('swaps/offers/<int:id>/', withdraw_swap_offer, name='withdraw_swap_offer'),
+    path('swaps/cycles/match/', match_swap_cycles, name='match_swap_cycles'),
+    path('swaps/cycles/<int:id>/execute/', execute_swap_cycle, name='execute_swap_cycle'),
 
     # ANALYTICS
     path('analytics/fairness/', shift_fairness_analytics, name='shift_fairness_analytics'),
 
     # CHATS
+    path('chats/', chat_inbox, name='chat_inbox'),
+    path('chats/<int:chat_id>/participants/', update_chat_participants, name='update_chat_participants'),
+    path('chats/<int:chat_id>/read/', mark_chat_read, name='mark_chat_read'),
     path('chats/create/', create_chat, name='create_chat'),
     path('chats/<int:chat_id>/send/', send_message, name='send_message'),
     path('chats/<int:chat_id>/messages/', get_chat_messages, name='get_chat_messages'),
     path('messages/<int:message_id>/delete/', delete_message, name='delete_message'),
 
+    # ASYNC (for ASGI deployments)
+    path('async/notifications/', async_views.unread_notifications, name='async_unread_notifications'),
+    path('async/chats/<int:chat_id>/messages/', async_views.chat_messages, name='async_chat_messages'),
+    path('async/dashboard/', async_views.dashboard, name='async_dashboard'),
+
+    # SEARCH
+    path('search/', search, name='search'),
+
     # TEST
     path('testnoauth/', test_api_noauth),
     path('testauth/', test_api_auth),
@@ -1,12 +1,16 @@
 import secrets
+import time
 from calendar import monthrange
 from collections import defaultdict
 from datetime import datetime
+from decimal import Decimal
 from statistics import stdev, mean
 from typing import cast
 
 from django.conf import settings
 from django.core.exceptions import PermissionDenied
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiParameter, OpenApiExample
@@ -15,8 +19,24 @@ from rest_framework import viewsets, generics
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from . import cycles
+from .caching import ORGANISATION, cache_response, invalidate_cached_responses
+from .chats import add_participants, is_chat_participant, remove_participants, resolve_participant_ids
+from .db_routers import read_only_view
+from .metrics import SerializerTimingMixin, serializing
+from .pagination import (
+    DEFAULT_MESSAGE_PAGE_SIZE, MAX_MESSAGE_PAGE_SIZE, BoundedLimitOffsetPagination, Cursor, cursor_for, decode_cursor, encode_cursor,
+    paginate_messages, parse_page_size, parse_wait,
+)
+from .recommend import get_organisation_index
+from .realtime import message_created_event, message_deleted_event, publish_on_commit
+from .retention import merge_into_digests
+from .revocation import revoke_token
+from . import swaps
+from .search import DEFAULT_SEARCH_PAGE_SIZE, MAX_SEARCH_PAGE_SIZE, search_messages, search_notifications
 from .serializers import *
 
 
@@ -26,19 +46,19 @@ from .serializers import *
     responses={200: RoleSerializer(many=True)},
     tags=["Roles"]
 )
-class RoleViewSet(viewsets.ModelViewSet):
+class RoleViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     serializer_class = RoleSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         user = cast(User, self.request.user)
-        return Role.objects.filter(organisation=user.organisation)
+        return Role.objects.filter(organisation_id=user.organisation_id)
 
     def perform_create(self, serializer):
         user = cast(User, self.request.user)
         if user.role != 'manager':
             raise PermissionDenied("Only managers can create roles.")
-        serializer.save(organisation=user.organisation)
+        serializer.save(organisation_id=user.organisation_id)
 
     def destroy(self, request, *args, **kwargs):
         if request.user.role != 'manager':
@@ -51,7 +71,7 @@ class RoleViewSet(viewsets.ModelViewSet):
     responses={200: ShiftTemplateSerializer(many=True)},
     tags=["Shifts"]
 )
-class ShiftTemplateViewSet(viewsets.ModelViewSet):
+class ShiftTemplateViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     serializer_class = ShiftTemplateSerializer
     permission_classes = [IsAuthenticated]
 
@@ -88,7 +108,7 @@ class ShiftTemplateViewSet(viewsets.ModelViewSet):
 
         # support either POST [ {...}, {...} ]  or  { roles: [ {...}, {...} ] }
         payload = request.data.get('roles') if isinstance(request.data, dict) else request.data
-        serializer = ShiftRoleRequirementSerializer(data=payload or [], many=True)
+        serializer = ShiftRoleRequirementSerializer(data=payload or [], many=True, context=self.get_serializer_context())
 
         serializer.is_valid(raise_exception=True)
         for item in serializer.validated_data:
@@ -106,7 +126,7 @@ class ShiftTemplateViewSet(viewsets.ModelViewSet):
     responses={200: UserSerializer(many=True)},
     tags=["Users"]
 )
-class UserViewSet(viewsets.ModelViewSet):              # ← allow PATCH
+class UserViewSet(SerializerTimingMixin, viewsets.ModelViewSet):              # ← allow PATCH
     # base queryset so router can infer basename
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -116,10 +136,14 @@ class UserViewSet(viewsets.ModelViewSet):              # ← allow PATCH
         user = self.request.user
         if user.role == 'manager':
             # show everyone in the same organisation
-            return User.objects.filter(organisation=user.organisation)
+            return User.objects.filter(organisation_id=user.organisation_id)
         # otherwise only yourself
         return User.objects.filter(id=user.id)
 
+    @read_only_view
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def partial_update(self, request, *args, **kwargs):
         # only managers can change other users’ roles
         if request.user.role != 'manager':
@@ -140,7 +164,7 @@ class UserViewSet(viewsets.ModelViewSet):              # ← allow PATCH
     },
     tags=["Availabilities"]
 )
-class AvailabilityViewSet(viewsets.ModelViewSet):
+class AvailabilityViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     # base queryset so router can infer `basename="availability"`
     queryset = Availability.objects.all()
     serializer_class = AvailabilitySerializer
@@ -155,7 +179,7 @@ class AvailabilityViewSet(viewsets.ModelViewSet):
         # 2) managers see everyone’s future/current slots
         if user.role == "manager":
             return Availability.objects.filter(
-                user__organisation=user.organisation,
+                user__organisation_id=user.organisation_id,
                 end_time__gte=now
             )
         # 3) regular users see only their own future/current slots
@@ -289,10 +313,9 @@ def test_api_auth(request):
     return Response({"message": f"API is working! Logged in as {request.user.username}"})
 
 # USER CLASSES
-# noinspection PyBroadException
 @extend_schema(
     summary="Logout user",
-    description="Blacklists the provided refresh token, effectively logging out the user.\n\n**Required field:** `refresh` (string).",
+    description="Revokes the session the provided refresh token belongs to. The refresh token and every access token issued from it stop working.\n\n**Required field:** `refresh` (string).",
     request=LogoutRequestSerializer,
     responses={
         200: OpenApiResponse(description='Logout successful'),
@@ -304,12 +327,11 @@ def test_api_auth(request):
 @permission_classes([AllowAny])
 def logout_view(request):
     try:
-        refresh_token = request.data['refresh']
-        token = RefreshToken(refresh_token)
-        token.blacklist()
-        return Response({"detail": "Logout successful"})
-    except Exception:
+        token = RefreshToken(request.data['refresh'])
+    except (KeyError, TypeError, TokenError):
         return Response({"detail": "Invalid refresh token"}, status=400)
+    revoke_token(token)
+    return Response({"detail": "Logout successful"})
 
 # INVITE LINK CLASSES
 @extend_schema(
@@ -375,7 +397,7 @@ def generate_invite(request):
     expires_at = timezone.now() + timedelta(days=3)
 
     InviteToken.objects.create(
-        organisation=request.user.organisation,
+        organisation_id=request.user.organisation_id,
         role=role,
         token=token,
         expires_at=expires_at,
@@ -397,7 +419,7 @@ def generate_invite(request):
     },
     tags=["Shifts"]
 )
-class ShiftViewSet(viewsets.ModelViewSet):
+class ShiftViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     serializer_class = ShiftSerializer
     permission_classes = [IsAuthenticated]
     queryset = Shift.objects.all()
@@ -410,6 +432,11 @@ class ShiftViewSet(viewsets.ModelViewSet):
         else:
             return Shift.objects.filter(employee=user)
 
+    @cache_response()
+    @read_only_view
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         user = cast(User, self.request.user)
 
@@ -434,14 +461,19 @@ tags=["Notifications"]
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cache_response()
 def get_unread_notifications(request):
     user = request.user
     unread_notifications = Notification.objects.filter(
-        recipients=user,
+        notificationreadstatus__user=user,
         notificationreadstatus__read=False
+    ).annotate(
+        merged_count=models.F('notificationreadstatus__merged_count'),
+        is_read=models.F('notificationreadstatus__read'),
     )
-    serializer = NotificationSerializer(unread_notifications, many=True, context={'request': request})
-    return Response(serializer.data)
+    with serializing():
+        data = NotificationSerializer(unread_notifications, many=True, context={'request': request}).data
+    return Response(data)
 
 @extend_schema(
     summary="Send a notification to one or more users",
@@ -487,18 +519,24 @@ def send_notification(request):
         users = users | User.objects.filter(role_title__in=roles)
     if recipients:
         users = users | User.objects.filter(id__in=recipients)
-    users = users.distinct()
+    user_ids = set(users.values_list('id', flat=True))
+
+    with transaction.atomic():
+        # 1) Create the notification
+        notif = Notification.objects.create(message=message)
 
-    # 1) Create the notification
-    notif = Notification.objects.create(message=message)
+        # 2) In digest mode, fold it into recent unread notifications instead of adding rows
+        linked_ids = set(user_ids)
+        if settings.NOTIFICATION_DIGEST_WINDOW:
+            linked_ids -= merge_into_digests(notif, linked_ids, settings.NOTIFICATION_DIGEST_WINDOW)
 
-    # 2) Manually link each user via the through‑table (and track unread status)
-    for u in users:
-        NotificationReadStatus.objects.create(
-            user=u,
-            notification=notif,
-            read=False
+        # 3) Link the remaining users via the through‑table (and track unread status)
+        NotificationReadStatus.objects.bulk_create(
+            [NotificationReadStatus(user_id=user_id, notification=notif, read=False) for user_id in linked_ids],
+            batch_size=500
         )
+        # dropped on commit, after every write above, so no request can cache the old list in between
+        invalidate_cached_responses(user_ids=user_ids)
 
     return Response({"detail":"Notifications sent"}, status=status.HTTP_201_CREATED)
 
@@ -519,10 +557,79 @@ def mark_notification_read(request, pk):
         read_status.read = True
         read_status.read_at = timezone.now()
         read_status.save()
+        invalidate_cached_responses(user_ids=[request.user.id])
         return Response({"detail": "Marked as read."})
     except NotificationReadStatus.DoesNotExist:
         return Response({"detail": "Notification not found or not assigned."}, status=404)
 
+@extend_schema(
+    summary="List the notifications merged into a digest",
+    description="In digest mode a burst of notifications is shown as its latest one, with `merged_count`. This lists the earlier ones, newest first.",
+    parameters=[OpenApiParameter("pk", int, OpenApiParameter.PATH, required=True, description="ID of the digest notification")],
+    responses={
+        200: NotificationSerializer(many=True),
+        404: OpenApiResponse(OpenApiTypes.OBJECT, description='Notification not found or not assigned')
+    },
+    tags=["Notifications"]
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_merged_notifications(request, pk):
+    try:
+        read_status = NotificationReadStatus.objects.get(user=request.user, notification_id=pk)
+    except NotificationReadStatus.DoesNotExist:
+        return Response({"detail": "Notification not found or not assigned."}, status=404)
+    merged = read_status.merged_notifications.order_by('-created_at', '-id').annotate(
+        is_read=models.Value(read_status.read),
+    )
+    with serializing():
+        data = NotificationSerializer(merged, many=True, context={'request': request}).data
+    return Response(data)
+
+@extend_schema(
+    summary="Mark several notifications as read",
+    description="Marks the listed notification IDs, or every notification up to and including `before`, as read in a single update. Returns the number of notifications updated and the remaining unread count.",
+    request=BulkMarkReadSerializer,
+    examples=[
+        OpenApiExample(
+            "Mark selected notifications",
+            value={"ids": [4, 7, 9]},
+            request_only=True
+        ),
+        OpenApiExample(
+            "Mark everything up to a cursor",
+            value={"before": 120},
+            request_only=True
+        ),
+        OpenApiExample(
+            "Success",
+            value={"updated": 3, "unread_count": 2},
+            response_only=True
+        )
+    ],
+    responses={
+        200: OpenApiResponse(OpenApiTypes.OBJECT, description='Number updated and remaining unread count'),
+        400: OpenApiResponse(description='Neither ids nor before provided')
+    },
+    tags=["Notifications"]
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def mark_notifications_read_bulk(request):
+    serializer = BulkMarkReadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    unread = NotificationReadStatus.objects.filter(user=request.user, read=False)
+    targets = unread
+    if 'ids' in serializer.validated_data:
+        targets = targets.filter(notification_id__in=serializer.validated_data['ids'])
+    if 'before' in serializer.validated_data:
+        targets = targets.filter(notification_id__lte=serializer.validated_data['before'])
+
+    updated = targets.update(read=True, read_at=timezone.now())
+    invalidate_cached_responses(user_ids=[request.user.id])
+    return Response({"updated": updated, "unread_count": unread.count()})
+
 @extend_schema(
     summary="Estimate gross pay for current and previous month",
     responses={200: OpenApiResponse(
@@ -543,16 +650,18 @@ def mark_notification_read(request, pk):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cache_response()
+@read_only_view
 def pay_estimate(request):
     user = request.user
     now = timezone.now()
 
     def calculate_pay(year, month):
-        first = datetime(year, month, 1)
-        last = datetime(year, month, monthrange(year, month)[1], 23, 59, 59)
+        first = timezone.make_aware(datetime(year, month, 1))
+        last = timezone.make_aware(datetime(year, month, monthrange(year, month)[1], 23, 59, 59))
         shifts = Shift.objects.filter(employee=user, start_time__range=(first, last))
         total_hours = sum([(s.end_time - s.start_time).total_seconds() / 3600 for s in shifts])
-        return round(total_hours * user.pay_rate, 2)
+        return round(Decimal(total_hours) * (user.pay_rate or 0), 2)
 
     this_month_pay = calculate_pay(now.year, now.month)
     last_month = (now.replace(day=1) - timedelta(days=1))
@@ -565,7 +674,8 @@ def pay_estimate(request):
 
 @extend_schema(
     summary="Request a shift swap",
-    request=ShiftSwapRequestSerializer,
+    description="Proposes one of your own shifts to a coworker. The coworker must share your role title and be free of shifts and unavailability for the shift's duration.",
+    request=ShiftSwapProposalSerializer,
     responses={
         201: OpenApiResponse(
             description="Swap request submitted",
@@ -576,16 +686,27 @@ def pay_estimate(request):
                     response_only=True
                 )
             ]
-        )
+        ),
+        400: OpenApiResponse(
+            description="The coworker cannot take the shift",
+            examples=[
+                OpenApiExample(
+                    "Ineligible",
+                    value={"detail": "That user is not eligible to take this shift."},
+                    response_only=True
+                )
+            ]
+        ),
+        404: OpenApiResponse(description="Shift not found or not yours")
     },
     examples=[
         OpenApiExample(
             "Request Swap",
             value={
                 "shift": 12,
-                "requested_by": 3,
                 "requested_to": 7
-            }
+            },
+            request_only=True
         )
     ],
     tags=["Shifts"]
@@ -593,28 +714,90 @@ def pay_estimate(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def request_swap(request):
-    serializer = ShiftSwapRequestSerializer(data=request.data)
+    serializer = ShiftSwapProposalSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    serializer.save()
+
+    shift = Shift.objects.select_related('employee').filter(
+        id=serializer.validated_data['shift'], employee=request.user
+    ).first()
+    if shift is None:
+        return Response({"detail": "Shift not found."}, status=404)
+
+    if not swaps.can_take_shift(serializer.validated_data['requested_to'], shift):
+        return Response({"detail": "That user is not eligible to take this shift."}, status=400)
+
+    with transaction.atomic():
+        ShiftSwapRequest.objects.create(
+            shift=shift, requested_by=request.user, requested_to_id=serializer.validated_data['requested_to']
+        )
+        Shift.objects.filter(id=shift.id).update(is_swap_requested=True)
+        invalidate_cached_responses(organisation_ids=[request.user.organisation_id])
     return Response({"detail": "Swap request submitted."}, status=201)
 
+@extend_schema(
+    summary="Suggest coworkers to swap a shift with",
+    description="Ranks coworkers who share the shift employee's role title and have no overlapping shift or unavailability, least worked over the last four weeks first. Available to the shift's employee and manager.",
+    parameters=[
+        OpenApiParameter(name="shift_id", type=int, location=OpenApiParameter.PATH),
+        OpenApiParameter(name="limit", type=int, location=OpenApiParameter.QUERY, required=False, description="Maximum candidates to return (default 10, max 50)"),
+    ],
+    responses={
+        200: SwapCandidateSerializer(many=True),
+        404: OpenApiResponse(description="Shift not found")
+    },
+    tags=["Shifts"]
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_swap_candidates(request, shift_id):
+    shift = Shift.objects.select_related('employee').filter(
+        models.Q(employee=request.user) | models.Q(manager=request.user), id=shift_id
+    ).first()
+    if shift is None:
+        return Response({"detail": "Shift not found."}, status=404)
+
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+    except ValueError:
+        return Response({"detail": "limit must be an integer."}, status=400)
+
+    index = get_organisation_index(shift.employee.organisation_id)
+    candidates = index.candidates(
+        shift.employee.role_title_id, shift.start_time, shift.end_time,
+        exclude_user_id=shift.employee_id, limit=limit
+    )
+    data = [{"user": user, "workload_hours": hours} for user, hours in candidates]
+    return Response(SwapCandidateSerializer(data, many=True).data)
+
 @extend_schema(
     summary="Get pending swap requests relevant to the user",
-    responses={200: ShiftSwapRequestSerializer(many=True)},
+    description=f"Returns a page of pending swap requests, oldest first. Use `limit` (default {BoundedLimitOffsetPagination.default_limit}, max {BoundedLimitOffsetPagination.max_limit}) and `offset`, or follow `next`.",
+    parameters=[
+        OpenApiParameter(name="limit", type=int, location=OpenApiParameter.QUERY, required=False, description="Page size"),
+        OpenApiParameter(name="offset", type=int, location=OpenApiParameter.QUERY, required=False, description="Number of requests to skip"),
+    ],
+    responses={200: PaginatedShiftSwapRequestSerializer},
     tags=["Shifts"]
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_pending_swaps(request):
-    swaps = ShiftSwapRequest.objects.filter(
+    pending = ShiftSwapRequest.objects.filter(
         is_approved=False,
-        manager_approved=False
+        manager_approved=False,
+        rejected_at__isnull=True
     ).filter(
         models.Q(shift__manager=request.user) |
         models.Q(requested_to=request.user)
-    )
-    serializer = ShiftSwapRequestSerializer(swaps, many=True)
-    return Response(serializer.data)
+    ).select_related(
+        'shift__employee', 'shift__manager', 'requested_by', 'requested_to'
+    ).order_by('requested_at', 'id')
+
+    paginator = BoundedLimitOffsetPagination()
+    page = paginator.paginate_queryset(pending, request)
+    with serializing():
+        data = ShiftSwapRequestSerializer(page, many=True).data
+    return paginator.get_paginated_response(data)
 
 @extend_schema(
     summary="Approve a shift swap request",
@@ -655,6 +838,16 @@ def get_pending_swaps(request):
                     response_only=True
                 )
             ]
+        ),
+        409: OpenApiResponse(
+            description="Swap is already approved or rejected",
+            examples=[
+                OpenApiExample(
+                    "Not Pending",
+                    value={"detail": "Swap request is no longer pending."},
+                    response_only=True
+                )
+            ]
         )
     },
     tags=["Shifts"]
@@ -663,31 +856,16 @@ def get_pending_swaps(request):
 @permission_classes([IsAuthenticated])
 def approve_swap(request, id):
     try:
-        swap = ShiftSwapRequest.objects.get(id=id)
+        swap = ShiftSwapRequest.objects.select_related('shift').get(id=id)
     except ShiftSwapRequest.DoesNotExist:
         return Response({"detail": "Swap request not found."}, status=404)
 
     user = request.user
-    shift = swap.shift
-
-    if user == shift.manager:
-        swap.manager_approved = True
-    elif user == swap.requested_to:
-        swap.recipient_approved = True
-    else:
+    if user.id not in (swap.shift.manager_id, swap.requested_to_id):
         return Response({"detail": "Only the shift manager or proposed user can approve this swap."}, status=403)
 
-    if swap.manager_approved and swap.recipient_approved:
-        swap.is_approved = True
-        swap.approved_at = timezone.now()
-        shift.employee = swap.requested_to
-        shift.swap_approved = True
-        shift.is_swap_requested = False
-        shift.save()
-        swap.save()
+    if swaps.approve(swap, user) == swaps.APPROVED:
         return Response({"detail": "Swap fully approved and completed."})
-
-    swap.save()
     return Response({"detail": "Approval recorded. Waiting for the other party."})
 
 @extend_schema(
@@ -724,6 +902,16 @@ def approve_swap(request, id):
                     response_only=True
                 )
             ]
+        ),
+        409: OpenApiResponse(
+            description="Swap is already approved or rejected",
+            examples=[
+                OpenApiExample(
+                    "Not Pending",
+                    value={"detail": "Swap request is no longer pending."},
+                    response_only=True
+                )
+            ]
         )
     },
     tags=["Shifts"]
@@ -732,27 +920,155 @@ def approve_swap(request, id):
 @permission_classes([IsAuthenticated])
 def reject_swap(request, id):
     try:
-        swap = ShiftSwapRequest.objects.get(id=id)
+        swap = ShiftSwapRequest.objects.select_related('shift').get(id=id)
     except ShiftSwapRequest.DoesNotExist:
         return Response({"detail": "Swap request not found."}, status=404)
 
     user = request.user
-    shift = swap.shift
-
-    if user != shift.manager and user != swap.requested_to:
+    if user.id not in (swap.shift.manager_id, swap.requested_to_id):
         return Response({"detail": "Only the manager or recipient can reject this request."}, status=403)
 
-    swap.is_approved = False
-    swap.manager_approved = False
-    swap.recipient_approved = False
-    swap.approved_at = None
-    shift.swap_approved = False
-    shift.is_swap_requested = False
+    swaps.reject(swap, user)
+    return Response({"detail": "Swap request has been rejected."})
 
-    swap.save()
-    shift.save()
+@extend_schema(
+    summary="Approve or reject many swap requests at once",
+    description="Managers only. Applies the decision to every listed swap in one transaction and reports an outcome per swap: the resulting state (`manager_approved`, `approved`, `rejected`) or `not_found`, `forbidden`, `conflict` (already decided) or `overlap` (the recipient has another shift at that time).",
+    request=BulkSwapDecisionSerializer,
+    examples=[
+        OpenApiExample(
+            "Approve selected swaps",
+            value={"action": "approve", "ids": [4, 7, 9]},
+            request_only=True
+        ),
+        OpenApiExample(
+            "Success",
+            value={"results": [
+                {"id": 4, "outcome": "approved", "detail": "Swap fully approved and completed."},
+                {"id": 7, "outcome": "manager_approved", "detail": "Approval recorded. Waiting for the other party."},
+                {"id": 9, "outcome": "overlap", "detail": "The recipient already has a shift at that time."}
+            ]},
+            response_only=True
+        )
+    ],
+    responses={
+        200: BulkSwapResultSerializer(many=True),
+        403: OpenApiResponse(description="Not a manager"),
+        409: OpenApiResponse(description="A swap or shift changed concurrently; nothing was applied")
+    },
+    tags=["Shifts"]
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def decide_swaps_bulk(request):
+    if request.user.role != 'manager':
+        return Response({"detail": "Only managers can decide swaps in bulk."}, status=403)
+    serializer = BulkSwapDecisionSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
 
-    return Response({"detail": "Swap request has been rejected."})
+    results = swaps.bulk_decide(serializer.validated_data['ids'], request.user, serializer.validated_data['action'])
+    return Response({"results": [
+        {"id": swap_id, "outcome": outcome, "detail": detail} for swap_id, (outcome, detail) in results.items()
+    ]})
+
+@extend_schema(
+    summary="Offer one of your shifts for a multi-party swap",
+    description="Puts an upcoming shift up for exchange. Open offers are matched into rotations (A takes B's shift, B takes C's, C takes A's) by the cycle matcher.",
+    request=SwapOfferSerializer,
+    responses={
+        201: SwapOfferSerializer,
+        400: OpenApiResponse(description="Shift has already started or is already on offer"),
+        404: OpenApiResponse(description="Shift not found or not yours")
+    },
+    examples=[OpenApiExample("Offer Shift", value={"shift": 12}, request_only=True)],
+    tags=["Shifts"]
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_swap_offer(request):
+    serializer = SwapOfferSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    shift = serializer.validated_data['shift']
+    if shift.employee_id != request.user.id:
+        return Response({"detail": "Shift not found."}, status=404)
+    if shift.start_time <= timezone.now():
+        return Response({"detail": "Only upcoming shifts can be offered."}, status=400)
+
+    # swap_offer_one_open_per_shift catches a second open offer, including one made concurrently
+    try:
+        with transaction.atomic():
+            offer = serializer.save(offered_by=request.user)
+    except IntegrityError:
+        return Response({"detail": "This shift is already on offer."}, status=400)
+    return Response(SwapOfferSerializer(offer).data, status=201)
+
+@extend_schema(
+    summary="Withdraw a swap offer",
+    description="Closes the offer. A proposed cycle that included it is dissolved and its other offers return to the pool.",
+    parameters=[OpenApiParameter(name="id", type=int, location=OpenApiParameter.PATH)],
+    request=None,
+    responses={
+        204: OpenApiResponse(description="Offer withdrawn"),
+        404: OpenApiResponse(description="Offer not found"),
+        409: OpenApiResponse(description="Offer is already closed")
+    },
+    tags=["Shifts"]
+)
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+def withdraw_swap_offer(request, id):
+    offer = SwapOffer.objects.filter(id=id, offered_by=request.user).first()
+    if offer is None:
+        return Response({"detail": "Swap offer not found."}, status=404)
+    cycles.withdraw_offer(offer)
+    return Response(status=204)
+
+@extend_schema(
+    summary="Match open swap offers into cycles",
+    description=f"Managers only. Finds rotations of up to {cycles.MAX_CYCLE_LENGTH} open offers where every employee shares the role title and is free for the shift they would receive, records them as proposed cycles and returns all of the organisation's unexecuted cycles.",
+    request=None,
+    responses={200: SwapCycleSerializer(many=True), 403: OpenApiResponse(description="Not a manager")},
+    tags=["Shifts"]
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def match_swap_cycles(request):
+    if request.user.role != 'manager':
+        return Response({"detail": "Only managers can match swap cycles."}, status=403)
+
+    cycles.propose_cycles(request.user.organisation_id)
+    proposed = SwapCycle.objects.filter(
+        organisation_id=request.user.organisation_id, executed_at__isnull=True
+    ).prefetch_related(
+        models.Prefetch('offers', queryset=SwapOffer.objects.select_related('offered_by'))
+    ).order_by('created_at', 'id')
+    return Response(SwapCycleSerializer(proposed, many=True).data)
+
+@extend_schema(
+    summary="Execute a proposed swap cycle",
+    description="Managers only. Reassigns every shift in the cycle at once; if any shift has changed hands or an employee is no longer free, nothing is changed.",
+    parameters=[OpenApiParameter(name="id", type=int, location=OpenApiParameter.PATH)],
+    request=None,
+    responses={
+        200: SwapCycleSerializer,
+        403: OpenApiResponse(description="Not a manager in the cycle's organisation"),
+        404: OpenApiResponse(description="Cycle not found"),
+        409: OpenApiResponse(description="Cycle was already executed or no longer fits")
+    },
+    tags=["Shifts"]
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def execute_swap_cycle(request, id):
+    if request.user.role != 'manager':
+        return Response({"detail": "Only managers can execute swap cycles."}, status=403)
+    cycle = SwapCycle.objects.filter(id=id, organisation_id=request.user.organisation_id).first()
+    if cycle is None:
+        return Response({"detail": "Swap cycle not found."}, status=404)
+
+    cycles.execute_cycle(cycle)
+    cycle.refresh_from_db()
+    return Response(SwapCycleSerializer(cycle).data)
 
 @extend_schema(
     summary="View shift distribution fairness within an organisation",
@@ -805,26 +1121,35 @@ def reject_swap(request, id):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cache_response(ORGANISATION)
+@read_only_view
 def shift_fairness_analytics(request):
     user = request.user
 
     if user.role != 'manager':
         return Response({"detail": "Only managers can access this data."}, status=403)
 
-    employees = User.objects.filter(organisation=user.organisation, role='employee')
+    employees = list(
+        User.objects.filter(organisation_id=user.organisation_id, role='employee').select_related('role_title')
+    )
     now = timezone.now()
     start_date = now - timedelta(weeks=4)
 
+    # one query for every employee's shifts rather than two per employee
+    shifts_by_employee = defaultdict(list)
+    recent = Shift.objects.filter(
+        employee__organisation_id=user.organisation_id, employee__role='employee', start_time__gte=start_date
+    ).only('employee_id', 'start_time', 'end_time')
+    for shift in recent:
+        shifts_by_employee[shift.employee_id].append(shift)
+
     data = []
     shift_counts = []
 
     for emp in employees:
-        shifts = Shift.objects.filter(
-            employee=emp,
-            start_time__gte=start_date,
-        )
+        shifts = shifts_by_employee[emp.id]
 
-        shift_count = shifts.count()
+        shift_count = len(shifts)
         shift_counts.append(shift_count)
 
         weekly_totals = defaultdict(float)
@@ -842,13 +1167,40 @@ def shift_fairness_analytics(request):
     fairness = 1 / (1 + stdev(shift_counts)) if len(shift_counts) > 1 else 1.0
 
     return Response({
-        "total_employees": employees.count(),
+        "total_employees": len(employees),
         "average_shifts": round(avg, 2),
         "fairness_score": round(fairness, 2),
         "shift_distribution": data
     })
 
 # CHAT VIEWS
+def chat_access_denied(chat_id, user, fresh=False):
+    """
+    Returns an error response unless `user` is a participant of the chat. Writes pass
+    `fresh=True` so a removed participant is refused even while a cached answer lingers.
+    """
+    if is_chat_participant(chat_id, user.id, fresh=fresh):
+        return None
+    if not Chat.objects.filter(id=chat_id).exists():
+        return Response({'detail': 'Chat not found.'}, status=404)
+    return Response({'detail': 'You are not a participant of this chat.'}, status=403)
+
+def message_page_data(messages, has_older, deleted, after, tombstone_id):
+    """The body of a page of chat messages, with the cursors to load older history or poll for newer."""
+    if messages:
+        newer = cursor_for(messages[-1], tombstone_id)
+    else:
+        newer = (after or Cursor())._replace(tombstone_id=tombstone_id)
+
+    with serializing():
+        results = MessageSerializer(messages, many=True).data
+    return {
+        "results": results,
+        "deleted": [message_id for _, message_id in deleted],
+        "older": encode_cursor(cursor_for(messages[0])) if messages and has_older else None,
+        "newer": encode_cursor(newer),
+    }
+
 @extend_schema(
     summary="Create a new chat",
     description="Only managers can create a chat with specific users, roles, or both. The users must belong to the same organisation.",
@@ -879,17 +1231,61 @@ def create_chat(request):
     if not title:
         return Response({'detail': 'Title is required.'}, status=400)
 
-    chat = Chat.objects.create(title=title, created_by=request.user)
+    with transaction.atomic():
+        chat = Chat.objects.create(title=title, created_by=request.user)
+        add_participants(chat.id, resolve_participant_ids(request.user.organisation_id, user_ids, role_ids))
+    return Response(ChatSerializer(chat).data, status=201)
 
-    users = User.objects.filter(id__in=user_ids, organisation=request.user.organisation)
-    roles = Role.objects.filter(id__in=role_ids, organisation=request.user.organisation)
+@extend_schema(
+    summary="Add or remove chat participants",
+    description="Adds users (directly or by role) to a chat and removes others, without rewriting the rest of the participant list. Only managers in the chat creator's organisation can change participants.",
+    request=ChatParticipantsUpdateSerializer,
+    parameters=[
+        OpenApiParameter(name="chat_id", type=int, location=OpenApiParameter.PATH, description="Chat ID")
+    ],
+    examples=[
+        OpenApiExample(
+            "Add a role and remove a user",
+            value={"add_role_ids": [3], "remove_user_ids": [12]},
+            request_only=True
+        ),
+        OpenApiExample(
+            "Success",
+            value={"added": 14, "removed": 1, "participant_count": 52},
+            response_only=True
+        )
+    ],
+    responses={
+        200: OpenApiResponse(OpenApiTypes.OBJECT, description='Number added and removed'),
+        403: OpenApiResponse(description='Not a manager of this organisation'),
+        404: OpenApiResponse(description='Chat not found')
+    },
+    tags=["Chats"]
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def update_chat_participants(request, chat_id):
+    chat = get_object_or_404(Chat.objects.select_related('created_by'), id=chat_id)
+    if request.user.role != 'manager' or chat.created_by.organisation_id != request.user.organisation_id:
+        return Response({'detail': 'Only managers in this organisation can change participants.'}, status=403)
+
+    serializer = ChatParticipantsUpdateSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
 
-    for role in roles:
-        users |= User.objects.filter(role_title=role)
+    # explicit removals win over users added through one of their roles
+    to_add = resolve_participant_ids(request.user.organisation_id, data['add_user_ids'], data['add_role_ids'])
+    to_add -= set(data['remove_user_ids'])
 
-    chat.participants.set(users.distinct())
-    chat.save()
-    return Response(ChatSerializer(chat).data, status=201)
+    with transaction.atomic():
+        added = add_participants(chat.id, to_add)
+        removed = remove_participants(chat.id, data['remove_user_ids'])
+
+    return Response({
+        "added": added,
+        "removed": removed,
+        "participant_count": chat.participants.count(),
+    })
 
 @extend_schema(
     summary="Send a message in a chat",
@@ -910,14 +1306,16 @@ def create_chat(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def send_message(request, chat_id):
-    chat = Chat.objects.get(id=chat_id)
-    if request.user not in chat.participants.all():
-        return Response({'detail': 'You are not a participant of this chat.'}, status=403)
+    denied = chat_access_denied(chat_id, request.user, fresh=True)
+    if denied:
+        return denied
     content = request.data.get('content')
     if not content:
         return Response({'detail': 'Message content is required.'}, status=400)
-    message= Message.objects.create(chat=chat, sender=request.user, content=content)
-    return Response(MessageSerializer(message).data)
+    message= Message.objects.create(chat_id=chat_id, sender=request.user, content=content)
+    data = MessageSerializer(message).data
+    publish_on_commit(chat_id, message_created_event(data))
+    return Response(data)
 
 @extend_schema(
     summary="Delete a message",
@@ -936,28 +1334,216 @@ def send_message(request, chat_id):
 def delete_message(request, message_id):
     try:
         message = Message.objects.get(id=message_id, sender=request.user)
-        message.delete()
+        with transaction.atomic():
+            MessageTombstone.objects.create(chat_id=message.chat_id, message_id=message.id)
+            publish_on_commit(message.chat_id, message_deleted_event(message.id))
+            message.delete()
         return Response({'detail': 'Message deleted.'})
     except Message.DoesNotExist:
         return Response({'detail': 'Message not found or you are not the sender.'}, status=404)
 
 @extend_schema(
-    summary="Get all messages in a chat",
-    description="Returns all messages for a given chat ID. The user must be a participant in the chat.",
+    summary="Get messages in a chat",
+    description="""
+Returns one page of messages for a given chat ID, oldest first. The user must be a participant in the chat.
+
+- With no cursor, the newest `limit` messages are returned.
+- `before`: returns the page of messages immediately older than this cursor (scrolling back through history).
+- `after`: returns only messages newer than this cursor, plus the IDs of messages deleted since it was issued (`deleted`).
+- `wait` (with `after` only): hold the request for up to this many seconds until something changes. This view
+  waits at most `CHAT_SYNC_LONG_POLL_TIMEOUT` seconds (default 2), since it ties up a worker thread meanwhile;
+  `/api/async/chats/<id>/messages/` under ASGI waits up to `CHAT_LONG_POLL_TIMEOUT`.
+
+Pass the `older` cursor from a response as `before` to load more history, and the `newer` cursor as `after` to poll.
+`older` is `null` once the start of the chat has been reached.
+""",
     parameters=[
-        OpenApiParameter(name="chat_id", type=int, location=OpenApiParameter.PATH, description="Chat ID")
+        OpenApiParameter(name="chat_id", type=int, location=OpenApiParameter.PATH, description="Chat ID"),
+        OpenApiParameter(name="before", type=str, location=OpenApiParameter.QUERY, required=False, description="Cursor: return messages older than this"),
+        OpenApiParameter(name="after", type=str, location=OpenApiParameter.QUERY, required=False, description="Cursor: return messages newer than this and deletions since"),
+        OpenApiParameter(name="limit", type=int, location=OpenApiParameter.QUERY, required=False, description=f"Page size (default {DEFAULT_MESSAGE_PAGE_SIZE}, max {MAX_MESSAGE_PAGE_SIZE})"),
+        OpenApiParameter(name="wait", type=int, location=OpenApiParameter.QUERY, required=False, description="Long-poll: seconds to wait for activity when used with 'after'"),
     ],
-    responses={200: MessageSerializer(many=True)},
+    responses={200: MessagePageSerializer},
     tags=["Chats"]
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_chat_messages(request, chat_id):
-    chat = Chat.objects.get(id=chat_id)
-    if request.user not in chat.participants.all():
-        return Response({'detail': 'You are not a participant of this chat.'}, status=403)
-    messages = chat.messages.all()
-    return Response(MessageSerializer(messages, many=True).data)
+    denied = chat_access_denied(chat_id, request.user)
+    if denied:
+        return denied
+
+    before = request.query_params.get('before')
+    after = request.query_params.get('after')
+    if before and after:
+        return Response({'detail': "Use either 'before' or 'after', not both."}, status=400)
+    before = decode_cursor(before) if before else None
+    after = decode_cursor(after) if after else None
+    limit = parse_page_size(request.query_params.get('limit'))
+
+    try:
+        wait = parse_wait(
+            request.query_params.get('wait'), min(settings.CHAT_LONG_POLL_TIMEOUT, settings.CHAT_SYNC_LONG_POLL_TIMEOUT)
+        ) if after else 0
+    except ValueError:
+        return Response({'wait': 'Must be a number.'}, status=400)
+    deadline = time.monotonic() + wait
+
+    messages_qs = Message.objects.filter(chat_id=chat_id).select_related('sender')
+    tombstones = MessageTombstone.objects.filter(chat_id=chat_id)
+    while True:
+        messages, has_older = paginate_messages(messages_qs, before=before, after=after, limit=limit)
+        deleted = list(
+            tombstones.filter(id__gt=after.tombstone_id).order_by('id').values_list('id', 'message_id')
+        ) if after else []
+        if messages or deleted or time.monotonic() >= deadline:
+            break
+        time.sleep(settings.CHAT_LONG_POLL_INTERVAL)
+
+    if deleted:
+        tombstone_id = deleted[-1][0]
+    elif after:
+        tombstone_id = after.tombstone_id
+    else:
+        tombstone_id = tombstones.aggregate(last=models.Max('id'))['last'] or 0
+
+    return Response(message_page_data(messages, has_older, deleted, after, tombstone_id))
+
+@extend_schema(
+    summary="List the user's chats",
+    description="Returns every chat the user participates in with its latest message and the number of unread messages from other participants, most recently active first.",
+    responses={200: ChatInboxSerializer(many=True)},
+    tags=["Chats"]
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def chat_inbox(request):
+    user = request.user
+    latest = Message.objects.filter(chat=models.OuterRef('pk')).order_by('-timestamp', '-id')
+    read_upto = ChatReadCursor.objects.filter(chat=models.OuterRef('pk'), user=user).values('last_read_message_id')[:1]
+    unread = (
+        Message.objects
+        .filter(chat=models.OuterRef('pk'), id__gt=models.OuterRef('read_upto'))
+        .exclude(sender=user)
+        .order_by()
+        .values('chat')
+        .annotate(count=models.Count('id'))
+        .values('count')
+    )
+
+    chats = (
+        Chat.objects
+        .filter(participants=user)
+        .annotate(
+            last_message_id=models.Subquery(latest.values('id')[:1]),
+            last_message_sender=models.Subquery(latest.values('sender__username')[:1]),
+            last_message_content=models.Subquery(latest.values('content')[:1]),
+            last_message_timestamp=models.Subquery(latest.values('timestamp')[:1]),
+            read_upto=Coalesce(models.Subquery(read_upto), 0),
+        )
+        .annotate(unread_count=Coalesce(models.Subquery(unread), 0))
+        .order_by(models.F('last_message_timestamp').desc(nulls_last=True), '-created_at')
+    )
+    with serializing():
+        data = ChatInboxSerializer(chats, many=True).data
+    return Response(data)
+
+@extend_schema(
+    summary="Mark a chat as read",
+    description="Moves the user's read position in the chat forward to `message_id`, or to the newest message if omitted. The position never moves backwards.",
+    request=MarkChatReadSerializer,
+    parameters=[
+        OpenApiParameter(name="chat_id", type=int, location=OpenApiParameter.PATH, description="Chat ID")
+    ],
+    responses={200: OpenApiResponse(OpenApiTypes.OBJECT, description='Current read position')},
+    tags=["Chats"]
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def mark_chat_read(request, chat_id):
+    denied = chat_access_denied(chat_id, request.user, fresh=True)
+    if denied:
+        return denied
+
+    serializer = MarkChatReadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    message_id = serializer.validated_data.get('message_id')
+    if message_id is None:
+        message_id = Message.objects.filter(chat_id=chat_id).aggregate(last=models.Max('id'))['last'] or 0
+    elif not (
+        Message.objects.filter(chat_id=chat_id, id=message_id).exists()
+        or MessageTombstone.objects.filter(chat_id=chat_id, message_id=message_id).exists()
+    ):
+        return Response({"message_id": "Not a message in this chat."}, status=400)
+
+    # move the cursor forward in a single conditional update, so concurrent requests can't move it back
+    cursors = ChatReadCursor.objects.filter(chat_id=chat_id, user=request.user)
+    behind = cursors.filter(last_read_message_id__lt=message_id)
+    if behind.update(last_read_message_id=message_id, updated_at=timezone.now()):
+        return Response({"last_read_message_id": message_id})
+
+    last_read = cursors.values_list('last_read_message_id', flat=True).first()
+    if last_read is None:
+        try:
+            with transaction.atomic():
+                ChatReadCursor.objects.create(chat_id=chat_id, user=request.user, last_read_message_id=message_id)
+            last_read = message_id
+        except IntegrityError:
+            # another request created the cursor in the meantime
+            behind.update(last_read_message_id=message_id, updated_at=timezone.now())
+            last_read = cursors.values_list('last_read_message_id', flat=True).get()
+    return Response({"last_read_message_id": last_read})
+
+@extend_schema(
+    summary="Search chat messages or notifications",
+    description="""
+Full-text search over messages in the user's chats (`type=messages`, the default) or over the user's own notifications (`type=notifications`).
+Results are ranked best match first. Use `offset` with the returned `next_offset` to fetch further pages; it is `null` on the last page.
+""",
+    parameters=[
+        OpenApiParameter(name="q", type=str, location=OpenApiParameter.QUERY, required=True, description="Search terms"),
+        OpenApiParameter(name="type", type=str, location=OpenApiParameter.QUERY, required=False, enum=["messages", "notifications"], description="What to search (default: messages)"),
+        OpenApiParameter(name="limit", type=int, location=OpenApiParameter.QUERY, required=False, description=f"Page size (default {DEFAULT_SEARCH_PAGE_SIZE}, max {MAX_SEARCH_PAGE_SIZE})"),
+        OpenApiParameter(name="offset", type=int, location=OpenApiParameter.QUERY, required=False, description="Number of results to skip"),
+    ],
+    responses={
+        200: OpenApiResponse(OpenApiTypes.OBJECT, description='Ranked results and the offset of the next page'),
+        400: OpenApiResponse(description='Missing query or invalid parameters')
+    },
+    tags=["Search"]
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search(request):
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'q': 'This parameter is required.'}, status=400)
+
+    kind = request.query_params.get('type', 'messages')
+    if kind not in ('messages', 'notifications'):
+        return Response({'type': "Must be 'messages' or 'notifications'."}, status=400)
+
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', DEFAULT_SEARCH_PAGE_SIZE)), MAX_SEARCH_PAGE_SIZE))
+        offset = max(0, int(request.query_params.get('offset', 0)))
+    except ValueError:
+        return Response({'detail': 'limit and offset must be integers.'}, status=400)
+
+    # fetch one extra result to know whether another page exists
+    if kind == 'messages':
+        results = search_messages(request.user, query, limit + 1, offset)
+        serializer = MessageSearchResultSerializer(results[:limit], many=True)
+    else:
+        results = search_notifications(request.user, query, limit + 1, offset)
+        serializer = NotificationSearchResultSerializer(results[:limit], many=True)
+    with serializing():
+        data = serializer.data
+
+    return Response({
+        "results": data,
+        "next_offset": offset + limit if len(results) > limit else None,
+    })
 
 @extend_schema(
     summary="Automatically assign unassigned shifts based on required roles and fairness",
@@ -991,7 +1577,7 @@ def auto_assign_shifts(request):
     templates = ShiftTemplate.objects.filter(manager=request.user)
 
     past_weeks = timezone.now() - timedelta(weeks=4)
-    employees = User.objects.filter(role='employee', organisation=request.user.organisation)
+    employees = User.objects.filter(role='employee', organisation_id=request.user.organisation_id)
 
     workload = {
         emp.id: Shift.objects.filter(
@@ -1057,7 +1643,8 @@ def change_password(request):
     serializer = ChangePasswordSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
 
-    user = cast(User, request.user)
+    # request.user may be built from token claims, which must not be written back to the row
+    user = User.objects.get(pk=request.user.pk)
     old_password = serializer.validated_data["old_password"]
     new_password = serializer.validated_data["new_password"]
 
@@ -1120,9 +1707,11 @@ This endpoint is useful for pre-filling forms or displaying the current user's s
 )
 @api_view(['GET']) #newly added to return the current user
 @permission_classes([IsAuthenticated])
+@cache_response()
 def current_user(request):
-    serializer = UserSerializer(request.user)
-    return Response(serializer.data)
+    with serializing():
+        data = UserSerializer(request.user).data
+    return Response(data)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -1140,7 +1729,7 @@ def assign_template(request, pk):
         return Response({"detail":"user_id required"}, status=400)
 
     emp = get_object_or_404(
-        User, id=user_id, organisation=request.user.organisation
+        User, id=user_id, organisation_id=request.user.organisation_id
     )
 
     # create real Shift and drop the template
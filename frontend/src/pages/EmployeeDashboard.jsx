@@ -37,7 +37,7 @@ const EmployeeDashboard = () => {
   const fetchPendingSwaps = async () => {
     try {
       const res = await api.get('/api/swaps/pending/');
-      setPendingSwaps(res.data);
+      setPendingSwaps(res.data.results);
     } catch (error) {
       console.error('Failed to fetch swap requests:', error);
     }
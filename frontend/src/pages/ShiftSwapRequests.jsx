@@ -3,12 +3,13 @@ import api from '../services/api';
 
 const ShiftSwapRequests = () => {
   const [pendingSwaps, setPendingSwaps] = useState([]);
-  const [newSwap, setNewSwap] = useState({ shift: '', reason: '' });
+  const [newSwap, setNewSwap] = useState({ shift: '', requested_to: '', reason: '' });
+  const [candidates, setCandidates] = useState([]);
 
   const fetchPendingSwaps = async () => {
     try {
       const res = await api.get('/api/swaps/pending/');
-      setPendingSwaps(res.data);
+      setPendingSwaps(res.data.results);
     } catch (error) {
       console.error('Failed to fetch swap requests:', error);
     }
@@ -32,11 +33,23 @@ const ShiftSwapRequests = () => {
     }
   };
 
+  const fetchCandidates = async (shiftId) => {
+    setCandidates([]);
+    if (!shiftId) return;
+    try {
+      const res = await api.get(`/api/swaps/candidates/${shiftId}/`);
+      setCandidates(res.data);
+    } catch (error) {
+      console.error('Failed to fetch swap candidates:', error);
+    }
+  };
+
   const handleNewSwapSubmit = async (e) => {
     e.preventDefault();
     try {
       await api.post('/api/swaps/request/', newSwap);
-      setNewSwap({ shift: '', reason: '' });
+      setNewSwap({ shift: '', requested_to: '', reason: '' });
+      setCandidates([]);
       fetchPendingSwaps();
     } catch (error) {
       console.error('Failed to submit swap request:', error);
@@ -89,11 +102,28 @@ const ShiftSwapRequests = () => {
             <input
               type="text"
               value={newSwap.shift}
-              onChange={(e) => setNewSwap({ ...newSwap, shift: e.target.value })}
+              onChange={(e) => setNewSwap({ ...newSwap, shift: e.target.value, requested_to: '' })}
+              onBlur={(e) => fetchCandidates(e.target.value)}
               className="w-full p-2 rounded bg-gray-800 text-white"
               required
             />
           </div>
+          <div>
+            <label className="block mb-1">Swap With</label>
+            <select
+              value={newSwap.requested_to}
+              onChange={(e) => setNewSwap({ ...newSwap, requested_to: e.target.value })}
+              className="w-full p-2 rounded bg-gray-800 text-white"
+              required
+            >
+              <option value="">{candidates.length ? 'Choose a coworker' : 'No eligible coworkers'}</option>
+              {candidates.map(({ user, workload_hours }) => (
+                <option key={user.id} value={user.id}>
+                  {user.first_name} {user.last_name} ({workload_hours}h in the last 4 weeks)
+                </option>
+              ))}
+            </select>
+          </div>
           <div>
             <label className="block mb-1">Reason</label>
             <textarea